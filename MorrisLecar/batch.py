@@ -0,0 +1,269 @@
+# =============================================================================
+#
+# RESUMABLE BATCH RUNNER OF THE ANALYSES
+# A manifest (JSON or TOML file) lists the analyses to be performed: each
+# item is a subcommand of morris.py (integrate, bifurcation, frequency) with
+# its parameters, e.g.
+#   {"defaults": {"v_ca": 0.0, "dt": 0.01, "Nstep": 5000, "v0": -25.0},
+#    "items": [{"command": "frequency", "name": "class2", "Imin": 0, "Imax": 100},
+#              {"command": "bifurcation", "v_ca": -12.0},
+#              {"command": "integrate", "I_app": 80.0}]}
+# The parameters of "defaults" are given to all the items whose subcommand
+# accepts them, unless the item sets them. The items are computed on a pool
+# of processes and the arrays of each result are written to a .npz file of
+# the output directory. A checkpoint file records the items completed and
+# the sweeps over I_app are computed in blocks, each one stored in the cache
+# as soon as it is computed. All the files are written under a temporary
+# name and then renamed: when an interrupted run is started again, the
+# completed items are skipped and the sweeps in progress resume from the
+# last block stored.
+#
+# Several parameters can be parsed:
+#   --manifest name of the manifest (.json or .toml)
+#   --out      output directory (default: the name of the manifest without
+#              extension)
+#   --workers  number of processes of the pool (default: number of cores)
+#   --block    number of values of I_app of each block of the sweeps
+#              (default: 50)
+#   --cache    directory of the cache of the results (default: the directory
+#              'cache' within the output directory)
+#   --plot     if given, the figure of each item is written too
+#
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import hashlib
+import inspect
+import tempfile
+import traceback
+import concurrent.futures
+from morris import COMMANDS
+
+""" Function of each subcommand, and parameters that are set by the runner
+instead of by the manifest """
+FUNCTIONS = {name: function for name, function, text in COMMANDS}
+RESERVED = ['cache', 'block', 'verbose']
+
+class Item:
+    def __init__(self, name, command, params, key):
+        self.name = name
+        self.command = command
+        self.params = params
+        self.key = key
+
+def read_manifest(path):
+    """ Content of a JSON or TOML manifest (TOML needs python 3.11 or the
+    package tomli) """
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(path, 'rb') as file:
+            return tomllib.load(file)
+    with open(path) as file:
+        return json.load(file)
+
+def item_key(command, params):
+    """ Hash of the subcommand and of its parameters: an item is completed
+    only if it was computed with the same parameters """
+    from cache import normalize
+    content = {'command': command,
+               'params': {name: normalize(value) for name, value in params.items()}}
+    text = json.dumps(content, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def load_manifest(path):
+    """ List of the Item objects of a manifest. An error is raised, before
+    anything is computed, for unknown subcommands and parameters and for
+    items with the same name; items without a name are named after their
+    subcommand and their hash """
+    content = read_manifest(path)
+    defaults = dict(content.get('defaults', {}))
+    items = []
+    for k, entry in enumerate(content['items']):
+        entry = dict(entry)
+        command = entry.pop('command', defaults.get('command'))
+        name = entry.pop('name', None)
+        if command not in FUNCTIONS:
+            raise ValueError('item %d: unknown command %r' % (k, command))
+        accepted = [p for p in inspect.signature(FUNCTIONS[command]).parameters
+                    if p not in RESERVED]
+        unknown = sorted(set(entry)-set(accepted))
+        if unknown:
+            raise ValueError('item %d: unknown parameters of %s: %s' % (k, command,
+                             ', '.join(unknown)))
+        params = {p: value for p, value in defaults.items() if p in accepted}
+        params.update(entry)
+        key = item_key(command, params)
+        items.append(Item(name if name else '%s_%s' % (command, key[:8]), command,
+                          params, key))
+    names = [item.name for item in items]
+    duplicates = sorted(set(n for n in names if names.count(n) > 1))
+    if duplicates:
+        raise ValueError('items with the same name: %s' % ', '.join(duplicates))
+    return items
+
+def write_json(path, content):
+    """ Writes the file under a temporary name and then renames it, so that
+    an interrupted write never leaves a corrupted file """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(content, file, indent=2)
+    os.replace(tmp, path)
+
+class Checkpoint:
+    def __init__(self, path):
+        """ Record of the items of a run, stored in the JSON file ''path'':
+        for each name, the hash of the parameters, the status ('done' or
+        'failed'), the output file, the time and the summary (or the error) """
+        self.path = path
+        self.items = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                self.items = json.load(file)['items']
+
+    def done(self, item):
+        """ True if the item was completed with the same parameters and its
+        output is still there """
+        entry = self.items.get(item.name)
+        return (entry is not None and entry['key'] == item.key and
+                entry['status'] == 'done' and os.path.exists(entry['output']))
+
+    def update(self, item, entry):
+        """ Records the item and rewrites the checkpoint file """
+        entry['key'] = item.key
+        self.items[item.name] = entry
+        write_json(self.path, {'items': self.items})
+
+def run_item(command, params, output, cache, block, plot):
+    """ Function executed by the processes of the pool: computes an item and
+    writes its output. Errors are returned instead of raised, so that the
+    other items go on """
+    start = time.perf_counter()
+    try:
+        function = FUNCTIONS[command]
+        kwargs = dict(params, cache=cache)
+        if 'block' in inspect.signature(function).parameters:
+            kwargs['block'] = block
+        res = function(**kwargs)
+        entry = {'status': 'done', 'output': res.save(output), 'summary': res.summary()}
+        if plot:
+            from morris import pyplot
+            fig = res.plot(headless=True)
+            fig.savefig(output+'.png')
+            pyplot(headless=True).close(fig)
+    except Exception:
+        entry = {'status': 'failed', 'error': traceback.format_exc()}
+    entry['time'] = time.perf_counter()-start
+    return entry
+
+def run_batch(manifest, out=None, workers=None, block=50, cache=None, plot=False,
+              verbose=True):
+    """ Computes the items of a manifest that are not completed yet
+
+    Parameters
+    ----------
+    manifest: name of the manifest (.json or .toml)
+    out: output directory (default: the name of the manifest without extension)
+    workers: number of processes of the pool (default: number of cores); if
+             1, the items are computed in the present process
+    block: number of values of I_app of each block of the sweeps (default: 50)
+    cache: directory of the cache of the results (default: the directory
+           'cache' within the output directory)
+    plot: if True, the figure of each item is written too (default: False)
+    verbose: if True, the progress is printed (default: True)
+
+    Returns
+    -------
+    checkpoint: Checkpoint object; ''checkpoint.items'' has an entry for each
+                item computed so far, in this run or in the previous ones
+
+    Examples
+    --------
+    >>> checkpoint = run_batch('sweeps.json', workers=4)
+    >>> checkpoint.items['class2']['status']
+    'done'
+    """
+    items = load_manifest(manifest)
+    if out is None:
+        out = os.path.splitext(manifest)[0]
+    if cache is None:
+        cache = os.path.join(out, 'cache')
+    os.makedirs(out, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(out, 'checkpoint.json'))
+    pending = [item for item in items if not checkpoint.done(item)]
+    if verbose:
+        print('%d items: %d completed, %d to be computed' % (len(items),
+              len(items)-len(pending), len(pending)))
+
+    tasks = [(item.command, item.params, os.path.join(out, item.name), cache, block, plot)
+             for item in pending]
+    def record(k, item, entry):
+        checkpoint.update(item, entry)
+        if verbose:
+            print('[%d/%d] %s: %s in %.1f s' % (k, len(pending), item.name,
+                  entry['status'], entry['time']))
+            if entry['status'] == 'failed':
+                print(entry['error'].rstrip().splitlines()[-1])
+
+    if workers is None:
+        workers = os.cpu_count()
+    if workers == 1:
+        for k in range(0,len(pending)):
+            record(k+1, pending[k], run_item(*tasks[k]))
+    elif len(pending) > 0:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_item, *task): item for task, item in zip(tasks, pending)}
+            for k, future in enumerate(concurrent.futures.as_completed(futures)):
+                record(k+1, futures[future], future.result())
+    return checkpoint
+
+# %%
+
+if __name__ == '__main__':
+    """ The guard is needed where the processes of the pool import the script
+        instead of being forked from it (e.g. on Windows) """
+    import argparse
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--manifest")
+    parser.add_argument("--out")
+    parser.add_argument("--workers")
+    parser.add_argument("--block")
+    parser.add_argument("--cache")
+    parser.add_argument("--plot", action='store_true')
+
+    opts = parser.parse_args()
+
+    if opts.manifest:
+        manifest = opts.manifest
+    else:
+        parser.error('the manifest must be given with --manifest')
+    if opts.workers:
+        workers = int(opts.workers)
+    else:
+        workers = None
+    if opts.block:
+        block = int(opts.block)
+    else:
+        block = 50
+    try:
+        items = load_manifest(manifest)
+    except ValueError as error:
+        parser.error(str(error))
+
+    checkpoint = run_batch(manifest, out=opts.out, workers=workers, block=block,
+                           cache=opts.cache, plot=opts.plot)
+    failed = [item.name for item in items
+              if checkpoint.items.get(item.name, {}).get('status') != 'done']
+    if failed:
+        print('%d items failed: %s' % (len(failed), ', '.join(failed)))
+        sys.exit(1)
+    print('All the %d items completed' % len(items))
+
+# %%
@@ -11,161 +11,39 @@
 #   --Imax  maximum value of applied current analysed 
 #   --v0min minimum value of initial condition on voltage
 #   --v0max maximum value of initial condition on voltage
+#   --solver method used to find the equilibria: 'bracket' (reduction to the
+#           voltage and bracketing) or 'newton2' (Newton algorithm from
+#           several initial conditions)
+#   --continuation if given, the branches of equilibria are followed with
+#           the pseudo-arclength continuation method and the fold and Hopf
+#           bifurcations are located
+#   --orbits if given together with --continuation, the families of periodic
+#           orbits born at the Hopf bifurcations are followed too
+#   --sweep 'cold' (the Newton algorithm starts from the same initial guesses
+#           at each I_app) or 'up', 'down', 'both' (it starts from the zeros
+#           found at the previous I_app, sweeping upwards, downwards or in
+#           both directions); only used with --solver newton2
+#   --cache directory of the cache of the results
+#   --no_cache if given, the cache is not used
+#   --stats if given, the time and the work (function evaluations, iterations,
+#           failures) of each stage are collected and printed
 #   --out   name of the generated figure
+#   --data  name of the file where the computed rows are written (.npz,
+#           .parquet or .h5, see results.py)
+#   --headless if given, no window is opened: the figure is drawn with a non
+#           interactive backend and written to --out (default: the name of
+#           the subcommand)
+#   --no_plot if given, no figure is drawn
+#
+# The script runs the subcommand 'bifurcation' of morris.py, where the analysis is
+# implemented as a function that can also be called from python
 #
 # =============================================================================
 
-import argparse
-
-parser = argparse.ArgumentParser()
-
-parser.add_argument("--v_ca")
-parser.add_argument("--Imin")
-parser.add_argument("--Imax")
-parser.add_argument("--v0min")
-parser.add_argument("--v0max")
-parser.add_argument("--out")
-
-config = {}
-opts = parser.parse_args()
-
-if opts.v_ca:
-    v_ca = float(opts.v_ca)
-else:
-    v_ca = 0
-if opts.Imin:
-    Imin = float(opts.Imin)
-else:
-    Imin = 0
-if opts.Imax:
-    Imax = float(opts.Imax)
-else:
-    Imax = 100
-if opts.v0min:
-    v0min = float(opts.v0min)
-else:
-    v0min = -50
-if opts.v0max:
-    v0max = float(opts.v0max)
-else: 
-    v0max = 50
-    
-if opts.out:
-    save = True
-    out = opts.out
-else:
-    save = False
-
-# %%
-
-from fixed_parameters import *
-
-""" Model for Bifurcation Analysis 
-Here we need to remove the temporal dependency """
-def f1(x,y):
-    part1 = -g_ca*m_inf(x)*(x-E_ca)
-    part2 = -g_k*y*(x-E_k)
-    part3 = -g_leak*(x-E_leak)
-    return (part1+part2+part3+I_app)/c
-def f2(x,y):
-    return phi_w*((w_inf(x)-y)/tau_w(x))    
-
-def df1dx(x,y):
-    part1 = -g_ca*(x-E_ca)/(2*theta_ca*(np.cosh((v_ca-x)/theta_ca))**2)
-    part2 = -g_ca*m_inf(x)
-    part3 = -g_k*y
-    part4 = -g_leak
-    return (part1+part2+part3+part4)/c
-def df1dy(x,y):
-    return -g_k*(x-E_k)/c
-
-def m_inf(v):
-    return 0.5*(1+np.tanh((v-v_ca)/theta_ca))
-def w_inf(v):
-    return 0.5*(1+np.tanh((v-v_k)/theta_k))
-def tau_w(v):
-    return 1/(np.cosh((v-v_k)/(2*theta_k)))
-
-def df2dx(x,y):
-    part1 = 1/(2*theta_k*(np.cosh((v_k-x)/theta_k))**2)
-    part2 = np.sinh((v_k-x)/(2*theta_k))/(theta_k*(np.cosh((v_k-x)/theta_k)+1))
-    return phi_w*(part1*tau_w(x)-(w_inf(x)-y)*part2)/(tau_w(x))**2
-def df2dy(x,y):
-    return -phi_w/tau_w(x)
+import sys
+from morris import main
 
-def f(x,y):
-    return [f1(x,y),f2(x,y)]
-def Jf(x,y):
-    return [[df1dx(x,y),df1dy(x,y)],
-            [df2dx(x,y),df2dy(x,y)]]
+if __name__ == '__main__':
+    main(['bifurcation'] + sys.argv[1:])
 
 # %%
-
-""" Set I_app values and v0_values to draw bifurcation diagram """
-I_app_values = np.linspace(Imin,Imax,200)    
-v0_values = np.linspace(v0min,v0max,61)
-w0 = 0.0
-
-""" Find the zeros of the function """
-v_zeros = []; w_zeros = []
-for I_app in I_app_values:
-    zero_v = []; zero_w = []
-    zeros_v = []; zeros_w = []
-    
-    for v0 in v0_values:
-        p0 = [v0,w0]
-        res = newton2(f,Jf,p0)
-        if res.success == True:
-            point = res.x
-            zero_v.append(round(point[0],5))
-            zero_w.append(round(point[1],5))
-            for element in zero_v:
-                if element not in zeros_v:
-                    zeros_v.append(element)
-            for element in zero_w:
-                if element not in zeros_w:
-                    zeros_w.append(element)
-
-    v_zeros.append(zeros_v); w_zeros.append(zeros_w)
-
-# %%
-
-""" Discriminate stability of each zero found previously """
-stable = []; unstable = []
-for i in range(0,len(I_app_values)):
-    I_app = I_app_values[i]
-    for j in range(0,len(v_zeros[i])):
-        eigen = np.linalg.eigvals(Jf(v_zeros[i][j],w_zeros[i][j]))
-        for k in range(0,len(eigen)):
-            if eigen[k]>0:
-                unstable.append([I_app_values[i],v_zeros[i][j],w_zeros[i][j],'unstable'])
-                break
-            stable.append([I_app_values[i],v_zeros[i][j],w_zeros[i][j],'stable'])
-            break
-            
-# %%
- 
-""" Reorganize data """
-col_st = ['I_app','V','w','Stability']
-stab = pd.DataFrame(stable,columns=col_st)
-unstab = pd.DataFrame(unstable, columns=col_st)
-
-unstab_up = unstab.loc[unstab['V']>-30]
-unstab_down = unstab.loc[unstab['V']<-30]
-
-# %%
-
-""" Bifurcation Diagram """
-plt.figure(figsize=(15,10))
-plt.plot(stab['I_app'],stab['V'],'b')
-plt.plot(unstab_up['I_app'],unstab_up['V'],'b--')
-plt.plot(unstab_down['I_app'],unstab_down['V'],'b--')
-plt.ylim(v0min,v0max)
-plt.xlabel('$I_{app}$',fontsize=18)
-plt.ylabel('V',fontsize=18)
-plt.grid(linestyle=':')
-if save == True:
-    plt.savefig(out+'.png')
-plt.show()
-
-# %%
\ No newline at end of file
@@ -0,0 +1,199 @@
+# =============================================================================
+#
+# ON-DISK CACHE OF THE RESULTS
+# The arrays computed by the scripts (trajectories, frequencies, equilibria)
+# are stored on disk as .npy files, whose name is the hash of all the
+# parameters needed to compute them: the fixed parameters of the model, the
+# parameters given to the script and the version of the algorithm. Stored
+# arrays are loaded memory-mapped; when the cache exceeds its maximum size,
+# the least recently used arrays are removed.
+#
+# =============================================================================
+
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import fixed_parameters
+
+""" Fixed parameters of the model that enter the key of each array """
+MODEL_PARAMETERS = ['g_ca', 'E_ca', 'theta_ca', 'g_k', 'E_k', 'v_k', 'theta_k',
+                    'g_leak', 'E_leak', 'c', 'phi_w']
+
+""" Version of the algorithm that computes each kind of array: it must be
+increased when the algorithm changes, so that the old arrays are not used """
+VERSIONS = {'trajectory': 1, 'frequency': 1, 'frequency_sweep': 2,
+            'equilibria': 3}
+
+""" Default directory and maximum size (in bytes) of the cache """
+DIRECTORY = os.environ.get('MORRIS_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'morris'))
+MAX_BYTES = 1 << 30
+
+def normalize(value):
+    """ Numbers are converted to float, so that e.g. v_ca=0 and v_ca=0.0
+    give the same key """
+    if isinstance(value, (bool, np.bool_)) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [normalize(v) for v in value]
+    raise TypeError('Parameter of type %s cannot be hashed' % type(value).__name__)
+
+def file_size(path):
+    """ Size of the file, 0 if it has been removed (e.g. evicted by another
+    process sharing the cache) """
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+class Cache:
+    def __init__(self, directory=DIRECTORY, max_bytes=MAX_BYTES):
+        """ Content-addressed cache of numpy arrays
+
+        Parameters
+        ----------
+        directory: directory where the arrays are stored (default: the
+                   environment variable MORRIS_CACHE or ~/.cache/morris)
+        max_bytes: maximum size of the cache; when it is exceeded, the least
+                   recently used arrays are removed (default: 1 GiB)
+
+        Examples
+        --------
+        >>> cache = Cache()
+        >>> key = cache.key('trajectory', v_ca=0.0, I_app=80.0, dt=0.01, Nstep=5000,
+        >>>                 v0=-25.0, w0=0.0, method='rk4')
+        >>> y = cache.get(key)
+        >>> if y is None:
+        >>>     t, y = RK4_system(morris_lecar(80.0, 0.0), 0.01, [-25.0,0.0], 0., 5000)
+        >>>     cache.put(key, y)
+        >>> cache.hits, cache.misses
+        (0, 1)
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(file_size(path) for path in self.files())
+
+    def files(self):
+        """ Paths of all the arrays stored in the cache """
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.npy'):
+                    yield os.path.join(root, name)
+
+    def key(self, kind, **params):
+        """ Hash of the kind of array, of the version of the algorithm that
+        computes it, of the fixed parameters of the model and of the given
+        parameters """
+        content = {'kind': kind, 'version': VERSIONS[kind],
+                   'model': {name: normalize(getattr(fixed_parameters, name))
+                             for name in MODEL_PARAMETERS},
+                   'params': {name: normalize(value) for name, value in params.items()}}
+        text = json.dumps(content, sort_keys=True)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key+'.npy')
+
+    def get(self, key):
+        """ Returns the array stored with the given key (memory-mapped, read
+        only), or None if it is not in the cache """
+        path = self.path(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        """ The modification time records the last use (LRU eviction); the
+        file can be evicted meanwhile by another process sharing the cache,
+        and then it is a miss """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """ Stores the array with the given key. The file is written under a
+        temporary name and then renamed, so that an interrupted write never
+        leaves a corrupted array in the cache """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.size -= file_size(path)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            np.save(file, np.asarray(array))
+        os.replace(tmp, path)
+        self.size += file_size(path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ Removes the least recently used arrays until the size of the
+        cache is below max_bytes. Other processes sharing the cache can
+        remove the same files meanwhile: the files that vanish are skipped """
+        entries = []
+        for path in self.files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self.size = sum(entry[1] for entry in entries)
+        for mtime, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def clear(self):
+        """ Removes all the arrays of the cache """
+        for path in list(self.files()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.size = 0
+
+    def summary(self):
+        return 'cache: %d hits, %d misses, %.1f MB in %s' % (self.hits, self.misses,
+                self.size/2**20, self.directory)
+
+def sweep(cache, kind, name, values, compute, block=None, **params):
+    """ Results of a sweep over the values of the parameter ''name'': the
+    result of each value is stored in the cache separately, so that only the
+    values that are not in the cache are computed, with a single call of
+    compute(missing_values), which must return one array for each value.
+    If block is given, the missing values are computed in blocks of at most
+    ''block'' values and each block is stored as soon as it is computed, so
+    that an interrupted sweep is resumed from the last block stored. The
+    other parameters of the key are given as keyword arguments. If cache is
+    None, all the values are computed. Returns the list of the arrays of all
+    the values. """
+    values = np.asarray(values)
+    if cache is None:
+        return list(compute(values))
+    keys = [cache.key(kind, **{name: value}, **params) for value in values]
+    results = [cache.get(key) for key in keys]
+    missing = [i for i in range(0,len(values)) if results[i] is None]
+    size = block if block else max(len(missing),1)
+    for start in range(0,len(missing),size):
+        part = missing[start:start+size]
+        for i, result in zip(part, compute(values[part])):
+            cache.put(keys[i], result)
+            results[i] = np.asarray(result)
+    return results
+
+# %%
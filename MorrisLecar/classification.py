@@ -0,0 +1,317 @@
+# =============================================================================
+#
+# CLASSIFICATION OF THE MORRIS LECAR MODEL IN THE PLANE (I_app, v_ca)
+# Each cell of a grid of values of I_app and v_ca is labelled with the
+# number of equilibria and of stable equilibria of the model, and with the
+# firing frequency of the signal generated from a given initial condition.
+# The grid is split in tiles that are computed in parallel on a pool of
+# processes; each tile is integrated at once as an ensemble.
+#
+# =============================================================================
+
+import os
+import concurrent.futures
+from fixed_parameters import *
+from model import morris_lecar, Jf
+from equilibria import equilibria
+from spikes import SpikeDetector
+from instrument import STATS
+
+""" Categories of the classification map """
+CATEGORIES = ['rest', 'firing', 'bistable', 'unknown']
+
+class ClassificationMap:
+    def __init__(self, I_app, v_ca, n_eq, n_stable, frequency):
+        self.I_app = I_app
+        self.v_ca = v_ca
+        self.n_eq = n_eq
+        self.n_stable = n_stable
+        self.frequency = frequency
+        self.firing = ~np.isnan(frequency)
+        """ rest: no firing, stable equilibrium; firing: no stable
+        equilibrium; bistable: firing and stable equilibrium """
+        self.category = np.full(np.shape(frequency), 3, dtype=np.int64)
+        self.category[~self.firing & (n_stable > 0)] = 0
+        self.category[self.firing & (n_stable == 0)] = 1
+        self.category[self.firing & (n_stable > 0)] = 2
+        self.label = np.array(CATEGORIES)[self.category]
+
+def firing_frequency(I_app, v_ca, y0, dt, Nstep, every=1, chunk_size=1000,
+                     verbose=False, return_state=False):
+    """ Firing frequency of the Morris Lecar model for several values of the
+    parameters, integrated at once as an ensemble with the Runge Kutta
+    algorithm. The samples are given to the spike detector chunk by chunk:
+    as soon as the frequency of some members has converged (or the members
+    are quiescent), the integration is restarted without them.
+
+    Parameters
+    ----------
+    I_app, v_ca: arrays (or scalars) of values of the parameters, one for
+                 each member of the ensemble
+    y0: initial conditions, array of size (batch, 2)
+    dt: integration time step
+    Nstep: maximum number of steps to be performed
+    every: only one step every ''every'' steps is given to the detector (default: 1)
+    chunk_size: number of samples given at once to the detector (default: 1000)
+    verbose: if True, the progress of the integration is printed (default: False)
+    return_state: if True, the last state of each member is returned too
+                  (default: False)
+
+    Returns
+    -------
+    frequency: array of size batch with the firing frequency in Hz (nan for
+               the members that do not fire)
+    state: (only if return_state is True) array of size (batch, 2) with the
+           state of each member when its integration was stopped
+    """
+    y0 = np.array(y0, dtype=np.float64)
+    batch = len(y0)
+    I_app = np.broadcast_to(np.asarray(I_app, dtype=np.float64), batch)
+    v_ca = np.broadcast_to(np.asarray(v_ca, dtype=np.float64), batch)
+    detector = SpikeDetector(batch, threshold=0.0)
+    t0 = 0.0
+    active = np.arange(batch)
+    state = y0.copy()
+    y_start = y0; t_start = t0; steps = 0
+    while len(active) > 0 and steps < Nstep:
+        if verbose:
+            print("Calculating: t =",round(t_start,1),"-",len(active),"values of I_app left")
+        g = morris_lecar(I_app[active], v_ca[active])
+        chunks = RK4_ensemble_chunks(g, dt, y_start, t_start, Nstep-steps,
+                                     chunk_size=chunk_size, record_every=every)
+        for time, sol in STATS.timed('integration', chunks):
+            with STATS.stage('peak detection'):
+                detector.update(time, sol[:,0,:], active)
+            done = detector.done[active]
+            if np.any(done):
+                break
+        performed = int(round((time[-1]-t0)/dt))-steps
+        STATS.add('integration', nfev=4*performed, steps=performed)
+        steps += performed
+        state[active] = sol[:,:,-1]
+        y_start = sol[~done,:,-1]; t_start = time[-1]
+        active = active[~done]
+    if return_state:
+        return detector.frequency, state
+    return detector.frequency
+
+def frequency_sweep(I_app_values, v_ca, y0, dt, Nstep, max_rounds=None, margin=2,
+                    verbose=False, **kwargs):
+    """ Warm-started sweep of the applied current: the integration at each
+    value of I_app starts from the state reached at the previous value (in
+    the given order), as when the current is changed slowly in an experiment;
+    the first value starts from y0. Sweeping the current upwards and then
+    downwards shows the hysteresis of the bistable region of class 2 neurons.
+
+    At the edges of the bistable region the firing state of a value depends
+    on the exact state it starts from (e.g. on the phase of the cycle of the
+    previous value), which depends in turn on the whole sweep before it. Thus:
+      - in a first round every value is integrated at once as an ensemble,
+        starting from y0, to locate the changes of the firing state (firing
+        or quiescent);
+      - the values are then integrated one at a time, each from the state of
+        the previous one, from the first value until ''margin'' values past
+        the last change of the first round have the firing state they had
+        in it, so that up to there the result is the one of a sequential
+        sweep;
+      - the values left are integrated again as an ensemble, each starting
+        from the last state of the previous value, in rounds: after the
+        first one a value is integrated again only if the previous value
+        has changed its firing state, until no firing state changes.
+    The values left, which do not cross a change of the firing state, are on
+    the same attractor they would reach in a sequential sweep, and their
+    frequencies agree with it within the tolerance of the spike detector.
+
+    Parameters
+    ----------
+    I_app_values: array of values of the applied current, in the order of the sweep
+    v_ca: parameter of the model that discriminates different classes of neurons
+    y0: initial condition of the first value of the sweep
+    dt: integration time step
+    Nstep: maximum number of steps to be performed for each value in each round
+    max_rounds: maximum number of rounds of the values left after the
+                sequential part (default: number of values)
+    margin: number of values past the last change of the firing state that
+            are integrated one at a time (default: 2)
+    verbose: if True, the progress of the rounds is printed (default: False)
+    The other keyword arguments (every, chunk_size) are given to firing_frequency.
+
+    Returns
+    -------
+    frequency: array with the firing frequency in Hz of each value (nan if
+               it does not fire)
+    state: array of size (len(I_app_values), 2) with the last state of each
+           value, e.g. to start a sweep in the opposite direction
+
+    Examples
+    --------
+    >>> I_app_values = np.linspace(50,65,31)
+    >>> up, state = frequency_sweep(I_app_values, 0.0, [-40.46,0.00914], 0.01, 20000)
+    >>> down, state = frequency_sweep(I_app_values[::-1], 0.0, state[-1], 0.01, 20000)
+    >>> np.min(I_app_values[~np.isnan(up)]), np.min(I_app_values[::-1][~np.isnan(down)])
+    (58.5, 56.0)
+    """
+    I_app_values = np.asarray(I_app_values, dtype=np.float64)
+    n = len(I_app_values)
+    if max_rounds is None:
+        max_rounds = n
+    seed = np.zeros([n,2])
+    seed[:] = y0
+    if verbose:
+        print("Sweep: first round -",n,"values of I_app")
+    frequency, state = firing_frequency(I_app_values, v_ca, seed, dt, Nstep,
+                                        return_state=True, **kwargs)
+    firing = ~np.isnan(frequency)
+    changes = np.nonzero(firing[1:] != firing[:-1])[0]+1
+
+    """ Sequential part, up to ''margin'' values past the last change that
+    agree with the first round """
+    stop = 0
+    if len(changes) > 0:
+        first_round = firing.copy()
+        agree = 0
+        while stop < n and agree < margin:
+            if verbose:
+                print("Sweep: sequential - I_app =",I_app_values[stop])
+            start = y0 if stop == 0 else state[stop-1]
+            f_k, state_k = firing_frequency(I_app_values[stop:stop+1], v_ca,
+                                            np.reshape(start, (1,2)), dt, Nstep,
+                                            return_state=True, **kwargs)
+            frequency[stop] = f_k[0]; state[stop] = state_k[0]
+            firing[stop] = ~np.isnan(f_k[0])
+            if stop >= changes[-1]:
+                agree = agree+1 if firing[stop] == first_round[stop] else 0
+            stop += 1
+
+    """ Rounds of the values left, starting from the previous states """
+    todo = np.arange(stop, n)
+    for rounds in range(1,max_rounds+1):
+        if len(todo) == 0:
+            break
+        if verbose:
+            print("Sweep: round",rounds,"-",len(todo),"values of I_app")
+        seed[1:] = state[:-1]
+        previous = firing.copy()
+        frequency[todo], state[todo] = firing_frequency(I_app_values[todo], v_ca,
+                                           seed[todo], dt, Nstep, return_state=True,
+                                           **kwargs)
+        firing = ~np.isnan(frequency)
+        """ The values to be integrated again follow a value whose firing
+        state has changed in this round """
+        changed = todo[firing[todo] != previous[todo]]
+        todo = changed[changed < n-1]+1
+    return frequency, state
+
+def classify(I_app, v_ca, v0=0.0, w0=0.0, dt=0.01, Nstep=5000):
+    """ Labels the cells (I_app[k], v_ca[k]) of the plane of the parameters
+
+    Parameters
+    ----------
+    I_app, v_ca: arrays of the same size with the coordinates of the cells
+    v0, w0: initial condition of the integration (default: 0, 0)
+    dt: integration time step (default: 0.01)
+    Nstep: maximum number of steps to be performed (default: 5000)
+
+    Returns
+    -------
+    n_eq: number of equilibria of each cell
+    n_stable: number of stable equilibria of each cell
+    frequency: firing frequency in Hz of each cell (nan if it does not fire)
+    """
+    I_app = np.asarray(I_app, dtype=np.float64)
+    v_ca = np.asarray(v_ca, dtype=np.float64)
+    n_eq = np.zeros(len(I_app), dtype=np.int64)
+    n_stable = np.zeros(len(I_app), dtype=np.int64)
+
+    """ Equilibria and their stability, for each value of v_ca of the cells """
+    for value in np.unique(v_ca):
+        cells = np.nonzero(v_ca == value)[0]
+        values, inverse = np.unique(I_app[cells], return_inverse=True)
+        I_eq, V, w = equilibria(values, value)
+        J = Jf(V, w, I_eq, value)
+        det = J[0][0]*J[1][1]-J[0][1]*J[1][0]
+        trace = J[0][0]+J[1][1]
+        stable = (det > 0) & (trace < 0)
+        index = np.searchsorted(values, I_eq)
+        n_eq[cells] = np.bincount(index, minlength=len(values))[inverse]
+        n_stable[cells] = np.bincount(index, weights=stable,
+                                      minlength=len(values))[inverse]
+
+    y0 = np.zeros([len(I_app),2])
+    y0[:,0] = v0; y0[:,1] = w0
+    frequency = firing_frequency(I_app, v_ca, y0, dt, Nstep)
+    return n_eq, n_stable, frequency
+
+def classify_tile(tile):
+    """ Function executed by the processes of the pool: tile is a tuple
+    (I_app, v_ca, kwargs) with the cells of the tile and the keyword
+    arguments of classify """
+    I_app, v_ca, kwargs = tile
+    return classify(I_app, v_ca, **kwargs)
+
+def classification_map(I_app_values, v_ca_values, workers=None, tile_size=64,
+                       progress=True, **kwargs):
+    """ Classification map of the Morris Lecar model on the grid of values
+    of I_app and v_ca
+
+    Parameters
+    ----------
+    I_app_values: array of values of the applied current
+    v_ca_values: array of values of the parameter v_ca
+    workers: number of processes of the pool (default: number of cores);
+             if 1, the tiles are computed in the present process
+    tile_size: number of cells computed by each task; the cells of a tile
+               are integrated at once as an ensemble (default: 64)
+    progress: if True, the percentage of tiles computed is printed (default: True)
+    The other keyword arguments (v0, w0, dt, Nstep) are given to classify.
+
+    Returns
+    -------
+    result: ClassificationMap object with the arrays of size
+            (len(v_ca_values), len(I_app_values)) ''n_eq'', ''n_stable'',
+            ''frequency'', ''firing'', ''category'' (index in CATEGORIES) and
+            ''label''. The result does not depend on the number of processes
+            nor on the order in which the tiles are completed.
+
+    Examples
+    --------
+    >>> result = classification_map(np.linspace(0,100,101), np.array([-12.,0.]))
+    >>> result.label[:,[10,56,60]]
+    array([['rest', 'firing', 'firing'],
+           ['rest', 'bistable', 'firing']], dtype='<U8')
+    """
+    I_grid, v_grid = np.meshgrid(I_app_values, v_ca_values)
+    I_cells = I_grid.ravel(); v_cells = v_grid.ravel()
+    n_cells = len(I_cells)
+    starts = list(range(0,n_cells,tile_size))
+    tiles = [(I_cells[s:s+tile_size], v_cells[s:s+tile_size], kwargs) for s in starts]
+
+    n_eq = np.zeros(n_cells, dtype=np.int64)
+    n_stable = np.zeros(n_cells, dtype=np.int64)
+    frequency = np.zeros(n_cells)
+    def store(k, res):
+        s = starts[k]
+        n_eq[s:s+tile_size], n_stable[s:s+tile_size], frequency[s:s+tile_size] = res
+
+    if workers is None:
+        workers = os.cpu_count()
+    if workers == 1:
+        for k in range(0,len(tiles)):
+            store(k, classify_tile(tiles[k]))
+            if progress:
+                print("Calculating:",round((k+1)*100/len(tiles),1),"%")
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(classify_tile, tile): k for k, tile in enumerate(tiles)}
+            done = 0
+            for future in concurrent.futures.as_completed(futures):
+                store(futures[future], future.result())
+                done += 1
+                if progress:
+                    print("Calculating:",round(done*100/len(tiles),1),"%")
+
+    shape = I_grid.shape
+    return ClassificationMap(I_grid, v_grid, n_eq.reshape(shape),
+                             n_stable.reshape(shape), frequency.reshape(shape))
+
+# %%
@@ -0,0 +1,144 @@
+# =============================================================================
+# 
+# SCRIPT FOR THE CLASSIFICATION MAP OF THE MORRIS LECAR MODEL
+# Each cell of a grid of values of I_app and v_ca is labelled with the
+# number of equilibria, their stability, the firing state and frequency
+# The grid is computed in parallel on a pool of processes
+# Classification map and frequency map are generated
+# 
+# Several parameters must be parsed in order to run the algorithm:
+#   --Imin  minimum value of applied current analysed
+#   --Imax  maximum value of applied current analysed 
+#   --nI    number of values of applied current
+#   --vmin  minimum value of v_ca analysed
+#   --vmax  maximum value of v_ca analysed
+#   --nv    number of values of v_ca
+#   --dt    integration time step
+#   --Nstep maximum number of integration steps to be performed
+#   --v0    initial condition on the voltage
+#   --w0    initial condition of the fraction of opened channels
+#   --workers number of processes of the pool
+#   --tile  number of cells computed by each task of the pool
+#   --out   name of the generated figure
+#
+# =============================================================================
+
+import argparse
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--Imin")
+parser.add_argument("--Imax")
+parser.add_argument("--nI")
+parser.add_argument("--vmin")
+parser.add_argument("--vmax")
+parser.add_argument("--nv")
+parser.add_argument("--dt")
+parser.add_argument("--Nstep")
+parser.add_argument("--v0")
+parser.add_argument("--w0")
+parser.add_argument("--workers")
+parser.add_argument("--tile")
+parser.add_argument("--out")
+
+config = {}
+opts = parser.parse_args()
+
+if opts.Imin:
+    Imin = float(opts.Imin)
+else:
+    Imin = 0
+if opts.Imax:
+    Imax = float(opts.Imax)
+else:
+    Imax = 100
+if opts.nI:
+    nI = int(opts.nI)
+else:
+    nI = 101
+if opts.vmin:
+    vmin = float(opts.vmin)
+else:
+    vmin = -25
+if opts.vmax:
+    vmax = float(opts.vmax)
+else:
+    vmax = 5
+if opts.nv:
+    nv = int(opts.nv)
+else:
+    nv = 31
+if opts.dt:
+    dt = float(opts.dt)
+else:
+    dt = 0.01
+if opts.Nstep:
+    Nstep = int(opts.Nstep)
+else:
+    Nstep = 5000
+if opts.v0:
+    v0 = float(opts.v0)
+else:
+    v0 = 0
+if opts.w0:
+    w0 = float(opts.w0)
+else:
+    w0 = 0
+if opts.workers:
+    workers = int(opts.workers)
+else:
+    workers = None
+if opts.tile:
+    tile = int(opts.tile)
+else:
+    tile = 64
+
+if opts.out:
+    save = True
+    out = opts.out
+else:
+    save = False
+
+# %%
+
+from fixed_parameters import *
+from classification import classification_map, CATEGORIES
+import matplotlib.pyplot as plt
+from matplotlib.colors import ListedColormap
+
+# %%
+
+""" Set the grid of values of I_app and v_ca """
+I_app_values = np.linspace(Imin,Imax,nI)
+v_ca_values = np.linspace(vmin,vmax,nv)
+
+if __name__ == '__main__':
+    """ Label all the cells of the grid: the tiles are spread on a pool of
+        processes and each of them is integrated at once as an ensemble.
+        The guard is needed where the processes of the pool import the script
+        instead of being forked from it (e.g. on Windows) """
+    result = classification_map(I_app_values, v_ca_values, workers=workers,
+                                tile_size=tile, v0=v0, w0=w0, dt=dt, Nstep=Nstep)
+    print("Done: 100.0 %")
+
+    """ Classification map and frequency map """
+    extent = [Imin, Imax, vmin, vmax]
+    colors = ListedColormap(['tab:blue','tab:red','tab:purple','lightgray'])
+    fig, (ax1, ax2) = plt.subplots(1,2,figsize=(18,7))
+    im = ax1.imshow(result.category, origin='lower', aspect='auto', extent=extent,
+                    cmap=colors, vmin=-0.5, vmax=len(CATEGORIES)-0.5,
+                    interpolation='nearest')
+    cbar = fig.colorbar(im, ax=ax1, ticks=range(0,len(CATEGORIES)))
+    cbar.ax.set_yticklabels(CATEGORIES)
+    ax1.contour(I_app_values, v_ca_values, result.n_eq, levels=[1.5,2.5],
+                colors='black', linestyles='--', linewidths=1)
+    ax1.set_xlabel('$I_{app}$',fontsize=18); ax1.set_ylabel('$v_{ca}$',fontsize=18)
+    im = ax2.imshow(result.frequency, origin='lower', aspect='auto', extent=extent,
+                    interpolation='nearest')
+    fig.colorbar(im, ax=ax2, label='Frequency [Hz]')
+    ax2.set_xlabel('$I_{app}$',fontsize=18); ax2.set_ylabel('$v_{ca}$',fontsize=18)
+    if save == True:
+        plt.savefig(out+'.png')
+    plt.show()
+
+# %%
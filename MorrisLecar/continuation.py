@@ -0,0 +1,200 @@
+# =============================================================================
+#
+# CONTINUATION OF THE EQUILIBRIA OF THE MORRIS LECAR MODEL
+# The curve of the equilibria in the space (V, w, I_app) is followed with
+# the pseudo-arclength continuation method: at each step a predictor along
+# the tangent to the curve is corrected with the Newton algorithm, and the
+# step length is adapted to the number of Newton iterations needed.
+# Along the curve, the determinant and the trace of the jacobian matrix are
+# monitored to locate the saddle-node (fold) and Hopf bifurcations.
+#
+# source: Y.A. Kuznetsov, 'Elements of Applied Bifurcation Theory',
+#         Springer (2004), Chapter 10
+#
+# =============================================================================
+
+from fixed_parameters import *
+from model import f1, f2, df1dx, df1dy, df2dx, df2dy
+from equilibria import equilibria
+
+""" Scale of the unknowns (V, w, I_app) in the arclength """
+SCALE = np.array([1.0, 0.01, 1.0])
+
+class Branch:
+    def __init__(self, I_app, V, w, det, trace, special):
+        self.I_app = I_app
+        self.V = V
+        self.w = w
+        self.det = det
+        self.trace = trace
+        self.stable = (det > 0) & (trace < 0)
+        self.special = special
+
+def G(u, v_ca):
+    """ Vector field at the point u = (V, w, I_app) """
+    return np.array([f1(u[0],u[1],u[2],v_ca), f2(u[0],u[1],u[2],v_ca)])
+def DG(u, v_ca):
+    """ Jacobian matrix (2x3) of the vector field with respect to (V, w, I_app) """
+    return np.array([[df1dx(u[0],u[1],u[2],v_ca), df1dy(u[0],u[1],u[2],v_ca), 1/c],
+                     [df2dx(u[0],u[1],u[2],v_ca), df2dy(u[0],u[1],u[2],v_ca), 0.0]])
+def det_trace(u, v_ca):
+    """ Determinant and trace of the jacobian matrix (2x2) of the model """
+    J = DG(u, v_ca)
+    return J[0,0]*J[1,1]-J[0,1]*J[1,0], J[0,0]+J[1,1]
+
+def tangent(u, v_ca, previous=None):
+    """ Unit tangent to the curve of equilibria (in scaled unknowns): it is
+    orthogonal to both rows of the scaled jacobian matrix. The orientation
+    follows the previous tangent or, if not given, increasing I_app """
+    J = DG(u, v_ca)*SCALE
+    t = np.cross(J[0], J[1])
+    t = t/np.linalg.norm(t)
+    if previous is None:
+        return t if t[2] >= 0 else -t
+    return t if np.dot(t, previous) >= 0 else -t
+
+def correct(u_pred, t, v_ca, tol=1e-10, max_iter=10):
+    """ Newton algorithm on the extended system
+        G(u) = 0,  t.(u-u_pred)/SCALE = 0
+    Returns the corrected point and the number of iterations, or None if the
+    algorithm did not converge """
+    u = u_pred.copy()
+    for n in range(1,max_iter+1):
+        H = np.append(G(u, v_ca), np.dot(t, (u-u_pred)/SCALE))
+        DH = np.vstack([DG(u, v_ca)*SCALE, t])
+        try:
+            dz = np.linalg.solve(DH, -H)
+        except np.linalg.LinAlgError:
+            return None, n
+        u = u + dz*SCALE
+        if np.linalg.norm(dz) < tol*(1+np.linalg.norm(u/SCALE)):
+            return u, n
+    return None, max_iter
+
+def locate(u0, t0, s0, s1, tau0, tau1, test, v_ca, tol=1e-12, max_iter=30):
+    """ Locates the zero of the test function along the arc between the
+    arclength s0 (test value tau0) and s1 (test value tau1) from the point u0,
+    with the secant method safeguarded as regula falsi (Illinois variant) """
+    u = u0
+    for n in range(0,max_iter):
+        s = s1 - tau1*(s1-s0)/(tau1-tau0)
+        u, it = correct(u0+s*t0*SCALE, t0, v_ca)
+        if u is None:
+            return None
+        tau = test(u)
+        if abs(tau) < tol or abs(s1-s0) < tol:
+            return u
+        if (tau > 0) == (tau1 > 0):
+            s1, tau1 = s, tau
+            tau0 = 0.5*tau0
+        else:
+            s0, tau0 = s1, tau1
+            s1, tau1 = s, tau
+    return u
+
+def continuation(V0, w0, I0, v_ca, Imin, Imax, ds=0.5, ds_min=1e-6, ds_max=5.0,
+                 max_steps=10000):
+    """ Pseudo-arclength continuation of a branch of equilibria
+
+    Parameters
+    ----------
+    V0, w0, I0: starting equilibrium of the branch
+    v_ca: parameter of the model that discriminates different classes of neurons
+    Imin, Imax: the continuation stops when I_app leaves [Imin, Imax]; the
+                last point of the branch is the one at the boundary
+    ds: initial step length (default: 0.5)
+    ds_min, ds_max: minimum and maximum step length (default: 1e-6 and 5)
+    max_steps: maximum number of steps (default: 10000)
+
+    Returns
+    -------
+    branch: Branch object with the arrays ''I_app'', ''V'', ''w'' of the points
+            of the branch (ordered along the curve), ''det'' and ''trace'' of
+            the jacobian matrix and ''stable'' (boolean) at each point.
+            ''special'' is a list of the bifurcation points found along the
+            branch, each one a tuple ('fold' or 'hopf', I_app, V, w).
+
+    Examples
+    --------
+    >>> branch = continuation(-67.614, 0.000141, 0.0, -12.0, 0.0, 100.0)
+    >>> branch.special
+    [('fold', 13.84..., -52.58..., 0.00142...)]
+    >>> branch.I_app[-1], branch.V[-1]
+    (0.0, -41.63...)
+    """
+    u, it = correct(np.array([V0, w0, I0], dtype=np.float64),
+                    np.array([0.0, 0.0, 1.0]), v_ca)
+    if u is None:
+        raise ValueError('The starting point is not an equilibrium')
+    t = tangent(u, v_ca)
+    det, trace = det_trace(u, v_ca)
+    points = [u]; dets = [det]; traces = [trace]; special = []
+
+    for n in range(0,max_steps):
+        """ Predictor along the tangent and corrector, with adaptive step """
+        u_new, it = correct(u+ds*t*SCALE, t, v_ca)
+        if u_new is None:
+            ds = 0.5*ds
+            if ds < ds_min:
+                break
+            continue
+        det_new, trace_new = det_trace(u_new, v_ca)
+
+        """ Fold: the determinant changes sign. Hopf: the trace changes
+        sign while the determinant is positive """
+        found = []
+        if (det > 0) != (det_new > 0):
+            found.append(('fold', lambda p: det_trace(p, v_ca)[0], det, det_new))
+        if det > 0 and det_new > 0 and (trace > 0) != (trace_new > 0):
+            found.append(('hopf', lambda p: det_trace(p, v_ca)[1], trace, trace_new))
+        for kind, test, tau0, tau1 in found:
+            p = locate(u, t, 0.0, ds, tau0, tau1, test, v_ca)
+            if p is not None:
+                special.append((kind, p[2], p[0], p[1]))
+                pdet, ptrace = det_trace(p, v_ca)
+                points.append(p); dets.append(pdet); traces.append(ptrace)
+
+        """ The branch ends exactly where I_app leaves [Imin, Imax] """
+        if u_new[2] < Imin or u_new[2] > Imax:
+            bound = Imin if u_new[2] < Imin else Imax
+            p = locate(u, t, 0.0, ds, u[2]-bound, u_new[2]-bound,
+                       lambda p: p[2]-bound, v_ca)
+            if p is not None:
+                pdet, ptrace = det_trace(p, v_ca)
+                points.append(p); dets.append(pdet); traces.append(ptrace)
+            break
+
+        t = tangent(u_new, v_ca, t)
+        u, det, trace = u_new, det_new, trace_new
+        points.append(u); dets.append(det); traces.append(trace)
+        if it <= 3:
+            ds = min(1.3*ds, ds_max)
+        elif it > 5:
+            ds = max(0.7*ds, ds_min)
+
+    points = np.array(points)
+    return Branch(points[:,2], points[:,0], points[:,1], np.array(dets),
+                  np.array(traces), special)
+
+def branches(v_ca, Imin, Imax, **kwargs):
+    """ Continuation of all the branches of equilibria that cross I_app = Imin.
+    A branch is started from each equilibrium at Imin that is not already
+    the end point of a previous branch (a branch that folds back to Imin).
+    The keyword arguments are given to the function continuation.
+
+    Returns
+    -------
+    branches: list of Branch objects
+    """
+    I_eq, V_eq, w_eq = equilibria(np.array([Imin]), v_ca)
+    result = []
+    for V0, w0 in zip(V_eq, w_eq):
+        visited = False
+        for branch in result:
+            if abs(branch.V[-1]-V0) < 1e-3 and abs(branch.I_app[-1]-Imin) < 1e-6:
+                visited = True
+        if not visited:
+            result.append(continuation(V0, w0, Imin, v_ca, Imin, Imax, **kwargs))
+    return result
+
+# %%
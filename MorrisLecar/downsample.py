@@ -0,0 +1,197 @@
+# =============================================================================
+#
+# DOWNSAMPLING OF LONG TRACES FOR PLOTTING
+# A trace with millions of samples is drawn on a few hundred pixels: most
+# of the samples are not visible, but rendering them takes longer than the
+# integration. The traces are reduced before they are plotted:
+#   - time series: the samples are split in buckets of consecutive samples
+#     (about one bucket per pixel of the width of the axes) and the first,
+#     the last, the minimum and the maximum of each bucket are kept, so that
+#     the peaks and the troughs of the spikes are exact samples of the trace;
+#   - phase plane: the samples are mapped to the pixels of the axes, the
+#     consecutive samples within the same pixel are merged and the segments
+#     between two pixels already drawn are skipped, so that a limit cycle
+#     run through many times is drawn once.
+# Both reductions work on the whole trace or on chunks of it (e.g. read from
+# a memory map), keeping only the reduced trace in memory.
+#
+# =============================================================================
+
+import numpy as np
+
+""" Number of samples above which the plots of a trace are downsampled """
+THRESHOLD = 20000
+
+""" Number of samples of the chunks read from a long trace """
+CHUNK_SIZE = 2**20
+
+def minmax_indices(y, bucket):
+    """ Indices of the samples kept in the buckets of ''bucket'' consecutive
+    samples of the rows of y (array of size (rows, samples)): the first, the
+    last, and the minimum and the maximum of each row in each bucket """
+    y = np.atleast_2d(y)
+    n = y.shape[1]
+    m = n//bucket
+    starts = np.arange(0,n,bucket)
+    kept = [starts, np.minimum(starts+bucket, n)-1]
+    if m > 0:
+        full = y[:,:m*bucket].reshape(len(y),m,bucket)
+        kept += [starts[:m]+np.argmin(full,axis=2), starts[:m]+np.argmax(full,axis=2)]
+    if m*bucket < n:
+        tail = y[:,m*bucket:]
+        kept += [m*bucket+np.argmin(tail,axis=1), m*bucket+np.argmax(tail,axis=1)]
+    return np.unique(np.concatenate([np.ravel(k) for k in kept]))
+
+class MinMax:
+    def __init__(self, bucket):
+        """ Min/max downsampling of a time series given chunk by chunk
+
+        Parameters
+        ----------
+        bucket: number of consecutive samples of each bucket
+
+        Examples
+        --------
+        >>> reducer = MinMax(bucket=1000)
+        >>> for i in range(0,len(t),10**6):
+        >>>     reducer.update(t[i:i+10**6], sol[:,i:i+10**6])
+        >>> t_plot, sol_plot = reducer.result()
+        """
+        self.bucket = bucket
+        self.t = []
+        self.y = []
+        self.tail_t = np.zeros(0)
+        self.tail_y = None
+
+    def update(self, t, y):
+        """ Adds the samples y (array of size (rows, samples), or a single
+        row) at the times t. The samples of the last incomplete bucket are
+        kept until the following chunk """
+        t = np.concatenate([self.tail_t, t])
+        y = np.atleast_2d(y)
+        if self.tail_y is not None:
+            y = np.concatenate([self.tail_y, y], axis=1)
+        m = (len(t)//self.bucket)*self.bucket
+        index = minmax_indices(y[:,:m], self.bucket) if m > 0 else []
+        self.t.append(t[index]); self.y.append(y[:,index])
+        self.tail_t = t[m:].copy(); self.tail_y = y[:,m:].copy()
+
+    def result(self):
+        """ Times and samples kept, with the ones of the last bucket """
+        t, y = self.t, self.y
+        if len(self.tail_t) > 0:
+            index = minmax_indices(self.tail_y, self.bucket)
+            t = t+[self.tail_t[index]]; y = y+[self.tail_y[:,index]]
+        return np.concatenate(t), np.concatenate(y, axis=1)
+
+def minmax(t, y, n_buckets):
+    """ Min/max downsampling of the whole time series y (rows of samples)
+    at the times t in about n_buckets buckets: at most 4*n_buckets samples
+    are kept, among which the minimum and the maximum of each bucket
+
+    Examples
+    --------
+    >>> t, V = minmax(time, sol[0], 1000)
+    """
+    reducer = MinMax(max(1, -(-len(t)//n_buckets)))
+    reducer.update(t, y)
+    t_kept, y_kept = reducer.result()
+    if np.ndim(y) == 1:
+        return t_kept, y_kept[0]
+    return t_kept, y_kept
+
+# %%
+
+class PixelPath:
+    def __init__(self, x_range, y_range, shape):
+        """ Reduction of a path in the plane to the pixels of the axes,
+        given chunk by chunk
+
+        Parameters
+        ----------
+        x_range, y_range: limits of the axes
+        shape: number of pixels (width, height) of the axes
+
+        Examples
+        --------
+        >>> path = PixelPath((-100,50), (-0.1,0.4), (750,480))
+        >>> for i in range(0,len(t),10**6):
+        >>>     path.update(sol[0,i:i+10**6], sol[1,i:i+10**6])
+        >>> V, w = path.result()
+        """
+        self.x0 = x_range[0]
+        self.y0 = y_range[0]
+        self.sx = shape[0]/(x_range[1]-x_range[0])
+        self.sy = shape[1]/(y_range[1]-y_range[0])
+        self.shape = shape
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.last = None
+        self.x = []
+        self.y = []
+
+    def pixels(self, x, y):
+        """ Index of the pixel of each point; the points outside the axes
+        are moved to a frame of pixels around them """
+        px = np.clip(np.floor((x-self.x0)*self.sx), -1, self.shape[0]).astype(np.int64)+1
+        py = np.clip(np.floor((y-self.y0)*self.sy), -1, self.shape[1]).astype(np.int64)+1
+        return px*(self.shape[1]+2)+py
+
+    def update(self, x, y):
+        """ Adds the points (x, y) to the path: the points are kept where
+        the pixel changes, and only the segments between two pixels not
+        drawn before are kept; the path is broken (nan) where segments are
+        skipped """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if self.last is not None:
+            x = np.concatenate([[self.last[0]], x]); y = np.concatenate([[self.last[1]], y])
+        if len(x) == 0:
+            return
+        p = self.pixels(x, y)
+        i = np.concatenate([[0], np.nonzero(p[1:] != p[:-1])[0]+1])
+        x, y, p = x[i], y[i], p[i]
+        self.last = (x[-1], y[-1])
+        if len(p) < 2:
+            return
+        """ Key of each segment, from the pixels of its ends: the new
+        segments are the first occurrences of the keys not seen before """
+        n_pixels = (self.shape[0]+2)*(self.shape[1]+2)
+        keys = p[:-1]*n_pixels+p[1:]
+        first = np.zeros(len(keys), dtype=bool)
+        first[np.unique(keys, return_index=True)[1]] = True
+        new = first & ~np.isin(keys, self.seen)
+        self.seen = np.union1d(self.seen, keys[new])
+
+        """ The ends of the new segments are kept; two consecutive points
+        kept are joined only if the segment between them is new """
+        kept = np.zeros(len(p), dtype=bool)
+        kept[:-1] |= new; kept[1:] |= new
+        index = np.nonzero(kept)[0]
+        if len(index) == 0:
+            return
+        gap = ~((np.diff(index) == 1) & new[index[:-1]])
+        position = np.arange(len(index))+np.concatenate([[0], np.cumsum(gap)])
+        xo = np.full(len(index)+np.sum(gap)+1, np.nan)
+        yo = np.full(len(xo), np.nan)
+        xo[position] = x[index]; yo[position] = y[index]
+        self.x.append(xo); self.y.append(yo)
+
+    def result(self):
+        """ Points of the reduced path, with nan where the path is broken """
+        if len(self.x) == 0:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate(self.x), np.concatenate(self.y)
+
+def pixel_path(x, y, x_range, y_range, shape):
+    """ Reduction of the whole path (x, y) to the pixels of the axes (see
+    PixelPath)
+
+    Examples
+    --------
+    >>> V, w = pixel_path(sol[0], sol[1], (-100,50), (-0.1,0.4), (750,480))
+    """
+    path = PixelPath(x_range, y_range, shape)
+    path.update(x, y)
+    return path.result()
+
+# %%
@@ -0,0 +1,160 @@
+# =============================================================================
+#
+# EQUILIBRIA OF THE MORRIS LECAR MODEL
+# At equilibrium dw/dt = 0, i.e. w = w_inf(V): the equilibria of the model
+# are the zeros of the function of the only voltage
+#   F(V) = f1(V, w_inf(V))
+# The function is evaluated on a grid of voltages for all the values of
+# I_app at once, within an interval that contains all the equilibria of the
+# currents (see voltage_range); each change of sign gives a bracket that contains exactly
+# one equilibrium; all the brackets are refined at once with the Newton
+# algorithm in array mode (safeguarded by the bisection method).
+#
+# =============================================================================
+
+from fixed_parameters import *
+from newton import newton
+from model import f, Jf, f1, df1dx, df1dy, w_inf
+from stability import deduplicate
+from instrument import STATS
+
+def reduced(v, I_app, v_ca):
+    """ Function F(V) = f1(V, w_inf(V)), whose zeros are the equilibria """
+    return f1(v, w_inf(v), I_app, v_ca)
+def dreduced(v, I_app, v_ca):
+    """ Derivative of F(V) with respect to V """
+    dw_inf = 1/(2*theta_k*(np.cosh((v-v_k)/theta_k))**2)
+    w = w_inf(v)
+    return df1dx(v, w, I_app, v_ca) + df1dy(v, w, I_app, v_ca)*dw_inf
+
+def voltage_range(I_app_values):
+    """ Interval of voltages that contains all the equilibria of the applied
+    currents I_app_values, for any v_ca. At equilibrium
+        I_app = g_ca*m_inf(V)*(V-E_ca) + g_k*w_inf(V)*(V-E_k) + g_leak*(V-E_leak)
+    and, since m_inf and w_inf are between 0 and 1, the first two terms are
+    negative below min(E_k,E_ca) and positive above max(E_k,E_ca): there the
+    equilibria are bounded by the ones of the leak current only """
+    I_app_values = np.asarray(I_app_values, dtype=np.float64)
+    v_min = min(E_k, E_ca, E_leak+np.min(I_app_values)/g_leak)
+    v_max = max(E_k, E_ca, E_leak+np.max(I_app_values)/g_leak)
+    return v_min, v_max
+
+def equilibria(I_app_values, v_ca, v_min=None, v_max=None, n_grid=1601):
+    """ Finds all the equilibria of the Morris Lecar model for several values
+    of the applied current
+
+    Parameters
+    ----------
+    I_app_values: array of values of the applied current
+    v_ca: parameter of the model that discriminates different classes of neurons
+    v_min, v_max: interval of voltages where the equilibria are searched
+                  (default: the interval of voltage_range, that contains all
+                  of them; it is [E_k,E_ca] for currents in [-60,240])
+    n_grid: number of points of the voltage grid on [E_k,E_ca]; wider
+            intervals get more points, so that the spacing is kept; two
+            equilibria closer than the grid spacing can be missed
+            (default: 1601)
+
+    Returns
+    -------
+    I_app: array containing, for each equilibrium, the applied current
+    V: array containing the voltage of each equilibrium
+    w: array containing the fraction of opened channels of each equilibrium
+    Exactly one entry is returned for each equilibrium, sorted by I_app and V.
+
+    Examples
+    --------
+    >>> I_app, V, w = equilibria(np.array([0.,40.,80.]), v_ca=-12.0)
+    >>> I_app
+    array([ 0.,  0.,  0., 40., 80.])
+    >>> V
+    array([-67.61..., -41.63..., -18.60..., -16.97..., -15.70...])
+    >>> equilibria(np.array([-65.,-40.]), v_ca=0.0)[1]
+    array([-102.48..., -89.93...])
+    """
+    I_app_values = np.atleast_1d(np.asarray(I_app_values, dtype=np.float64))
+    rows, V = reduced_zeros(I_app_values, v_ca, v_min, v_max, n_grid)
+    return I_app_values[rows], V, w_inf(V)
+
+def reduced_zeros(I_app_values, v_ca, v_min=None, v_max=None, n_grid=1601):
+    """ Zeros of the reduced function for the 1-D arrays I_app_values and
+    v_ca (or a single value of v_ca for all the currents): returns the index
+    of the parameters of each zero and its voltage, sorted by index and V.
+    Interval and grid as for equilibria """
+    if v_min is None or v_max is None:
+        bounds = voltage_range(I_app_values) if len(I_app_values) > 0 else (E_k, E_ca)
+        v_min = bounds[0] if v_min is None else v_min
+        v_max = bounds[1] if v_max is None else v_max
+    spacing = (E_ca-E_k)/(n_grid-1)
+    v_grid = np.linspace(v_min, v_max, max(n_grid, int(np.ceil((v_max-v_min)/spacing))+1))
+    v_ca = np.asarray(v_ca, dtype=np.float64)
+    v_ca_rows = v_ca[:,None] if v_ca.ndim > 0 else v_ca
+
+    with STATS.stage('solve'):
+        """ Evaluate the reduced function on the grid for all the currents """
+        F = reduced(v_grid[None,:], I_app_values[:,None], v_ca_rows)
+        STATS.add('solve', nfev=1)
+        positive = F > 0
+        rows, cols = np.nonzero(positive[:,:-1] != positive[:,1:])
+
+        """ Refine all the brackets at once: the Newton algorithm starts
+        from the middle of each bracket and falls back to the bisection
+        method where its step leaves the bracket """
+        a = v_grid[cols]; b = v_grid[cols+1]
+        res = newton(reduced, dreduced, 0.5*(a+b), eps=1e-10, max_n=100,
+                     args=(I_app_values[rows],v_ca[rows] if v_ca.ndim > 0 else v_ca),
+                     bracket=(a,b))
+        STATS.record('solve', res)
+    return rows, res.x
+
+def newton_sweep(I_app_values, v_ca, p0, eps=1e-8, max_iter=20, tol=1e-5):
+    """ Warm-started sweep of the equilibria: the bidimensional Newton
+    algorithm is applied at each value of I_app (in the given order) starting
+    from the zeros found at the previous value, so that each branch of
+    equilibria is followed with few iterations; the first value starts from
+    the initial guesses p0. A branch that ends at a fold is lost (its guesses
+    do not converge, or converge to another branch), and a branch that is
+    born within the sweep is not found: sweeping in both directions finds
+    the branches born at the two ends of the interval.
+
+    Parameters
+    ----------
+    I_app_values: array of values of the applied current, in the order of the sweep
+    v_ca: parameter of the model that discriminates different classes of neurons
+    p0: initial guesses of the first value, array of size (N,2) of points (V, w)
+    eps, max_iter: precision and maximum number of iterations of the Newton
+                   algorithm (default: 1e-8 and 20)
+    tol: zeros that coincide within tol are the same zero (see deduplicate
+         in stability.py, default: 1e-5)
+
+    Returns
+    -------
+    zeros: list with, for each value of I_app, the array of size (n,2) of
+           the zeros (V, w) found
+    nit: array with, for each value of I_app, the number of iterations of
+         the Newton algorithm performed
+
+    Examples
+    --------
+    >>> p0 = np.column_stack([np.linspace(-50,50,61), np.zeros(61)])
+    >>> zeros, nit = newton_sweep(np.linspace(0,20,5), -12.0, p0)
+    >>> [len(z) for z in zeros], nit
+    ([3, 3, 3, 1, 1], array([ 9,  5,  5, 20,  4]))
+    """
+    seed = np.array(p0, dtype=np.float64)
+    zeros = []
+    nit = np.zeros(len(I_app_values), dtype=np.int64)
+    for i in range(0,len(I_app_values)):
+        with np.errstate(all='ignore'), STATS.stage('solve'):
+            res = newton2_batch(f, Jf, seed, args=(I_app_values[i],v_ca),
+                                eps=eps, max_iter=max_iter)
+        STATS.record('solve', res)
+        nit[i] = np.max(res.nit)
+        x = res.x[res.success]
+        found = x[deduplicate(np.zeros(len(x)), x[:,0], x[:,1], tol)]
+        zeros.append(found)
+        if len(found) > 0:
+            seed = found
+    return zeros, nit
+
+# %%
@@ -1,15 +1,19 @@
-""" Import Libraries """
+""" Import Libraries (matplotlib and pandas are imported only where they
+are used, so that the computations do not need them) """
 import numpy as np
-import matplotlib.pyplot as plt  
-import pandas as pd
-from scipy.signal import find_peaks
 
-""" Import algorithms """
+""" Import algorithms: their folders are found from the one of this file,
+so that the modules can be imported from any working directory """
+import os
 import sys
-sys.path.insert(0, '../rungekutta')
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'RungeKutta'))
 from rk4_system import RK4_system
-sys.path.insert(1, '../newton')
-from newton2 import newton2
+from rk4_ensemble import RK4_ensemble, RK4_ensemble_chunks
+from dopri5 import DOPRI5
+from events import Event, RK4_events
+sys.path.insert(1, os.path.join(ROOT, 'newton'))
+from newton2 import newton2, newton2_batch
 
 """ Fixed Model Parameters """
 # calcium channels
@@ -0,0 +1,136 @@
+# =============================================================================
+#
+# INSTRUMENTATION OF THE ANALYSIS PIPELINES
+# Opt-in collection of the work done by each stage of a pipeline (solve,
+# stability, integration, peak detection): wall time, evaluations of the
+# functions and of the jacobian matrices, iterations and failures of the
+# solvers by reason. The counters of the solvers are read from the Result
+# objects they return. When the instrumentation is disabled (the default)
+# every call returns at once, so that the overhead is negligible.
+#
+# =============================================================================
+
+import time
+import numpy as np
+
+""" Order of the stages in the summary table """
+STAGES = ['solve', 'stability', 'integration', 'peak detection']
+
+class Stage:
+    """ Context manager that adds the wall time of a block to a stage """
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.add(self.name, time=time.perf_counter()-self.start, calls=1)
+        return False
+
+class Disabled:
+    """ Context manager that does nothing """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+DISABLED = Disabled()
+
+class Stats:
+    def __init__(self, enabled=False):
+        """ Counters and timers of the stages of a pipeline
+
+        Parameters
+        ----------
+        enabled: if False, nothing is recorded (default: False)
+
+        Examples
+        --------
+        >>> STATS.enabled = True
+        >>> with STATS.stage('solve'):
+        >>>     res = newton2(f, Jf, [0.1,0.7])
+        >>>     STATS.record('solve', res)
+        >>> print(STATS.summary())
+        stage           calls    time [s]        nfev        njev         nit  failures
+        solve               1      0.0002           4           4           4  -
+        """
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """ Removes all the recorded values """
+        self.counters = {}
+        self.failures = {}
+
+    def stage(self, name):
+        """ Context manager that adds the wall time of the block to the stage """
+        if not self.enabled:
+            return DISABLED
+        return Stage(self, name)
+
+    def timed(self, name, iterable):
+        """ Iterates over iterable (e.g. the chunks yielded by an integrator),
+        adding the time spent to produce each item to the stage """
+        if not self.enabled:
+            return iterable
+        return self.timed_items(name, iter(iterable))
+
+    def timed_items(self, name, iterator):
+        end = object()
+        while True:
+            with self.stage(name):
+                item = next(iterator, end)
+            if item is end:
+                return
+            yield item
+
+    def add(self, name, **counts):
+        """ Adds the given counts (e.g. nfev=100) to the stage """
+        if not self.enabled:
+            return
+        counters = self.counters.setdefault(name, {})
+        for key, value in counts.items():
+            counters[key] = counters.get(key, 0) + value
+
+    def record(self, name, res):
+        """ Adds the counters of a Result (or BatchResult) object of the
+        Newton algorithms to the stage, together with its failures grouped
+        by message """
+        if not self.enabled:
+            return
+        self.add(name, nit=int(np.sum(res.nit)), nfev=int(np.sum(res.nfev)),
+                 njev=int(np.sum(res.njev)))
+        success = np.atleast_1d(res.success)
+        message = np.atleast_1d(res.message)
+        failures = self.failures.setdefault(name, {})
+        for text in message[~success]:
+            failures[str(text)] = failures.get(str(text), 0) + 1
+
+    def summary(self):
+        """ Table with a row for each stage and a column for each counter """
+        names = [s for s in STAGES if s in self.counters]
+        names += sorted(s for s in self.counters if s not in STAGES)
+        columns = ['nfev', 'njev', 'nit']
+        columns += sorted(set(key for name in names for key in self.counters[name])
+                          - set(columns + ['calls', 'time']))
+        lines = ['%-15s %6s %11s'%('stage','calls','time [s]') +
+                 ''.join(' %11s'%key for key in columns) + '  failures']
+        for name in names:
+            counters = self.counters[name]
+            failures = self.failures.get(name, {})
+            lines.append('%-15s %6d %11.4f'%(name,counters.get('calls',0),
+                         counters.get('time',0.0)) +
+                         ''.join(' %11d'%counters[key] if key in counters else
+                                 ' %11s'%'-' for key in columns) + '  ' +
+                         (', '.join('%s: %d'%(text,n) for text, n in
+                                    sorted(failures.items())) if failures else '-'))
+        return '\n'.join(lines)
+
+""" Instrumentation shared by all the modules of the pipelines """
+STATS = Stats()
+
+# %%
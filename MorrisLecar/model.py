@@ -0,0 +1,103 @@
+# =============================================================================
+# 
+# MORRIS LECAR MODEL
+# Vector field of the Morris Lecar model in the vectorized form
+#   dy/dt = f(t,y),  y = [V,w]
+# to be integrated with the Runge Kutta algorithm, and time independent
+# vector field with its jacobian matrix for the bifurcation analysis
+# 
+# =============================================================================
+
+import math
+from fixed_parameters import *
+
+def m_inf(v, v_ca):
+    return 0.5*(1+np.tanh((v-v_ca)/theta_ca))
+def w_inf(v):
+    return 0.5*(1+np.tanh((v-v_k)/theta_k))
+def tau_w(v):
+    return 1/(np.cosh((v-v_k)/(2*theta_k)))
+
+def morris_lecar(I_app, v_ca):
+    """ Vector field of the Morris Lecar model
+    
+    Parameters
+    ----------
+    I_app: external current applied to the model
+    v_ca: parameter of the model that discriminates different classes of neurons
+    
+    Returns
+    -------
+    f: function f(t,y,out=None) that takes the state array y = [V,w] (or an
+       array of states of size (N,2)) and returns the array [dV/dt, dw/dt];
+       if the array ''out'' is given, the result is written in it. The terms
+       depending on V (m_inf, w_inf and tau_w) are computed only once per
+       call, with scalar math for a single state.
+    
+    Examples
+    --------
+    >>> f = morris_lecar(I_app=80.0, v_ca=0.0)
+    >>> t, y = RK4_system(f, dt=0.01, y0=[-25.0,0.0], t0=0.0, Nstep=5000)
+    """
+    def f(t, y, out=None):
+        if y.ndim == 1:
+            """ Single trajectory: scalar math on python floats is faster
+            than indexing and numpy functions on arrays of two elements """
+            v, w = y.tolist()
+            x = (v-v_k)/theta_k
+            w_inf_v = 0.5*(1+math.tanh(x))
+            inv_tau_w = math.cosh(0.5*x)
+            m_inf_v = 0.5*(1+math.tanh((v-v_ca)/theta_ca))
+            if out is None:
+                out = np.zeros(2)
+            out[0] = (g_ca*m_inf_v*(E_ca-v) + g_k*w*(E_k-v) +
+                      g_leak*(E_leak-v) + I_app)/c
+            out[1] = phi_w*(w_inf_v-w)*inv_tau_w
+            return out
+        v = y[...,0]; w = y[...,1]
+        x = (v-v_k)/theta_k
+        w_inf_v = 0.5*(1+np.tanh(x))
+        inv_tau_w = np.cosh(0.5*x)
+        m_inf_v = 0.5*(1+np.tanh((v-v_ca)/theta_ca))
+        if out is None:
+            out = np.zeros(np.shape(v)+(2,))
+        out[...,0] = (g_ca*m_inf_v*(E_ca-v) + g_k*w*(E_k-v) +
+                      g_leak*(E_leak-v) + I_app)/c
+        out[...,1] = phi_w*(w_inf_v-w)*inv_tau_w
+        return out
+    return f
+
+""" Model for Bifurcation Analysis 
+Here we need to remove the temporal dependency. All the functions accept
+arrays of points (x,y) = (V,w) and of parameters I_app, v_ca """
+def f1(x,y,I_app,v_ca):
+    part1 = -g_ca*m_inf(x,v_ca)*(x-E_ca)
+    part2 = -g_k*y*(x-E_k)
+    part3 = -g_leak*(x-E_leak)
+    return (part1+part2+part3+I_app)/c
+def f2(x,y,I_app,v_ca):
+    return phi_w*((w_inf(x)-y)/tau_w(x))    
+
+def df1dx(x,y,I_app,v_ca):
+    part1 = -g_ca*(x-E_ca)/(2*theta_ca*(np.cosh((v_ca-x)/theta_ca))**2)
+    part2 = -g_ca*m_inf(x,v_ca)
+    part3 = -g_k*y
+    part4 = -g_leak
+    return (part1+part2+part3+part4)/c
+def df1dy(x,y,I_app,v_ca):
+    return -g_k*(x-E_k)/c
+
+def df2dx(x,y,I_app,v_ca):
+    part1 = 1/(2*theta_k*(np.cosh((v_k-x)/theta_k))**2)
+    part2 = np.sinh((v_k-x)/(2*theta_k))/(theta_k*(np.cosh((v_k-x)/theta_k)+1))
+    return phi_w*(part1*tau_w(x)-(w_inf(x)-y)*part2)/(tau_w(x))**2
+def df2dy(x,y,I_app,v_ca):
+    return -phi_w/tau_w(x)
+
+def f(x,y,I_app,v_ca):
+    return [f1(x,y,I_app,v_ca),f2(x,y,I_app,v_ca)]
+def Jf(x,y,I_app,v_ca):
+    return [[df1dx(x,y,I_app,v_ca),df1dy(x,y,I_app,v_ca)],
+            [df2dx(x,y,I_app,v_ca),df2dy(x,y,I_app,v_ca)]]
+
+# %%
@@ -0,0 +1,796 @@
+# =============================================================================
+#
+# COMMAND LINE INTERFACE AND API OF THE ANALYSES OF THE MORRIS LECAR MODEL
+# The analyses are available as subcommands of a single entry point:
+#   integrate    numerical integration of the model (see integrate.py)
+#   bifurcation  bifurcation analysis (see bifurcation_analysis.py)
+#   frequency    frequency plot (see frequency_plot.py)
+# and as the functions integrate, bifurcation and frequency, so that e.g. a
+# sweep can be driven from python without spawning processes. Each function
+# returns a result object with the arrays computed, that can be written to
+# a .npz file (save) and plotted (plot). The modules of the analyses are
+# imported only by the subcommand that uses them, and matplotlib only when
+# a figure is drawn.
+#
+# Each subcommand takes the parameters of the corresponding script, e.g.
+#   python morris.py integrate --v_ca 0.0 --I_app 80.0 --v0 -25.0
+# together with the following ones:
+#   --cache    directory of the cache of the results
+#   --no_cache if given, the cache is not used
+#   --stats    if given, the time and the work (function evaluations,
+#              iterations, failures) of each stage are collected and printed
+#   --out      name of the generated figure
+#   --data     name of the file where the computed arrays are written: .npz
+#              or, for the tables of equilibria and frequencies, .parquet or
+#              .h5 (see results.py)
+#   --headless if given, no window is opened: the figure is drawn with a non
+#              interactive backend and written to --out (default: the name
+#              of the subcommand)
+#   --no_plot  if given, no figure is drawn
+#   --block    (bifurcation and frequency) the values of I_app are computed
+#              in blocks of the given size, each one stored in the cache as
+#              soon as it is computed, so that an interrupted sweep resumes
+#
+# =============================================================================
+
+import argparse
+
+class Result:
+    """ Arrays computed by an analysis, with its parameters """
+    def arrays(self):
+        return {}
+
+    def records(self):
+        """ Rows of the result in the columnar storage (see results.py), or
+        None if the result is not a table """
+        return None
+
+    def save(self, name):
+        """ Writes the result to the file ''name'' and returns its name. The
+        rows of a table (see records) are written in the format given by the
+        extension (.npz, .parquet, .h5 or .hdf5, see results.py), the other
+        results as a .npz file with a member for each array; the extension
+        .npz is added if none of these is given. The file is written under a
+        temporary name and then renamed, so that an interrupted run never
+        leaves a corrupted file """
+        import os
+        import tempfile
+        import numpy as np
+        records = self.records()
+        formats = ['.npz', '.parquet', '.h5', '.hdf5'] if records is not None else ['.npz']
+        if os.path.splitext(name)[1].lower() not in formats:
+            name = name+'.npz'
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(name)), suffix='.tmp')
+        if records is not None:
+            from results import ResultWriter, file_format
+            os.close(fd)
+            with ResultWriter(tmp, records.dtype, format=file_format(name)) as writer:
+                writer.append(records)
+        else:
+            with os.fdopen(fd, 'wb') as file:
+                np.savez(file, **self.arrays())
+        os.replace(tmp, name)
+        return name
+
+    def summary(self):
+        """ Text reporting the result (empty if there is nothing to report) """
+        return ''
+
+def open_cache(cache):
+    """ Cache object given by the parameter ''cache'' of the analyses: True
+    for the default directory (see cache.py), the name of a directory, or
+    False for no cache """
+    if not cache:
+        return None
+    from cache import Cache, DIRECTORY
+    return Cache(DIRECTORY if cache is True else cache)
+
+def pyplot(headless=False):
+    """ matplotlib.pyplot, imported only when a figure is drawn; in headless
+    mode the non interactive backend Agg is used, so that no display is needed """
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+# %%
+
+class Integration(Result):
+    def __init__(self, params, time, sol, spike_times=None, message=''):
+        self.params = params
+        self.time = time
+        self.sol = sol
+        self.spike_times = spike_times
+        self.message = message
+
+    def arrays(self):
+        arrays = {'time': self.time, 'V': self.sol[0], 'w': self.sol[1]}
+        if self.spike_times is not None:
+            arrays['spike_times'] = self.spike_times
+        return arrays
+
+    def summary(self):
+        import numpy as np
+        lines = [self.message] if self.message else []
+        times = self.spike_times
+        if times is not None:
+            lines.append('%d spikes found'%len(times))
+            if len(times) > 0:
+                lines.append('spike times: '+np.array2string(times[:10],precision=6)+
+                             (' ...' if len(times) > 10 else ''))
+            if len(times) > 1:
+                lines.append('firing frequency: %.6f Hz'%(1000/np.mean(np.diff(times[-4:]))))
+        return '\n'.join(lines)
+
+    def plot(self, headless=False):
+        """ Plot of the signal and of the phase space with the nullclines """
+        import numpy as np
+        from nullclines import nullclines
+        from downsample import THRESHOLD, CHUNK_SIZE, MinMax, PixelPath
+        plt = pyplot(headless)
+        I_app, v_ca = self.params['I_app'], self.params['v_ca']
+        V_grid, w_V, w_w = nullclines(I_app, v_ca)
+
+        fig, (ax1, ax2) = plt.subplots(1,2,figsize=(15,6))
+        V_plane, w_plane = self.sol[0], self.sol[1]
+        time, V = self.time, self.sol[0]
+        x_range = (min(V_grid[0], np.nanmin(self.sol[0])), max(V_grid[-1], np.nanmax(self.sol[0])))
+        if len(self.time) > THRESHOLD:
+            """ Long traces are reduced to about the pixels of the axes, chunk
+            by chunk so that a memory map is never loaded as a whole """
+            box1, box2 = ax1.get_window_extent(), ax2.get_window_extent()
+            series = MinMax(max(1, -(-len(self.time)//int(box2.width))))
+            plane = PixelPath(x_range, (-0.1,0.4), (int(box1.width), int(box1.height)))
+            for start in range(0,len(self.time),CHUNK_SIZE):
+                chunk = slice(start, start+CHUNK_SIZE)
+                series.update(self.time[chunk], self.sol[0,chunk])
+                plane.update(self.sol[0,chunk], self.sol[1,chunk])
+            time, V = series.result(); V = V[0]
+            V_plane, w_plane = plane.result()
+        ax1.plot(V_plane, w_plane, color='blue')
+        ax1.plot(V_grid, w_V, color='black', linestyle='--', linewidth=1)
+        ax1.plot(V_grid, w_w, color='black', linestyle='--', linewidth=2)
+        ax1.set_xlabel('V',fontsize=18); ax1.set_ylabel('w',fontsize=18)
+        ax1.set_xlim(x_range); ax1.set_ylim([-0.1,0.4])
+        ax2.plot(time, V, 'b')
+        ax2.set_xlabel('Time', fontsize=18); ax2.set_ylabel('Voltage',fontsize=18)
+        ax1.grid(linestyle=':'); ax2.grid(linestyle=':')
+        return fig
+
+def integrate(v_ca=0.0, I_app=0.0, dt=0.01, Nstep=10000, v0=0.0, w0=0.0, every=1,
+              memmap=None, method='rk4', rtol=1e-6, atol=1e-9, spikes=False,
+              cache=True, verbose=False):
+    """ Integration of the Morris Lecar model (see integrate.py)
+
+    Parameters
+    ----------
+    v_ca, I_app: parameters of the model
+    dt: integration time step
+    Nstep: number of integration steps to be performed
+    v0, w0: initial condition
+    every: only one step every ''every'' steps is stored
+    memmap: name of a .npy file where the solution is written through a
+            memory map while it is generated (the cache is not used)
+    method: 'rk4' (fixed step) or 'dopri5' (adaptive step)
+    rtol, atol: tolerances of the adaptive step algorithm
+    spikes: if True, the times of the spikes (upward crossings of V = 0) are
+            located with the event detection of the integrator
+    cache: directory of the cache of the results, True for the default one
+           or False if the cache is not used (default: True)
+    verbose: if True, the use of the cache is printed
+
+    Returns
+    -------
+    res: Integration object with the times ''time'', the solution ''sol''
+         (array of size (2, Nstep//every+1)) and the times of the spikes
+         ''spike_times'' (None if spikes is False)
+
+    Examples
+    --------
+    >>> res = integrate(v_ca=0.0, I_app=80.0, Nstep=5000, v0=-25.0, spikes=True)
+    >>> res.spike_times[:3]
+    array([ 0.29223 ,  8.832859, 17.322785])
+    """
+    import numpy as np
+    from fixed_parameters import RK4_system, DOPRI5, Event, RK4_events
+    from model import morris_lecar
+    from instrument import STATS
+
+    g = morris_lecar(I_app, v_ca)
+    t0 = 0.0
+    y0 = [v0,w0]
+
+    """ The trajectory is looked up in the cache by the hash of all the
+        parameters needed to compute it """
+    params = dict(v_ca=v_ca, I_app=I_app, dt=dt, Nstep=Nstep, v0=v0, w0=w0, method=method)
+    if every > 1:
+        params.update(every=every)
+    if method == 'dopri5':
+        params.update(rtol=rtol, atol=atol)
+    store = open_cache(cache) if not memmap else None
+    stored = None
+    if store is not None:
+        key = store.key('trajectory', **params)
+        stored = store.get(key)
+
+    message = ''
+    if stored is not None:
+        time, sol = stored[0], stored[1:]
+    elif method == 'dopri5':
+        """ Adaptive step integration: the solution is then
+        sampled on the uniform grid of time steps every*dt """
+        with STATS.stage('integration'):
+            res = DOPRI5(g, t0, t0+Nstep*dt, y0, rtol=rtol, atol=atol)
+        STATS.add('integration', nfev=res.nfev, steps=res.naccept, rejected=res.nreject)
+        message = '%s: %d accepted steps, %d rejected steps, %d function evaluations'%(
+                  res.message,res.naccept,res.nreject,res.nfev)
+        Nrec = Nstep//every+1
+        if memmap:
+            solution = np.lib.format.open_memmap(memmap, mode='w+', dtype=np.float64,
+                                                 shape=(3, Nrec))
+        else:
+            solution = np.zeros([3, Nrec])
+        time, sol = solution[0], solution[1:]
+        time[:] = t0 + every*dt*np.arange(0,Nrec)
+        for i in range(0,Nrec,10000):
+            sol[:,i:i+10000] = res(time[i:i+10000])
+    else:
+        """ Only one step every ''every'' steps is stored; with memmap the
+        steps are written to the file while they are generated """
+        with STATS.stage('integration'):
+            time, sol = RK4_system(g, dt, y0, t0, Nstep, record_every=every, out=memmap)
+        STATS.add('integration', nfev=4*Nstep, steps=Nstep)
+    if verbose and memmap:
+        print('Solution written to',memmap)
+    if store is not None:
+        if stored is None:
+            store.put(key, np.vstack([time, sol]))
+        if verbose:
+            print(store.summary())
+
+    spike_times = None
+    if spikes:
+        """ The spikes are the upward crossings of V = 0: their times are
+            located within the steps on the interpolant of the solution, which
+            is not stored """
+        spike = Event(lambda t, y: y[0], direction=1)
+        with STATS.stage('peak detection'):
+            res = RK4_events(g, dt, y0, t0, Nstep, [spike])
+        STATS.add('peak detection', nfev=4*res.nstep+1, steps=res.nstep)
+        spike_times = res.t_events[0]
+    return Integration(params, time, sol, spike_times, message)
+
+# %%
+
+class Bifurcation(Result):
+    def __init__(self, params, table=None, curves=None, hopf=None, families=None,
+                 iterations=None):
+        self.params = params
+        self.table = table
+        self.curves = curves
+        self.families = families
+        self.hopf = hopf
+        self.iterations = iterations
+
+    def arrays(self):
+        """ Columns of the table of the equilibria or, with the continuation,
+        the points of the branches (the index of the branch of each point in
+        ''branch''), the bifurcation points and the periodic orbits """
+        import numpy as np
+        if self.table is not None:
+            return {'I_app': self.table.I_app, 'V': self.table.V, 'w': self.table.w,
+                    'trace': self.table.trace, 'det': self.table.det,
+                    'code': self.table.code, 'stable': self.table.stable}
+        arrays = {}
+        for name in ['I_app', 'V', 'w', 'det', 'trace', 'stable']:
+            arrays[name] = np.concatenate([getattr(curve, name) for curve in self.curves])
+        arrays['branch'] = np.repeat(np.arange(len(self.curves)),
+                                     [len(curve.I_app) for curve in self.curves])
+        special = [point for curve in self.curves for point in curve.special]
+        arrays['special_kind'] = np.array([point[0] for point in special], dtype=str)
+        arrays['special'] = np.array([point[1:] for point in special]).reshape(-1,3)
+        if self.families is not None:
+            for name in ['I_app', 'T', 'V_max', 'V_min', 'stable']:
+                arrays['orbit_'+name] = np.concatenate([getattr(family, name)
+                                                        for family in self.families])
+            arrays['orbit_family'] = np.repeat(np.arange(len(self.families)),
+                                               [len(family.I_app) for family in self.families])
+        return arrays
+
+    def records(self):
+        """ Rows of the table of the equilibria (None with the continuation) """
+        if self.table is None:
+            return None
+        return self.table.to_records(self.params['v_ca'])
+
+    def summary(self):
+        import numpy as np
+        lines = []
+        if self.curves is not None:
+            for curve in self.curves:
+                for kind, I_app, V, w in curve.special:
+                    lines.append('%s bifurcation: I_app = %.6f, V = %.6f, w = %.6f'%(
+                                 kind,I_app,V,w))
+        for I_h, family in zip(self.hopf or [], self.families or []):
+            lines.append('periodic orbits born at I_app = %.6f: %d orbits, '
+                         'I_app in [%.6f, %.6f], period in [%.6f, %.6f]'%(I_h,
+                         len(family.I_app),np.min(family.I_app),np.max(family.I_app),
+                         np.min(family.T),np.max(family.T)))
+            change = np.nonzero(family.stable[1:-1] != family.stable[2:])[0]+1
+            for k in change:
+                lines.append('    stability of the orbits changes at I_app = %.6f, '
+                             'period = %.6f'%(family.I_app[k],family.T[k]))
+        if self.iterations is not None:
+            lines.append('Newton iterations per value of I_app: %.1f on average, %d at '
+                         'the first value'%(np.mean(np.concatenate(self.iterations)),
+                                            self.iterations[0][0]))
+        if self.table is not None:
+            for kind, n in self.table.counts().items():
+                lines.append('%s: %d points'%(kind,n))
+        return '\n'.join(lines)
+
+    def plot(self, headless=False):
+        """ Bifurcation diagram: solid line for stable points, dashed line
+        for unstable points """
+        import numpy as np
+        plt = pyplot(headless)
+        fig = plt.figure(figsize=(15,10))
+        if self.table is not None:
+            """ The unstable points are split in the upper and in the lower branch """
+            table = self.table
+            stab = table.select(table.stable)
+            unstab_up = table.select(~table.stable & (table.V > -30))
+            unstab_down = table.select(~table.stable & (table.V < -30))
+            plt.plot(stab.I_app,stab.V,'b')
+            plt.plot(unstab_up.I_app,unstab_up.V,'b--')
+            plt.plot(unstab_down.I_app,unstab_down.V,'b--')
+        else:
+            for curve in self.curves:
+                st = np.where(curve.stable, curve.V, np.nan)
+                unst = np.where(curve.stable, np.nan, curve.V)
+                change = np.nonzero(curve.stable[:-1] != curve.stable[1:])[0]
+                for k in change:
+                    st[k:k+2] = curve.V[k:k+2]
+                plt.plot(curve.I_app,st,'b')
+                plt.plot(curve.I_app,unst,'b--')
+                for kind, I_app, V, w in curve.special:
+                    plt.plot(I_app,V,'ko' if kind=='fold' else 'rs')
+            """ Maximum and minimum of V along the periodic orbits """
+            for family in self.families or []:
+                change = np.nonzero(family.stable[1:-1] != family.stable[2:])[0]+1
+                for V_ext in [family.V_max, family.V_min]:
+                    st = np.where(family.stable, V_ext, np.nan)
+                    unst = np.where(family.stable, np.nan, V_ext)
+                    for k in change:
+                        st[k:k+2] = V_ext[k:k+2]
+                    plt.plot(family.I_app,st,'g')
+                    plt.plot(family.I_app,unst,'g--')
+        plt.ylim(self.params['v0min'],self.params['v0max'])
+        plt.xlabel('$I_{app}$',fontsize=18)
+        plt.ylabel('V',fontsize=18)
+        plt.grid(linestyle=':')
+        return fig
+
+def bifurcation(v_ca=0.0, Imin=0.0, Imax=100.0, v0min=-50.0, v0max=50.0, solver='bracket',
+                continuation=False, orbits=False, sweep='cold', cache=True, block=None,
+                verbose=False):
+    """ Bifurcation analysis of the Morris Lecar model (see bifurcation_analysis.py)
+
+    Parameters
+    ----------
+    v_ca: parameter of the model
+    Imin, Imax: interval of the applied current analysed
+    v0min, v0max: interval of the initial guesses of the voltage (solver
+                  'newton2') and of the voltage shown in the diagram
+    solver: 'bracket' (reduction to the voltage and bracketing) or 'newton2'
+            (Newton algorithm from several initial guesses)
+    continuation: if True, the branches of equilibria are followed with the
+                  pseudo-arclength continuation method and the fold and Hopf
+                  bifurcations are located
+    orbits: if True (together with continuation), the families of periodic
+            orbits born at the Hopf bifurcations are followed too
+    sweep: 'cold' or 'up', 'down', 'both' (warm-started sweeps, only with
+           solver 'newton2')
+    cache: directory of the cache of the results, True for the default one
+           or False if the cache is not used (default: True)
+    block: if given, the values of I_app are solved in blocks of ''block''
+           values, each one stored in the cache as soon as it is solved
+    verbose: if True, the use of the cache is printed
+
+    Returns
+    -------
+    res: Bifurcation object with the EquilibriumTable ''table'' of the
+         equilibria found on a grid of 200 values of I_app or, with
+         continuation, the list of the Branch objects ''curves'' and the list
+         of the OrbitFamily objects ''families'' (None without orbits)
+
+    Examples
+    --------
+    >>> res = bifurcation(v_ca=0.0, Imin=0, Imax=100)
+    >>> res.table.counts()
+    {'stable node': 52, 'stable focus': 64, 'unstable focus': 84}
+    """
+    if sweep != 'cold' and solver != 'newton2':
+        raise ValueError('warm-started sweeps are used with solver newton2')
+    import numpy as np
+    from fixed_parameters import newton2_batch
+    from stability import equilibrium_table, deduplicate
+    from instrument import STATS
+
+    params = dict(v_ca=v_ca, Imin=Imin, Imax=Imax, v0min=v0min, v0max=v0max)
+    if continuation:
+        """ Follow the branches of equilibria that cross I_app = Imin: the
+            stability is known at each point and the bifurcations are located """
+        from continuation import branches
+        curves = branches(v_ca, Imin, Imax)
+        families = None
+        hopf = [point[1:] for curve in curves for point in curve.special
+                if point[0] == 'hopf']
+        if orbits:
+            """ Follow the periodic orbits born at each Hopf bifurcation """
+            from periodic_orbits import orbit_family
+            families = [orbit_family(I_h, V_h, w_h, v_ca, Imin, Imax)
+                        for I_h, V_h, w_h in hopf]
+        return Bifurcation(params, curves=curves, hopf=[point[0] for point in hopf],
+                           families=families)
+
+    from model import f, Jf
+    from equilibria import equilibria, newton_sweep
+    from cache import sweep as cached_sweep
+
+    """ Set I_app values and v0_values to draw bifurcation diagram """
+    I_app_values = np.linspace(Imin,Imax,200)
+    v0_values = np.linspace(v0min,v0max,61)
+    w0 = 0.0
+
+    def zeros(I_app_values):
+        """ Zeros of the function for each value of I_app, as arrays of rows (V, w) """
+        if solver == 'bracket':
+            """ Find the zeros of the function as zeros of the function of the only
+                voltage f1(V,w_inf(V)): exactly one point is found for each zero """
+            I_eq, V_eq, w_eq = equilibria(I_app_values, v_ca)
+            return [np.column_stack([V_eq[I_eq == I_app], w_eq[I_eq == I_app]])
+                    for I_app in I_app_values]
+        """ Find the zeros of the function: the bidimensional Newton algorithm
+            is applied at once to all the couples (I_app, v0), each couple being
+            a lane of the batched algorithm with its own value of I_app """
+        I_grid, v0_grid = np.meshgrid(I_app_values, v0_values, indexing='ij')
+        p0 = np.zeros([I_grid.size,2])
+        p0[:,0] = v0_grid.ravel(); p0[:,1] = w0
+        with np.errstate(all='ignore'), STATS.stage('solve'):
+            res = newton2_batch(f, Jf, p0, args=(I_grid.ravel(),v_ca))
+        STATS.record('solve', res)
+        points = res.x.reshape(len(I_app_values),len(v0_values),2)
+        success = res.success.reshape(len(I_app_values),len(v0_values))
+
+        """ The copies of each zero found from different initial guesses are
+            removed at once for all the values of I_app """
+        lane = np.repeat(np.arange(len(I_app_values)), len(v0_values))[success.ravel()]
+        x = points.reshape(-1,2)[success.ravel()]
+        index = deduplicate(lane, x[:,0], x[:,1])
+        lane, x = lane[index], x[index]
+        return np.split(x, np.searchsorted(lane, np.arange(1,len(I_app_values))))
+
+    """ The zeros of each value of I_app are stored in the cache separately:
+        only the values of I_app that are not in the cache are solved """
+    key_params = dict(v_ca=v_ca, solver=solver)
+    if solver == 'newton2':
+        key_params.update(v0min=v0min, v0max=v0max, n_v0=len(v0_values), w0=w0)
+    store = open_cache(cache)
+    iterations = None
+    if sweep == 'cold':
+        points = cached_sweep(store, 'equilibria', 'I_app', I_app_values, zeros,
+                              block=block, **key_params)
+        if verbose and store is not None:
+            print(store.summary())
+    else:
+        """ Warm-started sweep: the Newton algorithm starts from the initial
+            guesses only at the first value of I_app, then from the zeros found
+            at the previous value. Sweeping in both directions also finds the
+            branches that end within the interval """
+        p0 = np.zeros([len(v0_values),2])
+        p0[:,0] = v0_values; p0[:,1] = w0
+        points = [np.zeros([0,2]) for I_app in I_app_values]
+        iterations = []
+        if sweep in ['up','both']:
+            up, nit = newton_sweep(I_app_values, v_ca, p0)
+            points = [np.vstack([p, q]) for p, q in zip(points, up)]
+            iterations.append(nit)
+        if sweep in ['down','both']:
+            down, nit = newton_sweep(I_app_values[::-1], v_ca, p0)
+            points = [np.vstack([p, q]) for p, q in zip(points, down[::-1])]
+            iterations.append(nit)
+        points = [np.unique(p, axis=0) for p in points]
+
+    """ Discriminate stability of all the zeros at once from the trace and the
+        determinant of the jacobian matrix """
+    I_eq = np.repeat(I_app_values, [len(p) for p in points])
+    x = np.concatenate(points)
+    table = equilibrium_table(I_eq, x[:,0], x[:,1], v_ca)
+    return Bifurcation(params, table=table, iterations=iterations)
+
+# %%
+
+class Frequency(Result):
+    def __init__(self, params, I_app, freq, directions):
+        self.params = params
+        self.I_app = I_app
+        self.freq = freq
+        self.directions = directions
+
+    def arrays(self):
+        import numpy as np
+        return {'I_app': self.I_app, 'frequency': self.freq,
+                'directions': np.array(self.directions)}
+
+    def records(self):
+        """ Rows with the frequency at each value of I_app, for each direction
+        of the sweep """
+        import numpy as np
+        from results import FREQUENCY_DTYPE, DIRECTIONS
+        records = np.empty(self.freq.size, dtype=FREQUENCY_DTYPE)
+        records['v_ca'] = self.params['v_ca']
+        records['I_app'] = np.tile(self.I_app, len(self.directions))
+        records['direction'] = np.repeat([DIRECTIONS.index(d) for d in self.directions],
+                                         len(self.I_app))
+        records['frequency'] = self.freq.ravel()
+        return records
+
+    def plot(self, headless=False):
+        """ Plot of the frequency vs I_app; in the bistable region the two
+        directions of a hysteresis sweep differ """
+        plt = pyplot(headless)
+        fig = plt.figure(figsize=(15,10))
+        if len(self.directions) > 1:
+            plt.plot(self.I_app,self.freq[0],label='upward sweep')
+            plt.plot(self.I_app,self.freq[1],'--',label='downward sweep')
+            plt.legend(fontsize=14)
+        else:
+            plt.plot(self.I_app,self.freq[0])
+        plt.xlim(0,100); plt.ylim(0,160)
+        plt.xlabel('$I_{app}$', fontsize=18)
+        plt.ylabel('Frequency [Hz]', fontsize=18)
+        plt.grid(linestyle=':')
+        return fig
+
+def frequency(v_ca=0.0, dt=0.01, Nstep=5000, v0=0.0, w0=0.0, Imin=0.0, Imax=100.0, every=1,
+              method='rk4', rtol=1e-6, atol=1e-9, sweep='cold', cache=True, block=None,
+              verbose=False):
+    """ Firing frequency of the Morris Lecar model as a function of the
+    applied current (see frequency_plot.py)
+
+    Parameters
+    ----------
+    v_ca: parameter of the model
+    dt: integration time step
+    Nstep: number of integration steps to be performed
+    v0, w0: initial condition
+    Imin, Imax: interval of the applied current analysed (two values of
+                I_app per unit of current)
+    every: only one step every ''every'' steps is given to the spike detector
+    method: 'rk4' (fixed step) or 'dopri5' (adaptive step)
+    rtol, atol: tolerances of the adaptive step algorithm
+    sweep: 'cold' (each I_app starts from v0, w0), 'up' or 'down' (each
+           I_app starts from the state reached at the previous one) or
+           'hysteresis' (upwards, then downwards)
+    cache: directory of the cache of the results, True for the default one
+           or False if the cache is not used (default: True)
+    block: if given, the values of I_app are integrated in blocks of ''block''
+           values, each one stored in the cache as soon as it is integrated
+    verbose: if True, the progress and the use of the cache are printed
+
+    Returns
+    -------
+    res: Frequency object with the values of the applied current ''I_app'',
+         the frequencies ''freq'' (array with a row for each direction of the
+         sweep) and the names of the directions ''directions''
+
+    Examples
+    --------
+    >>> res = frequency(v_ca=0.0, v0=-25.0, sweep='hysteresis')
+    >>> res.directions
+    ['up', 'down']
+    """
+    if sweep != 'cold' and method == 'dopri5':
+        raise ValueError('warm-started sweeps are integrated with method rk4')
+    import numpy as np
+    from fixed_parameters import DOPRI5
+    from model import morris_lecar
+    from spikes import SpikeDetector
+    from classification import firing_frequency, frequency_sweep
+    from cache import sweep as cached_sweep
+    from instrument import STATS
+
+    I_app_values = np.linspace(Imin,Imax,int(2*(Imax-Imin))+1)
+    chunk_size = 1000
+    t0 = 0.0
+
+    def frequencies(I_app_values):
+        """ Integrate the model at all the values of I_app at once: each
+            member of the ensemble has its own value of I_app """
+        y0 = np.zeros([len(I_app_values),2])
+        y0[:,0] = v0; y0[:,1] = w0
+        if method == 'dopri5':
+            """ The adaptive step algorithm chooses different time steps for each
+            value of I_app: each solution is sampled on the same uniform grid """
+            time = t0 + every*dt*np.arange(0,Nstep//every+1)
+            detector = SpikeDetector(len(I_app_values), threshold=0.0)
+            for j in range(0,len(I_app_values)):
+                if verbose:
+                    print("Calculating:",round(j*100/len(I_app_values),1),"%")
+                with STATS.stage('integration'):
+                    res = DOPRI5(morris_lecar(I_app_values[j], v_ca), t0, time[-1], y0[j],
+                                 rtol=rtol, atol=atol)
+                STATS.add('integration', nfev=res.nfev, steps=res.naccept,
+                          rejected=res.nreject)
+                for i in range(0,len(time),chunk_size):
+                    V = res(time[i:i+chunk_size])[0]
+                    with STATS.stage('peak detection'):
+                        detector.update(time[i:i+chunk_size], V, [j])
+            return detector.frequency
+        """ The samples are given to the spike detector chunk by chunk: as soon
+        as the frequency of some members has converged (or the members are
+        quiescent), the integration is restarted without them """
+        return firing_frequency(I_app_values, v_ca, y0, dt, Nstep, every=every,
+                                chunk_size=chunk_size, verbose=verbose)
+
+    """ The frequency of each value of I_app is stored in the cache separately:
+        only the values of I_app that are not in the cache are integrated """
+    params = dict(v_ca=v_ca, dt=dt, Nstep=Nstep, v0=v0, w0=w0, every=every, method=method)
+    if method == 'dopri5':
+        params.update(rtol=rtol, atol=atol)
+    store = open_cache(cache)
+    if sweep == 'cold':
+        freq = np.concatenate(cached_sweep(store, 'frequency', 'I_app', I_app_values,
+                                           lambda I: frequencies(I)[:,None], block=block,
+                                           **params))
+        freq = freq[None,:]
+    else:
+        """ Warm-started sweep: each value of I_app starts from the state reached
+        at the previous one. The result depends on the whole sweep, which is
+        stored in the cache as a single array with a row for each direction """
+        def warm_sweep():
+            I_down = I_app_values[::-1]
+            if sweep == 'down':
+                down, state = frequency_sweep(I_down, v_ca, [v0,w0], dt, Nstep, every=every,
+                                              chunk_size=chunk_size, verbose=verbose)
+                return down[None,::-1]
+            up, state = frequency_sweep(I_app_values, v_ca, [v0,w0], dt, Nstep, every=every,
+                                        chunk_size=chunk_size, verbose=verbose)
+            if sweep == 'up':
+                return up[None,:]
+            down, state = frequency_sweep(I_down, v_ca, state[-1], dt, Nstep, every=every,
+                                          chunk_size=chunk_size, verbose=verbose)
+            return np.vstack([up, down[::-1]])
+        key = store.key('frequency_sweep', I_app=I_app_values, sweep=sweep,
+                        **params) if store is not None else None
+        freq = store.get(key) if store is not None else None
+        if freq is None:
+            freq = warm_sweep()
+            if store is not None:
+                store.put(key, freq)
+    if verbose:
+        print("Done: 100.0 %")
+        if store is not None:
+            print(store.summary())
+    directions = ['up', 'down'] if sweep == 'hysteresis' else [sweep]
+    return Frequency(params, I_app_values, freq, directions)
+
+# %%
+
+""" Subcommands: name, function of the analysis and help """
+COMMANDS = [('integrate', integrate, 'numerical integration of the model'),
+            ('bifurcation', bifurcation, 'bifurcation analysis'),
+            ('frequency', frequency, 'frequency of the generated signal vs I_app')]
+
+def parser():
+    """ Parser of the command line: each subcommand takes the parameters of
+    its function. The parameters that are not parsed are left out, so that
+    the defaults of the functions are used """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--cache")
+    common.add_argument("--no_cache", action='store_true')
+    common.add_argument("--stats", action='store_true')
+    common.add_argument("--out")
+    common.add_argument("--data")
+    common.add_argument("--headless", action='store_true')
+    common.add_argument("--no_plot", action='store_true')
+
+    parser = argparse.ArgumentParser(prog='morris')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    commands = {name: subparsers.add_parser(name, parents=[common], help=text,
+                                            argument_default=argparse.SUPPRESS)
+                for name, function, text in COMMANDS}
+
+    p = commands['integrate']
+    p.add_argument("--v_ca", type=float)
+    p.add_argument("--I_app", type=float)
+    p.add_argument("--dt", type=float)
+    p.add_argument("--Nstep", type=int)
+    p.add_argument("--v0", type=float)
+    p.add_argument("--w0", type=float)
+    p.add_argument("--every", type=int)
+    p.add_argument("--memmap")
+    p.add_argument("--method", choices=['rk4','dopri5'])
+    p.add_argument("--rtol", type=float)
+    p.add_argument("--atol", type=float)
+    p.add_argument("--spikes", action='store_true')
+
+    p = commands['bifurcation']
+    p.add_argument("--v_ca", type=float)
+    p.add_argument("--Imin", type=float)
+    p.add_argument("--Imax", type=float)
+    p.add_argument("--v0min", type=float)
+    p.add_argument("--v0max", type=float)
+    p.add_argument("--solver", choices=['bracket','newton2'])
+    p.add_argument("--continuation", action='store_true')
+    p.add_argument("--orbits", action='store_true')
+    p.add_argument("--sweep", choices=['cold','up','down','both'])
+    p.add_argument("--block", type=int)
+
+    p = commands['frequency']
+    p.add_argument("--v_ca", type=float)
+    p.add_argument("--dt", type=float)
+    p.add_argument("--Nstep", type=int)
+    p.add_argument("--v0", type=float)
+    p.add_argument("--w0", type=float)
+    p.add_argument("--Imin", type=float)
+    p.add_argument("--Imax", type=float)
+    p.add_argument("--every", type=int)
+    p.add_argument("--method", choices=['rk4','dopri5'])
+    p.add_argument("--rtol", type=float)
+    p.add_argument("--atol", type=float)
+    p.add_argument("--sweep", choices=['cold','up','down','hysteresis'])
+    p.add_argument("--block", type=int)
+    return parser
+
+def main(argv=None):
+    """ Runs the subcommand given on the command line (or in the list argv):
+    the result is printed, written to the --data file and plotted """
+    args = parser().parse_args(argv)
+    kwargs = vars(args)
+    command = kwargs.pop('command')
+    cache_dir = kwargs.pop('cache'); no_cache = kwargs.pop('no_cache')
+    stats = kwargs.pop('stats')
+    out = kwargs.pop('out'); data = kwargs.pop('data')
+    headless = kwargs.pop('headless'); no_plot = kwargs.pop('no_plot')
+    kwargs['cache'] = False if no_cache else (cache_dir if cache_dir else True)
+    if stats:
+        from instrument import STATS
+        STATS.enabled = True
+
+    sweep = kwargs.get('sweep', 'cold')
+    if command == 'bifurcation' and sweep != 'cold' and kwargs.get('solver') != 'newton2':
+        parser().error('warm-started sweeps are used with --solver newton2')
+    if command == 'frequency' and sweep != 'cold' and kwargs.get('method') == 'dopri5':
+        parser().error('warm-started sweeps are integrated with --method rk4')
+
+    function = {name: function for name, function, text in COMMANDS}[command]
+    res = function(verbose=True, **kwargs)
+    if res.summary():
+        print(res.summary())
+    if stats:
+        print(STATS.summary())
+    if data:
+        print('Data written to', res.save(data))
+
+    if no_plot:
+        return res
+    if headless and not out:
+        out = command
+    fig = res.plot(headless)
+    plt = pyplot(headless)
+    if out:
+        plt.savefig(out+'.png')
+    if headless:
+        plt.close(fig)
+    else:
+        plt.show()
+    return res
+
+if __name__ == '__main__':
+    main()
+
+# %%
@@ -0,0 +1,106 @@
+# =============================================================================
+#
+# NULLCLINES OF THE MORRIS LECAR MODEL
+# Both nullclines are explicit functions w(V):
+#   dV/dt = 0:  w = (I_app - g_ca*m_inf(V)*(V-E_ca) - g_leak*(V-E_leak))
+#                   / (g_k*(V-E_k))
+#   dw/dt = 0:  w = w_inf(V)
+# so they are evaluated directly on a 1-D grid of voltages, for many values
+# of the parameters at once, instead of contouring the vector field on a 2-D
+# grid. The V-nullcline has a pole at V=E_k. The intersections of the
+# nullclines are the equilibria of the model: they are the zeros of the
+# reduced function of equilibria.py, refined with the Newton algorithm in
+# array mode.
+#
+# =============================================================================
+
+from fixed_parameters import *
+from model import m_inf, w_inf
+from equilibria import reduced_zeros
+
+def v_nullcline(V, I_app, v_ca):
+    """ w on the nullcline dV/dt = 0 at the voltages V; V, I_app and v_ca
+    are broadcast together. The value at the pole V=E_k is nan """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = ((I_app - g_ca*m_inf(V,v_ca)*(V-E_ca) - g_leak*(V-E_leak))
+             / (g_k*(V-E_k)))
+    return np.where(V == E_k, np.nan, w)
+
+def w_nullcline(V):
+    """ w on the nullcline dw/dt = 0 at the voltages V """
+    return w_inf(V)
+
+def voltage_grid(v_min=E_k, v_max=E_ca, n_grid=3001):
+    """ Uniform grid of voltages; if the pole E_k is within the interval it is
+    added to the grid, so that the V-nullcline is broken there """
+    V = np.linspace(v_min, v_max, n_grid)
+    if v_min < E_k < v_max:
+        V = np.union1d(V, [E_k])
+    return V
+
+def nullclines(I_app, v_ca, v_min=E_k, v_max=E_ca, n_grid=3001):
+    """ Nullclines of the Morris Lecar model on a grid of voltages
+
+    Parameters
+    ----------
+    I_app: applied current (value or array)
+    v_ca: parameter of the model that discriminates different classes of
+          neurons (value or array, broadcast with I_app)
+    v_min, v_max: interval of voltages (default: [E_k,E_ca], that contains
+                  all the equilibria for currents in [-60,240])
+    n_grid: number of points of the grid (default: 3001)
+
+    Returns
+    -------
+    V: grid of voltages
+    w_V: w on the nullcline dV/dt = 0, of size shape(I_app,v_ca)+(len(V),)
+    w_w: w on the nullcline dw/dt = 0 (it does not depend on the parameters)
+
+    Examples
+    --------
+    >>> V, w_V, w_w = nullclines(I_app=np.array([0.,40.,80.]), v_ca=0.0)
+    >>> w_V.shape
+    (3, 3001)
+    >>> plt.plot(V, w_V[2], 'k--', V, w_w, 'k--')
+    """
+    V = voltage_grid(v_min, v_max, n_grid)
+    I_app = np.asarray(I_app, dtype=np.float64)[...,None]
+    v_ca = np.asarray(v_ca, dtype=np.float64)[...,None]
+    return V, v_nullcline(V, I_app, v_ca), w_nullcline(V)
+
+def intersections(I_app, v_ca, v_min=None, v_max=None, n_grid=1601):
+    """ Intersections of the nullclines, i.e. the equilibria, for all the
+    values of the parameters at once
+
+    Parameters
+    ----------
+    I_app, v_ca: values of the parameters (values or arrays, broadcast together)
+    v_min, v_max: interval of voltages where the intersections are searched
+                  (default: an interval that contains all of them, see
+                  voltage_range in equilibria.py)
+    n_grid: number of points of the grid of the brackets on [E_k,E_ca]; two
+            intersections closer than the grid spacing can be missed
+            (default: 1601)
+
+    Returns
+    -------
+    I_app, v_ca: arrays containing, for each intersection, the parameters
+    V, w: arrays containing the coordinates of each intersection
+    The intersections are sorted by parameters (in the order of the broadcast
+    arrays, flattened) and by V.
+
+    Examples
+    --------
+    >>> I_app, v_ca, V, w = intersections(np.array([0.,80.]), np.array([[-12.],[0.]]))
+    >>> v_ca
+    array([-12., -12., -12., -12.,   0.,   0.])
+    >>> V
+    array([-67.61..., -41.63..., -18.60..., -15.70..., -69.50..., -31.06...])
+    """
+    I_app, v_ca = np.broadcast_arrays(np.asarray(I_app, dtype=np.float64),
+                                      np.asarray(v_ca, dtype=np.float64))
+    I_app = I_app.ravel(); v_ca = v_ca.ravel()
+    rows, V = reduced_zeros(I_app, v_ca, v_min, v_max, n_grid)
+    return I_app[rows], v_ca[rows], V, w_inf(V)
+
+# %%
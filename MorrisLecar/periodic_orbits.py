@@ -0,0 +1,327 @@
+# =============================================================================
+#
+# PERIODIC ORBITS OF THE MORRIS LECAR MODEL
+# The limit cycles of the model are found with the shooting method: the
+# initial state and the period of the orbit are the unknowns of the
+# equation y(T; y0) = y0, solved with the Newton algorithm. The solution
+# and its derivatives (variational equations) are computed with the Runge
+# Kutta algorithm; the orbit can be split in several segments (multiple
+# shooting), integrated at once as an ensemble.
+# The family of cycles born at a Hopf bifurcation is followed in I_app with
+# the pseudo-arclength continuation method, and the stability of each cycle
+# is given by its Floquet multipliers.
+#
+# source: R. Seydel, 'Practical Bifurcation and Stability Analysis',
+#         Springer (2010), Chapter 7
+#
+# =============================================================================
+
+from fixed_parameters import *
+from model import morris_lecar, f1, df1dx, df1dy, Jf
+from continuation import SCALE
+
+class Orbit:
+    def __init__(self, I_app, T, y0, t, y, multipliers, success, nit):
+        self.I_app = I_app
+        self.T = T
+        self.y0 = y0
+        self.t = t
+        self.y = y
+        self.V_max = np.max(y[0])
+        self.V_min = np.min(y[0])
+        self.multipliers = multipliers
+        self.stable = abs(multipliers[1]) < 1
+        self.success = success
+        self.nit = nit
+
+class OrbitFamily:
+    def __init__(self, I_app, T, V0, w0, V_max, V_min, multipliers):
+        self.I_app = I_app
+        self.T = T
+        self.V0 = V0
+        self.w0 = w0
+        self.V_max = V_max
+        self.V_min = V_min
+        self.multipliers = multipliers
+        self.stable = np.abs(multipliers[:,1]) < 1
+
+def variational(I_app, v_ca, T):
+    """ Vector field of the model extended with the variational equations,
+    in the time rescaled by the period (tau = t/T, so that dy/dtau = T f(y)).
+    The state is [V, w, P00, P01, P10, P11, s0, s1, r0, r1], where P is the
+    matrix of the derivatives of (V,w) with respect to the initial state, s
+    and r the vectors of the derivatives with respect to I_app and to T.
+    Since the step in tau does not depend on T, the Runge Kutta solution of
+    the variational equations gives the exact derivatives of the Runge Kutta
+    solution of the model. The terms depending on V are computed only once
+    per call (see morris_lecar in model.py) """
+    def f(t, y, out=None):
+        if out is None:
+            out = np.zeros(np.shape(y))
+        v = y[...,0]; w = y[...,1]
+        x = (v-v_k)/theta_k
+        tanh_k = np.tanh(x)
+        w_inf_v = 0.5*(1+tanh_k)
+        inv_tau_w = np.cosh(0.5*x)
+        tanh_ca = np.tanh((v-v_ca)/theta_ca)
+        m_inf_v = 0.5*(1+tanh_ca)
+        dv = (g_ca*m_inf_v*(E_ca-v) + g_k*w*(E_k-v) + g_leak*(E_leak-v) + I_app)/c
+        dw = phi_w*(w_inf_v-w)*inv_tau_w
+        """ Jacobian matrix [[a, b], [d, e]] of the vector field """
+        a = (g_ca*0.5*(1-tanh_ca**2)/theta_ca*(E_ca-v) - g_ca*m_inf_v -
+             g_k*w - g_leak)/c
+        b = g_k*(E_k-v)/c
+        d = phi_w*(0.5*(1-tanh_k**2)/theta_k*inv_tau_w +
+                   (w_inf_v-w)*np.sinh(0.5*x)/(2*theta_k))
+        e = -phi_w*inv_tau_w
+        out[...,2] = a*y[...,2] + b*y[...,4]
+        out[...,3] = a*y[...,3] + b*y[...,5]
+        out[...,4] = d*y[...,2] + e*y[...,4]
+        out[...,5] = d*y[...,3] + e*y[...,5]
+        out[...,6] = a*y[...,6] + b*y[...,7] + 1/c
+        out[...,7] = d*y[...,6] + e*y[...,7]
+        out[...,8] = a*y[...,8] + b*y[...,9]
+        out[...,9] = d*y[...,8] + e*y[...,9]
+        out *= T
+        out[...,0] = T*dv; out[...,1] = T*dw
+        out[...,8] += dv; out[...,9] += dw
+        return out
+    return f
+
+def shooting(z, v_ca, segments=32, n_steps=32):
+    """ Equations of the (multiple) shooting method
+        y(T/m; y_k) - y_(k+1) = 0,  k = 0,...,m-1  (y_m = y_0)
+        dV/dt(y_0) = 0  (phase condition: the orbit starts at an extremum of V)
+    for the unknowns z = [y_0, ..., y_(m-1), T, I_app], m = segments.
+
+    Returns
+    -------
+    H: array of size 2m+1 with the value of the equations
+    DH: array of size (2m+1, 2m+2) with the jacobian matrix of the equations
+    y: array of size (m, 10, n_steps+1) with the solution of the extended
+       system (see variational) along each segment
+    """
+    m = segments
+    T = z[2*m]; I_app = z[2*m+1]
+    starts = z[:2*m].reshape(m,2)
+    y0 = np.zeros([m,10])
+    y0[:,0:2] = starts
+    y0[:,2] = 1.0; y0[:,5] = 1.0
+    t, y = RK4_ensemble(variational(I_app, v_ca, T), 1/(m*n_steps), y0, 0.0, n_steps)
+    end = y[:,:,-1]
+    P = end[:,2:6].reshape(m,2,2)
+
+    H = np.zeros(2*m+1)
+    DH = np.zeros([2*m+1, 2*m+2])
+    H[:2*m] = (end[:,0:2] - np.roll(starts, -1, axis=0)).ravel()
+    H[2*m] = f1(starts[0,0], starts[0,1], I_app, v_ca)
+    for k in range(0,m):
+        nxt = (k+1) % m
+        DH[2*k:2*k+2, 2*k:2*k+2] += P[k]
+        DH[2*k:2*k+2, 2*nxt:2*nxt+2] -= np.eye(2)
+        DH[2*k:2*k+2, 2*m] = end[k,8:10]
+        DH[2*k:2*k+2, 2*m+1] = end[k,6:8]
+    DH[2*m, 0] = df1dx(starts[0,0], starts[0,1], I_app, v_ca)
+    DH[2*m, 1] = df1dy(starts[0,0], starts[0,1], I_app, v_ca)
+    DH[2*m, 2*m+1] = 1/c
+    return H, DH, y
+
+def floquet(y):
+    """ Floquet multipliers of the orbit, from the solution of the extended
+    system along the segments: eigenvalues of the monodromy matrix, the
+    trivial one (closest to 1) first """
+    M = np.eye(2)
+    for k in range(0,len(y)):
+        M = y[k,2:6,-1].reshape(2,2) @ M
+    mu = np.linalg.eigvals(M)
+    return mu[np.argsort(np.abs(mu-1))]
+
+def trajectory(y):
+    """ Time steps (in units of the segment time step) and states of the
+    whole orbit, joining the segments """
+    states = np.concatenate([y[0,0:2,:1]] + [y[k,0:2,1:] for k in range(0,len(y))],
+                            axis=1)
+    return np.arange(states.shape[1]), states
+
+def scale(segments):
+    """ Scale of the unknowns z = [y_0, ..., y_(m-1), T, I_app]: the starting
+    points are scaled as in continuation.py, divided by sqrt(m) so that the
+    norm measures the change of the orbit and not the number of segments """
+    return np.concatenate([np.tile(SCALE[:2]*np.sqrt(segments), segments),
+                           [1.0, SCALE[2]]])
+
+def periodic_orbit(V0, w0, T0, I_app, v_ca, segments=32, n_steps=32,
+                   tol=1e-9, max_iter=20, max_step=5.0):
+    """ Finds the limit cycle of the Morris Lecar model close to the initial
+    guess with the shooting method
+
+    Parameters
+    ----------
+    V0, w0: initial guess of a point of the orbit (e.g. the last point of a
+            short integration); the orbit found starts at an extremum of V
+    T0: initial guess of the period; the Newton algorithm converges if the
+        guess is within a few percent of the period
+    I_app: external current applied to the model
+    v_ca: parameter of the model that discriminates different classes of neurons
+    segments: number of segments of the multiple shooting method; the
+              segments are integrated at once, so that the time needed by
+              each Newton iteration depends only on n_steps (default: 32)
+    n_steps: number of Runge Kutta steps along each segment (default: 32)
+    tol: tolerance on the Newton correction (default: 1e-9)
+    max_iter: maximum number of Newton iterations (default: 20)
+    max_step: the Newton correction is reduced so that no scaled unknown
+              changes by more than max_step (default: 5)
+
+    Returns
+    -------
+    orbit: Orbit object. ''T'' is the period and ''y0'' the initial state of
+           the orbit, ''t'' and ''y'' the time steps and the array of size
+           (2,len(t)) with the states along the orbit; ''V_max'' and ''V_min''
+           are the extrema of the voltage; ''multipliers'' the Floquet
+           multipliers (the trivial one first) and ''stable'' is True if the
+           non trivial one lies within the unit circle. ''success'' and ''nit''
+           are the convergence flag and the number of Newton iterations.
+
+    Examples
+    --------
+    >>> orbit = periodic_orbit(31.0, 0.1, 7.0, I_app=80.0, v_ca=-12.0)
+    >>> orbit.T, orbit.V_max, orbit.V_min
+    (6.78503285..., 30.3306552..., -78.7843247...)
+    >>> orbit.multipliers
+    array([1.00000000e+00, 3.06870085e-11])
+    """
+    m = segments
+    """ Initial guess of the starting points of the segments """
+    t, y = RK4_system(morris_lecar(I_app, v_ca), T0/(m*n_steps), [V0, w0], 0.0,
+                      m*n_steps)
+    z = np.append(y[:, ::n_steps][:, :m].T.ravel(), [T0, I_app])
+
+    S = scale(m)[:2*m+1]
+    success = False
+    for nit in range(1,max_iter+1):
+        with np.errstate(all='ignore'):
+            H, DH, y = shooting(z, v_ca, m, n_steps)
+            if not np.all(np.isfinite(DH)):
+                break
+            dz = np.linalg.solve(DH[:, :2*m+1]*S, -H)
+        z[:2*m+1] += dz*S*min(1.0, max_step/np.max(np.abs(dz)))
+        if np.linalg.norm(dz) < tol*(1+np.linalg.norm(z[:2*m+1]/S)):
+            success = True
+            H, DH, y = shooting(z, v_ca, m, n_steps)
+            break
+    if not success:
+        return Orbit(I_app, np.nan, np.full(2, np.nan), np.zeros(1),
+                     np.full([2,1], np.nan), np.full(2, np.nan), False, nit)
+    t, states = trajectory(y)
+    return Orbit(I_app, z[2*m], z[:2], t*z[2*m]/(m*n_steps), states, floquet(y),
+                 success, nit)
+
+def correct(z_pred, t, v_ca, segments, n_steps, tol=1e-8, max_iter=10):
+    """ Newton algorithm on the shooting equations extended with the
+    pseudo-arclength condition t.(z-z_pred)/S = 0 (see correct in
+    continuation.py). Returns the corrected unknowns, the jacobian matrix of
+    the shooting equations and the solution along the segments at that
+    point, and the number of iterations; None if it did not converge """
+    S = scale(segments)
+    z = z_pred.copy()
+    for n in range(1,max_iter+1):
+        with np.errstate(all='ignore'):
+            H, DH, y = shooting(z, v_ca, segments, n_steps)
+            H = np.append(H, np.dot(t, (z-z_pred)/S))
+            DH = np.vstack([DH*S, t])
+            if not np.all(np.isfinite(DH)):
+                return None, n
+            try:
+                dz = np.linalg.solve(DH, -H)
+            except np.linalg.LinAlgError:
+                return None, n
+        z = z + dz*S
+        if np.linalg.norm(dz) < tol*(1+np.linalg.norm(z/S)):
+            H, DH, y = shooting(z, v_ca, segments, n_steps)
+            return (z, DH, y), n
+    return None, max_iter
+
+def orbit_family(I_h, V_h, w_h, v_ca, Imin, Imax, segments=32, n_steps=32,
+                 ds=0.5, ds_min=1e-4, ds_max=5.0, T_max=500.0, max_steps=500):
+    """ Pseudo-arclength continuation of the family of periodic orbits born
+    at a Hopf bifurcation
+
+    Parameters
+    ----------
+    I_h, V_h, w_h: Hopf bifurcation point (see continuation.py)
+    v_ca: parameter of the model that discriminates different classes of neurons
+    Imin, Imax: the continuation stops when I_app leaves [Imin, Imax]
+    segments, n_steps: see periodic_orbit; close to a fold of the family the
+                       orbits are very unstable, and a large number of
+                       segments keeps the Newton algorithm well conditioned
+    ds: initial step length (default: 0.5)
+    ds_min, ds_max: minimum and maximum step length (default: 1e-4 and 5)
+    T_max: the continuation stops when the period exceeds T_max, e.g. close
+           to a homoclinic bifurcation (default: 500)
+    max_steps: maximum number of steps (default: 500)
+
+    Returns
+    -------
+    family: OrbitFamily object with the arrays ''I_app'', ''T'' (period),
+            ''V0'', ''w0'' (starting point), ''V_max'', ''V_min'' of the orbits
+            (ordered along the family, the first one being the Hopf point),
+            ''multipliers'' of size (len(I_app),2) with the Floquet multipliers
+            (the trivial one first) and ''stable'' (boolean).
+
+    Examples
+    --------
+    >>> family = orbit_family(57.8827, -36.8190, 0.015891, 0.0, 0.0, 100.0)
+    >>> family.I_app.min()
+    55.765...
+    >>> family.stable[1], family.stable[-1]
+    (False, True)
+    """
+    m = segments
+    S = scale(m)
+    """ At the Hopf point the orbits are the ellipses x_h + Re(q exp(i omega t)),
+    q being the eigenvector of the eigenvalue i omega of the jacobian matrix.
+    q is rotated so that the orbits start at the maximum of V """
+    lam, vec = np.linalg.eig(np.array(Jf(V_h, w_h, I_h, v_ca), dtype=np.float64))
+    k = np.argmax(lam.imag)
+    omega = lam[k].imag
+    q = vec[:,k]*np.conj(vec[0,k])/abs(vec[0,k])
+    T0 = 2*np.pi/omega
+    phase = np.exp(2j*np.pi*np.arange(0,m)/m)
+    z = np.concatenate([np.tile([V_h, w_h], m), [T0, I_h]])
+    t = np.concatenate([np.real(q[None,:]*phase[:,None]).ravel(), [0.0, 0.0]])/S
+    t = t/np.linalg.norm(t)
+
+    I_app = [I_h]; T = [T0]; V0 = [V_h]; w0 = [w_h]
+    V_max = [V_h]; V_min = [V_h]; multipliers = [[1.0, 1.0]]
+    for n in range(0,max_steps):
+        """ Predictor along the tangent and corrector, with adaptive step """
+        res, it = correct(z+ds*t*S, t, v_ca, m, n_steps)
+        if res is None:
+            ds = 0.5*ds
+            if ds < ds_min:
+                break
+            continue
+        z_new, DH, y = res
+        if z_new[2*m+1] < Imin or z_new[2*m+1] > Imax or z_new[2*m] > T_max:
+            break
+        I_app.append(z_new[2*m+1]); T.append(z_new[2*m])
+        V0.append(z_new[0]); w0.append(z_new[1])
+        V_max.append(np.max(y[:,0])); V_min.append(np.min(y[:,0]))
+        multipliers.append(floquet(y))
+
+        """ New tangent: orthogonal to the rows of the scaled jacobian matrix,
+        oriented as the previous one """
+        rhs = np.zeros(2*m+2); rhs[-1] = 1.0
+        t = np.linalg.solve(np.vstack([DH*S, t]), rhs)
+        t = t/np.linalg.norm(t)
+        z = z_new
+        if it <= 4:
+            ds = min(1.3*ds, ds_max)
+        elif it > 6:
+            ds = max(0.7*ds, ds_min)
+
+    multipliers = np.array(multipliers)
+    return OrbitFamily(np.array(I_app), np.array(T), np.array(V0), np.array(w0),
+                       np.array(V_max), np.array(V_min), multipliers)
+
+# %%
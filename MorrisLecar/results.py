@@ -0,0 +1,302 @@
+# =============================================================================
+#
+# COLUMNAR STORAGE OF THE RESULTS
+# The results of the analyses (equilibria with their type, frequencies) are
+# stored as rows of numpy structured arrays, with a column of fixed type for
+# each attribute; the type of equilibrium and the direction of a sweep are
+# categorical columns, i.e. small integer codes whose names are stored
+# together with the data. The rows are appended to a file chunk by chunk
+# through a preallocated buffer, so that a large sweep can be saved while it
+# is computed, and the file is read back chunk by chunk, so that its rows
+# can be filtered without loading the whole file. Three formats are
+# supported, chosen by the extension of the file:
+#   .npz        one .npy member for each chunk (numpy only)
+#   .parquet    one row group for each chunk (needs pyarrow)
+#   .h5, .hdf5  a resizable dataset 'results' (needs h5py)
+#
+# =============================================================================
+
+import os
+import json
+import zipfile
+import numpy as np
+from numpy.lib.recfunctions import repack_fields
+from stability import TYPES
+
+""" Directions of the sweeps of the frequency: the code of each row is its index """
+DIRECTIONS = ['cold', 'up', 'down']
+
+""" Row of the frequency of the signal generated at a value of I_app """
+FREQUENCY_DTYPE = np.dtype([('v_ca', np.float64), ('I_app', np.float64),
+                            ('direction', np.int8), ('frequency', np.float64)])
+
+""" Names of the codes of the categorical columns """
+CATEGORIES = {'code': TYPES, 'direction': DIRECTIONS}
+
+""" Default number of rows of a chunk """
+CHUNK_SIZE = 65536
+
+def file_format(path):
+    """ Format of a file from its extension: 'npz', 'parquet' or 'hdf5' """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ['.h5', '.hdf5']:
+        return 'hdf5'
+    if ext == '.parquet':
+        return 'parquet'
+    return 'npz'
+
+class NpzChunks:
+    """ .npz file with a .npy member for each chunk and a member 'meta' with
+    the dtype of the rows and the names of the categories. Each chunk is
+    added by reopening the archive in append mode: a chunk interrupted while
+    it is written can damage the file, thus the file must be written by a
+    single process """
+    def __init__(self, path, mode='r', meta=None):
+        self.path = path
+        if mode == 'w' or (mode == 'a' and not os.path.exists(path)):
+            with zipfile.ZipFile(path, 'w', allowZip64=True) as archive:
+                with archive.open('meta.npy', 'w') as file:
+                    np.lib.format.write_array(file, np.array(json.dumps(meta)))
+        self.names = self.chunk_names()
+
+    def chunk_names(self):
+        with zipfile.ZipFile(self.path) as archive:
+            return sorted(name[:-4] for name in archive.namelist()
+                          if name.startswith('chunk_'))
+
+    def meta(self):
+        with np.load(self.path) as data:
+            return json.loads(data['meta'].item())
+
+    def write(self, chunk):
+        name = 'chunk_%06d' % len(self.names)
+        with zipfile.ZipFile(self.path, 'a', allowZip64=True) as archive:
+            with archive.open(name+'.npy', 'w', force_zip64=True) as file:
+                np.lib.format.write_array(file, chunk)
+        self.names.append(name)
+
+    def chunks(self):
+        """ The members are loaded one at a time """
+        with np.load(self.path) as data:
+            for name in self.names:
+                yield data[name]
+
+    def close(self):
+        pass
+
+class ParquetChunks:
+    """ Parquet file with a row group for each chunk; the names of the
+    categories are stored in the metadata of the schema. The file is
+    complete only when it is closed, and it cannot be appended to """
+    def __init__(self, path, mode='r', meta=None, dtype=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.path = path
+        self.writer = None
+        if mode == 'r':
+            self.file = pq.ParquetFile(path)
+            return
+        if mode == 'a' and os.path.exists(path):
+            raise ValueError('rows cannot be appended to an existing Parquet file')
+        schema = pa.schema([(name, pa.from_numpy_dtype(dtype[name])) for name in dtype.names],
+                           metadata={'morris': json.dumps(meta)})
+        self.schema = schema
+        self.writer = pq.ParquetWriter(path, schema)
+
+    def meta(self):
+        return json.loads(self.file.schema_arrow.metadata[b'morris'])
+
+    def write(self, chunk):
+        import pyarrow as pa
+        columns = [pa.array(chunk[name]) for name in chunk.dtype.names]
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def chunks(self):
+        for k in range(0,self.file.num_row_groups):
+            table = self.file.read_row_group(k)
+            chunk = np.empty(table.num_rows, dtype=table_dtype(table.schema))
+            for name in chunk.dtype.names:
+                chunk[name] = table.column(name).to_numpy()
+            yield chunk
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def table_dtype(schema):
+    """ Structured dtype of the columns of a pyarrow schema """
+    return np.dtype([(field.name, field.type.to_pandas_dtype()) for field in schema])
+
+class HDF5Chunks:
+    """ HDF5 file with a resizable dataset 'results' of rows; each chunk is
+    appended at the end of the dataset and the names of the categories are
+    stored in its attributes """
+    def __init__(self, path, mode='r', meta=None, dtype=None):
+        import h5py
+        self.file = h5py.File(path, mode)
+        if mode != 'r' and 'results' not in self.file:
+            self.file.create_dataset('results', shape=(0,), maxshape=(None,), dtype=dtype,
+                                     chunks=(min(CHUNK_SIZE, 4096),))
+            self.file['results'].attrs['morris'] = json.dumps(meta)
+        self.dataset = self.file['results']
+
+    def meta(self):
+        return json.loads(self.dataset.attrs['morris'])
+
+    def write(self, chunk):
+        n = self.dataset.shape[0]
+        self.dataset.resize((n+len(chunk),))
+        self.dataset[n:] = chunk
+        self.file.flush()
+
+    def chunks(self):
+        for start in range(0,self.dataset.shape[0],CHUNK_SIZE):
+            yield self.dataset[start:start+CHUNK_SIZE]
+
+    def close(self):
+        self.file.close()
+
+def stored_dtype(meta):
+    """ dtype of the rows from the metadata of a file (JSON turns the tuples
+    of the fields into lists) """
+    return np.dtype([tuple(field) for field in meta['dtype']])
+
+def open_chunks(path, mode='r', meta=None, dtype=None, format=None):
+    fmt = format if format else file_format(path)
+    if fmt == 'npz':
+        return NpzChunks(path, mode, meta)
+    if fmt == 'parquet':
+        return ParquetChunks(path, mode, meta, dtype)
+    if fmt == 'hdf5':
+        return HDF5Chunks(path, mode, meta, dtype)
+    raise ValueError('unknown format %r' % fmt)
+
+# %%
+
+class ResultWriter:
+    def __init__(self, path, dtype, categories=None, chunk_size=CHUNK_SIZE, mode='w',
+                 format=None):
+        """ Writer of rows to a file, chunk by chunk
+
+        Parameters
+        ----------
+        path: name of the file; the extension gives the format (.npz,
+              .parquet, .h5 or .hdf5)
+        dtype: structured dtype of the rows (e.g. EQUILIBRIUM_DTYPE)
+        categories: dictionary with the names of the codes of the categorical
+                    columns (default: the ones of CATEGORIES among the columns)
+        chunk_size: number of rows of each chunk (default: 65536)
+        mode: 'w' to create the file, 'a' to append rows to an existing file
+              (not for Parquet files) (default: 'w')
+        format: format of the file, if not given by the extension ('npz',
+                'parquet' or 'hdf5')
+
+        Examples
+        --------
+        >>> with ResultWriter('equilibria.h5', EQUILIBRIUM_DTYPE) as writer:
+        >>>     for v_ca in np.linspace(-20,10,31):
+        >>>         writer.append(bifurcation(v_ca=v_ca).records())
+        """
+        self.dtype = np.dtype(dtype)
+        if categories is None:
+            categories = {name: CATEGORIES[name] for name in self.dtype.names
+                          if name in CATEGORIES}
+        self.categories = categories
+        """ The rows are gathered in a preallocated buffer and written when
+        it is full """
+        self.buffer = np.empty(chunk_size, dtype=self.dtype)
+        self.n = 0
+        self.rows = 0
+        meta = {'dtype': self.dtype.descr, 'categories': categories}
+        existing = mode == 'a' and os.path.exists(path)
+        self.chunks = open_chunks(path, mode, meta, self.dtype, format)
+        if existing and stored_dtype(self.chunks.meta()) != self.dtype:
+            self.chunks.close()
+            raise ValueError('the rows of %s have a different dtype' % path)
+
+    def append(self, records):
+        """ Appends the rows of the structured array records, whose fields
+        are converted to the ones of the writer """
+        records = np.atleast_1d(records)
+        start = 0
+        while start < len(records):
+            k = min(len(records)-start, len(self.buffer)-self.n)
+            for name in self.dtype.names:
+                self.buffer[name][self.n:self.n+k] = records[name][start:start+k]
+            self.n += k
+            start += k
+            if self.n == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        """ Writes the rows of the buffer as a chunk """
+        if self.n > 0:
+            self.chunks.write(self.buffer[:self.n])
+            self.rows += self.n
+            self.n = 0
+
+    def close(self):
+        self.flush()
+        self.chunks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class ResultFile:
+    def __init__(self, path, format=None):
+        """ Rows stored by a ResultWriter, read chunk by chunk
+
+        Parameters
+        ----------
+        path: name of the file
+        format: format of the file, if not given by the extension
+
+        Examples
+        --------
+        >>> results = ResultFile('equilibria.h5')
+        >>> saddles = results.read(lambda r: r['code'] == TYPES.index('saddle'),
+        >>>                        columns=['v_ca','I_app','V'])
+        >>> results.label(results.read()[:3], 'code')
+        array(['stable focus', 'stable focus', 'stable focus'], dtype='<U14')
+        """
+        self.path = path
+        self.format = format
+        chunks = open_chunks(path, 'r', format=format)
+        meta = chunks.meta()
+        chunks.close()
+        self.dtype = stored_dtype(meta)
+        self.categories = meta['categories']
+
+    def chunks(self):
+        """ Iterates over the chunks of rows of the file """
+        chunks = open_chunks(self.path, 'r', format=self.format)
+        try:
+            for chunk in chunks.chunks():
+                yield chunk
+        finally:
+            chunks.close()
+
+    def read(self, where=None, columns=None):
+        """ Rows of the file selected by where(chunk), a function returning a
+        boolean mask for a chunk of rows (default: all the rows), with only
+        the given columns (default: all of them). Only the selected rows are
+        kept in memory """
+        selected = [np.zeros(0, dtype=self.dtype)]
+        for chunk in self.chunks():
+            if where is not None:
+                chunk = chunk[where(chunk)]
+            selected.append(chunk)
+        records = np.concatenate(selected)
+        if columns is not None:
+            records = repack_fields(records[columns])
+        return records
+
+    def label(self, records, name):
+        """ Names of the codes of the categorical column ''name'' """
+        return np.array(self.categories[name])[records[name]]
+
+# %%
@@ -0,0 +1,149 @@
+# =============================================================================
+#
+# ONLINE SPIKE DETECTOR
+# Spikes of the voltage signal are detected while the signal is generated,
+# chunk by chunk, and the firing frequency is estimated from the
+# inter-spike intervals. The detector also recognizes when the estimate
+# has converged or when the signal is quiescent, so that the integration
+# can be stopped early.
+#
+# =============================================================================
+
+import numpy as np
+
+class SpikeDetector:
+    def __init__(self, batch=1, threshold=0.0, n_isi=3, rtol=1e-3,
+                 window=50.0, v_tol=1e-3):
+        """ Online spike detector for an ensemble of voltage signals
+
+        Parameters
+        ----------
+        batch: number of signals analysed at the same time (default: 1)
+        threshold: a spike is detected when the voltage crosses the threshold
+                   upwards (default: 0)
+        n_isi: number of consecutive inter-spike intervals used to estimate
+               the period of the signal (default: 3)
+        rtol: the estimate of the period has converged when the last n_isi
+              inter-spike intervals differ by less than rtol times their
+              mean (default: 1e-3)
+        window: time window used to detect a quiescent signal (default: 50)
+        v_tol: a signal is quiescent if during a time window no spike occurs
+               and the voltage changes by less than v_tol (default: 1e-3)
+
+        Examples
+        --------
+        >>> detector = SpikeDetector()
+        >>> for t, y in RK4_chunks(f, dt, y0, t0, Nstep, chunk_size=1000):
+        >>>     detector.update(t, y[0])
+        >>>     if detector.done[0]:
+        >>>         break
+        >>> detector.frequency
+        array([88.43910935])
+        """
+        self.batch = batch
+        self.threshold = threshold
+        self.n_isi = n_isi
+        self.rtol = rtol
+        self.window = window
+        self.v_tol = v_tol
+        """ Last sample analysed """
+        self.t_last = np.full(batch, np.nan)
+        self.v_last = np.full(batch, np.nan)
+        """ Spikes and inter-spike intervals (last n_isi) """
+        self.n_spikes = np.zeros(batch, dtype=np.int64)
+        self.last_spike = np.full(batch, np.nan)
+        self.isi = np.full([batch, n_isi], np.nan)
+        self.n_isi_found = np.zeros(batch, dtype=np.int64)
+        """ Status of the signals """
+        self.converged = np.zeros(batch, dtype=bool)
+        self.quiescent = np.zeros(batch, dtype=bool)
+        """ Time window for the quiescent state detection """
+        self.window_start = np.full(batch, np.nan)
+        self.v_min = np.full(batch, np.inf)
+        self.v_max = np.full(batch, -np.inf)
+
+    @property
+    def done(self):
+        """ Boolean array: True if the signal does not need further samples """
+        return self.converged | self.quiescent
+
+    @property
+    def period(self):
+        """ Mean of the last (at most n_isi) inter-spike intervals;
+        nan if less than two spikes have been found or the signal is quiescent """
+        with np.errstate(invalid='ignore'):
+            counts = np.sum(~np.isnan(self.isi), axis=1)
+            period = np.nansum(self.isi, axis=1)/counts
+        period[counts == 0] = np.nan
+        period[self.quiescent] = np.nan
+        return period
+
+    @property
+    def frequency(self):
+        """ Firing frequency in Hz (time is measured in ms) """
+        return 1000/self.period
+
+    def update(self, t, v, index=None):
+        """ Analyses a new chunk of samples
+
+        Parameters
+        ----------
+        t: array of size m with the time of the samples
+        v: array of size (len(index),m) (or m, for a single signal) with the
+           voltage of the samples
+        index: members of the ensemble to which the signals v belong
+               (default: all the members)
+        """
+        if index is None:
+            index = np.arange(self.batch)
+        index = np.asarray(index)
+        t = np.asarray(t, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64).reshape(len(index), len(t))
+
+        """ Threshold crossings, including the one between the last sample
+        of the previous chunk and the first sample of the present one.
+        The time of the crossing is found by linear interpolation """
+        T = np.concatenate([self.t_last[index][:,None],
+                            np.broadcast_to(t, v.shape)], axis=1)
+        V = np.concatenate([self.v_last[index][:,None], v], axis=1)
+        with np.errstate(invalid='ignore'):
+            cross = (V[:,:-1] < self.threshold) & (V[:,1:] >= self.threshold)
+        rows, cols = np.nonzero(cross)
+        t_cross = T[rows,cols] + (self.threshold-V[rows,cols])*\
+                  (T[rows,cols+1]-T[rows,cols])/(V[rows,cols+1]-V[rows,cols])
+        for r, time in zip(rows, t_cross):
+            self.spike(index[r], time)
+
+        """ Quiescent state: no spikes and small changes of voltage
+        within a time window (checked at the end of each chunk) """
+        start = self.window_start[index]
+        start[np.isnan(start)] = t[0]
+        self.window_start[index] = start
+        self.v_min[index] = np.minimum(self.v_min[index], np.min(v, axis=1))
+        self.v_max[index] = np.maximum(self.v_max[index], np.max(v, axis=1))
+        closed = index[t[-1]-start >= self.window]
+        self.quiescent[closed] = self.v_max[closed]-self.v_min[closed] < self.v_tol
+        self.window_start[closed] = t[-1]
+        self.v_min[closed] = v[t[-1]-start >= self.window][:,-1]
+        self.v_max[closed] = self.v_min[closed]
+
+        self.t_last[index] = t[-1]
+        self.v_last[index] = v[:,-1]
+
+    def spike(self, b, time):
+        """ Records a spike of member b at the given time """
+        if self.n_spikes[b] > 0:
+            self.isi[b, self.n_isi_found[b] % self.n_isi] = time-self.last_spike[b]
+            self.n_isi_found[b] += 1
+            if self.n_isi_found[b] >= self.n_isi:
+                isi = self.isi[b]
+                self.converged[b] = np.max(isi)-np.min(isi) < self.rtol*np.mean(isi)
+        self.last_spike[b] = time
+        self.n_spikes[b] += 1
+        """ A spike restarts the time window of the quiescent state detection """
+        self.quiescent[b] = False
+        self.window_start[b] = time
+        self.v_min[b] = np.inf
+        self.v_max[b] = -np.inf
+
+# %%
@@ -0,0 +1,152 @@
+# =============================================================================
+#
+# STABILITY OF THE EQUILIBRIA OF THE MORRIS LECAR MODEL
+# The type of an equilibrium of a bidimensional system is given by the
+# trace T, the determinant D and the discriminant T^2-4D of the jacobian
+# matrix: D < 0 saddle; D > 0 node (T^2-4D >= 0) or focus (T^2-4D < 0),
+# stable if T < 0 and unstable if T > 0. All the equilibria are classified
+# at once, without computing the eigenvalues.
+#
+# source: S.H. Strogatz, 'Nonlinear Dynamics and Chaos', Westview Press
+#         (1994), Section 5.2
+#
+# =============================================================================
+
+from fixed_parameters import *
+from model import Jf
+from instrument import STATS
+
+""" Types of equilibrium: the code of each equilibrium is its index """
+TYPES = ['stable node', 'unstable node', 'stable focus', 'unstable focus',
+         'saddle', 'center', 'degenerate']
+
+""" Row of an equilibrium in the columnar storage of the results (see
+results.py): the type is the categorical column ''code'' """
+EQUILIBRIUM_DTYPE = np.dtype([('v_ca', np.float64), ('I_app', np.float64), ('V', np.float64),
+                              ('w', np.float64), ('trace', np.float64), ('det', np.float64),
+                              ('code', np.int8)])
+
+class EquilibriumTable:
+    def __init__(self, I_app, V, w, trace, det, code):
+        self.I_app = I_app
+        self.V = V
+        self.w = w
+        self.trace = trace
+        self.det = det
+        self.discriminant = trace**2-4*det
+        self.code = code
+        self.stable = (code == 0) | (code == 2)
+
+    def __len__(self):
+        return len(self.I_app)
+
+    @property
+    def label(self):
+        return np.array(TYPES)[self.code]
+
+    def select(self, mask):
+        """ Table with only the rows selected by the boolean or index array mask """
+        return EquilibriumTable(self.I_app[mask], self.V[mask], self.w[mask],
+                                self.trace[mask], self.det[mask], self.code[mask])
+
+    def counts(self):
+        """ Number of equilibria of each type, as a dictionary """
+        n = np.bincount(self.code, minlength=len(TYPES))
+        return {TYPES[k]: int(n[k]) for k in range(0,len(TYPES)) if n[k] > 0}
+
+    def to_frame(self):
+        """ pandas DataFrame with a column for each attribute; the type of
+        each equilibrium is a categorical column """
+        import pandas as pd
+        return pd.DataFrame({'I_app': self.I_app, 'V': self.V, 'w': self.w,
+                             'trace': self.trace, 'det': self.det,
+                             'type': pd.Categorical.from_codes(self.code, TYPES)})
+
+    def to_records(self, v_ca):
+        """ Structured array with a row (of type EQUILIBRIUM_DTYPE) for each
+        equilibrium, with the value v_ca of the parameter of the model """
+        records = np.empty(len(self), dtype=EQUILIBRIUM_DTYPE)
+        records['v_ca'] = v_ca
+        for name in EQUILIBRIUM_DTYPE.names[1:]:
+            records[name] = getattr(self, name)
+        return records
+
+def table_from_records(records):
+    """ EquilibriumTable of the rows of a structured array of type
+    EQUILIBRIUM_DTYPE (e.g. read from a file, see results.py) """
+    return EquilibriumTable(records['I_app'], records['V'], records['w'],
+                            records['trace'], records['det'], records['code'])
+
+def classify(trace, det, tol=1e-12):
+    """ Type of equilibrium (index in TYPES) from the trace and the
+    determinant of the jacobian matrix; values smaller than tol (relative to
+    the scale of the matrix) are considered zero """
+    trace = np.asarray(trace, dtype=np.float64)
+    det = np.asarray(det, dtype=np.float64)
+    scale = tol*(1+trace**2+np.abs(det))
+    disc = trace**2-4*det
+    code = np.full(np.shape(trace), 6, dtype=np.int8)
+    code[det < -scale] = 4
+    positive = det > scale
+    code[positive & (trace < 0) & (disc >= 0)] = 0
+    code[positive & (trace > 0) & (disc >= 0)] = 1
+    code[positive & (trace < 0) & (disc < 0)] = 2
+    code[positive & (trace > 0) & (disc < 0)] = 3
+    code[positive & (np.abs(trace) <= np.sqrt(scale))] = 5
+    return code
+
+def deduplicate(I_app, V, w, tol=1e-5):
+    """ Indices of the distinct equilibria: the points are sorted by I_app
+    and V, so that the copies of the same equilibrium (same I_app, V and w
+    equal within tol, relative to 1+|V| and 1+|w|) are consecutive and only
+    the first one is kept. Returns the indices in sorted order. """
+    I_app = np.asarray(I_app, dtype=np.float64)
+    V = np.asarray(V, dtype=np.float64)
+    w = np.asarray(w, dtype=np.float64)
+    order = np.lexsort((w, V, I_app))
+    I_s, V_s, w_s = I_app[order], V[order], w[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = ((I_s[1:] != I_s[:-1]) |
+               (np.abs(V_s[1:]-V_s[:-1]) > tol*(1+np.abs(V_s[1:]))) |
+               (np.abs(w_s[1:]-w_s[:-1]) > tol*(1+np.abs(w_s[1:]))))
+    return order[new]
+
+def equilibrium_table(I_app, V, w, v_ca, tol=1e-5):
+    """ Table of the distinct equilibria with their type
+
+    Parameters
+    ----------
+    I_app, V, w: arrays with the applied current and the coordinates of the
+                 equilibria; copies of the same equilibrium are removed
+    v_ca: parameter of the model that discriminates different classes of neurons
+    tol: tolerance used to recognize the copies of an equilibrium (default: 1e-5)
+
+    Returns
+    -------
+    table: EquilibriumTable object with the arrays ''I_app'', ''V'', ''w'',
+           ''trace'', ''det'' and ''discriminant'' of the jacobian matrix,
+           ''code'' (index of the type in TYPES, int8), ''stable'' (boolean)
+           and ''label'' (name of the type), sorted by I_app and V
+
+    Examples
+    --------
+    >>> I_app, V, w = equilibria(np.array([0.,40.]), v_ca=-12.0)
+    >>> table = equilibrium_table(np.tile(I_app,2), np.tile(V,2), np.tile(w,2), -12.0)
+    >>> table.V
+    array([-67.61..., -41.63..., -18.60..., -16.97...])
+    >>> table.label
+    array(['stable focus', 'saddle', 'unstable node', 'unstable node'], dtype='<U14')
+    """
+    with STATS.stage('stability'):
+        index = deduplicate(I_app, V, w, tol)
+        I_app = np.asarray(I_app, dtype=np.float64)[index]
+        V = np.asarray(V, dtype=np.float64)[index]
+        w = np.asarray(w, dtype=np.float64)[index]
+        (a, b), (c, d) = Jf(V, w, I_app, v_ca)
+        STATS.add('stability', njev=1, points=len(V))
+        trace = a+d
+        det = a*d-b*c
+        table = EquilibriumTable(I_app, V, w, trace, det, classify(trace, det))
+    return table
+
+# %%
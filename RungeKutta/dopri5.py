@@ -0,0 +1,212 @@
+# =============================================================================
+#
+# DORMAND PRINCE ALGORITHM
+#
+# Adaptive step 5(4) embedded Runge Kutta algorithm (Dormand-Prince) with
+# dense output to solve a system of ODEs
+#   dy1/dt = f1(t,y1,...,yn)
+#   ...
+#   dyn/dt = fn(t,y1,...,yn)
+# or, in vectorized form,
+#   dy/dt = f(t,y)
+#
+# source: E. Hairer, S.P. Norsett, G. Wanner, 'Solving Ordinary Differential
+#         Equations I', Springer (1993), Section II.5 and II.6
+#
+# =============================================================================
+
+import numpy as np
+from rk4_system import vector_field
+from events import EventTracker
+
+""" Butcher tableau of the Dormand Prince method """
+C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+A = [[],
+     [1/5],
+     [3/40, 9/40],
+     [44/45, -56/15, 32/9],
+     [19372/6561, -25360/2187, 64448/6561, -212/729],
+     [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+     [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]]
+""" Difference between the 5th and the 4th order weights (error estimate) """
+E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+""" Coefficients of the continuous extension (dense output) """
+D = np.array([-12715105075/11282082432, 0, 87487479700/32700410799,
+              -10690763975/1880347072, 701980252875/199316789632,
+              -1453857185/822651844, 69997945/29380423])
+
+class Solution:
+    def __init__(self, t, y, success, message, nfev, naccept, nreject, rcont):
+        self.t = t
+        self.y = y
+        self.success = success
+        self.message = message
+        self.nfev = nfev
+        self.naccept = naccept
+        self.nreject = nreject
+        self.rcont = rcont
+        self.t_events = None
+        self.y_events = None
+
+    def __call__(self, t):
+        """ Dense output: evaluates the solution at the times t, that must lie
+        within the integration interval. Returns an array of size (Neq,len(t)) """
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        direction = np.sign(self.t[-1]-self.t[0])
+        i = np.searchsorted(direction*self.t, direction*t, side='right')-1
+        i = np.clip(i, 0, len(self.t)-2)
+        h = self.t[i+1]-self.t[i]
+        theta = (t-self.t[i])/h
+        r = self.rcont[i]
+        return (r[:,0] + theta[:,None]*(r[:,1] + (1-theta[:,None])*(r[:,2] +
+                theta[:,None]*(r[:,3] + (1-theta[:,None])*r[:,4])))).T
+
+def dense(t0, t1, r):
+    """ Dense output of the single step [t0,t1] with coefficients r """
+    def p(t):
+        theta = (t-t0)/(t1-t0)
+        return r[0] + theta*(r[1] + (1-theta)*(r[2] + theta*(r[3] + (1-theta)*r[4])))
+    return p
+
+def rms_norm(x, scale):
+    return np.sqrt(np.mean((x/scale)**2))
+
+def DOPRI5(f, t0, t_end, y0, rtol=1e-6, atol=1e-9, h0=None, max_step=np.inf,
+           max_nstep=1000000, events=None):
+    """ Adaptive step Dormand Prince 5(4) algorithm
+    Solves a set of ODEs of the form
+    dy1/dt = f1(t,y1,...,yn)
+    ...
+    dyn/dt = fn(t,y1,...,yn)
+    from t0 to t_end, choosing the time step so that the local error estimate
+    stays below atol + rtol*|y|. Steps whose error is too large are rejected
+    and repeated with a smaller time step.
+
+    Parameters
+    ----------
+    f: list of functions to be integrated, or a single function f(t,y)
+       returning the array dy/dt (see vector_field in rk4_system.py)
+    t0: initial time
+    t_end: final time
+    y0: list of initial conditions
+    rtol: relative tolerance (default: 1e-6)
+    atol: absolute tolerance (default: 1e-9)
+    h0: initial time step; if None, it is estimated automatically
+    max_step: maximum time step (default: no limit)
+    max_nstep: maximum number of steps (accepted and rejected) to be performed
+    events: list of Event objects (see events.py); the crossings are located
+            on the dense output of each accepted step (default: None)
+
+    Returns
+    -------
+    sol: Solution object. ''t'' is the array of the accepted time steps,
+         ''y'' the array of size (len(y0),len(t)) with the solution at those
+         time steps; ''success'' is a boolean flag indicating if t_end was
+         reached and ''message'' a string containing information on why the
+         algorithm stopped; ''nfev'', ''naccept'', ''nreject'' are the number of
+         evaluations of f, of accepted and of rejected steps. The solution can
+         be evaluated at any time within [t0,t_end] by calling sol(t).
+         If events are given, ''t_events'' and ''y_events'' are the lists
+         with the times and the states of the occurrences of each event; if
+         a terminal event stops the integration, the message is 'Terminal
+         event' and the last step stored is the one containing the event.
+
+    Examples
+    --------
+    >>> def f(t,y):
+    >>>     return -y
+    >>> sol = DOPRI5(f, 0., 1., [1.], rtol=1e-8)
+    >>> sol.y[0][-1]
+    0.36787944...
+    >>> sol(np.linspace(0.,1.,5))[0]
+    array([1.        , 0.77880078, 0.60653066, 0.47236655, 0.36787944])
+    >>> sol = DOPRI5(f, 0., 1., [1.], events=[Event(lambda t, y: y[0]-0.5)])
+    >>> sol.t_events[0]
+    array([0.69314...])
+    """
+    F = vector_field(f)
+    yn = np.array(y0, dtype=np.float64)
+    Neq = len(yn)
+    tn = t0
+    direction = 1.0 if t_end >= t0 else -1.0
+    k = np.zeros([7, Neq])
+    ytmp = np.zeros(Neq)
+
+    F(tn, yn, k[0]); nfev = 1
+    if h0 is None:
+        """ Initial time step (Hairer, Norsett, Wanner, Section II.4) """
+        scale = atol + rtol*np.abs(yn)
+        d0 = rms_norm(yn, scale); d1 = rms_norm(k[0], scale)
+        if d0 < 1e-5 or d1 < 1e-5:
+            h = 1e-6
+        else:
+            h = 0.01*d0/d1
+        h = min(h, abs(t_end-t0))
+        F(tn+direction*h, yn+direction*h*k[0], ytmp); nfev += 1
+        d2 = rms_norm(ytmp-k[0], scale)/h
+        if max(d1,d2) <= 1e-15:
+            h1 = max(1e-6, h*1e-3)
+        else:
+            h1 = (0.01/max(d1,d2))**(1/5)
+        h = min(100*h, h1)
+    else:
+        h = abs(h0)
+    h = min(h, max_step, abs(t_end-t0))
+
+    t = [tn]; y = [yn.copy()]; rcont = []
+    tracker = EventTracker(events, tn, yn) if events else None
+    naccept = 0; nreject = 0
+    success = False
+    message = 'Maximum number of steps reached'
+    for n in range(0,max_nstep):
+        if direction*(t_end-tn) <= 0:
+            success = True
+            message = 'Success'
+            break
+        if abs(h) < 10*np.abs(np.nextafter(tn, direction*np.inf)-tn):
+            message = 'Time step too small'
+            break
+        last = direction*(tn+direction*h-t_end) >= 0
+        if last:
+            h = abs(t_end-tn)
+        dt = direction*h
+        for s in range(1,7):
+            ytmp[:] = yn
+            for j in range(0,s):
+                if A[s][j] != 0:
+                    ytmp += dt*A[s][j]*k[j]
+            F(tn+C[s]*dt, ytmp, k[s])
+        nfev += 6
+        ynew = ytmp.copy()
+
+        """ Local error estimate and new time step """
+        scale = atol + rtol*np.maximum(np.abs(yn), np.abs(ynew))
+        err = rms_norm(dt*np.dot(E, k), scale)
+        if err <= 1:
+            factor = 5.0 if err == 0 else min(5.0, max(0.2, 0.9*err**(-1/5)))
+            ydiff = ynew-yn
+            bspl = dt*k[0]-ydiff
+            rcont.append([yn.copy(), ydiff, bspl, ydiff-dt*k[6]-bspl,
+                          dt*np.dot(D, k)])
+            tn = t_end if last else tn+dt
+            yn = ynew
+            k[0] = k[6]
+            t.append(tn); y.append(yn.copy())
+            naccept += 1
+            if tracker is not None and tracker.step(t[-2], tn, yn, dense(t[-2], tn, rcont[-1])):
+                success = True
+                message = 'Terminal event'
+                break
+        else:
+            factor = max(0.2, 0.9*err**(-1/5))
+            nreject += 1
+        h = min(h*factor, max_step)
+
+    sol = Solution(np.array(t), np.array(y).T, success, message,
+                   nfev, naccept, nreject, np.array(rcont).reshape(-1,5,Neq))
+    if tracker is not None:
+        res = tracker.result(tn, yn, naccept)
+        sol.t_events, sol.y_events = res.t_events, res.y_events
+    return sol
+
+# %%
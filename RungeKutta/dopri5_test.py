@@ -0,0 +1,69 @@
+from dopri5 import DOPRI5
+import numpy as np
+from hypothesis import given, settings
+import hypothesis.strategies as st
+
+@given(st.floats(-10,10),st.floats(0.1,5))
+def test_exponential_decay(y0,r):
+    '''
+    tests if in the monodimensional example
+      dy/dt = -r*y
+    the solution at the final time t=1 is equal to the analitical solution
+    y0*exp(-r) within the required tolerance. The strategy is to vary the
+    initial condition and the constant r.
+    '''
+    def f(t,y):
+        return -r*y
+    sol = DOPRI5(f, 0.0, 1.0, [y0], rtol=1e-10, atol=1e-12)
+    assert sol.success == True
+    assert round(sol.y[0][-1],6) == round(y0*np.exp(-r),6)
+
+@settings(deadline=None)
+@given(st.floats(-10,10),st.floats(-10,10))
+def test_dense_output(x0,y0):
+    '''
+    tests if the dense output of the harmonic oscillator
+      dx/dt = y
+      dy/dt = -x
+    evaluated on a uniform grid of times is equal to the analitical solution
+    x(t) = x0*cos(t) + y0*sin(t). The strategy is to vary the initial conditions.
+    '''
+    def f(t,y):
+        return np.array([y[1],-y[0]])
+    sol = DOPRI5(f, 0.0, 10.0, [x0,y0], rtol=1e-10, atol=1e-12)
+    time = np.linspace(0.0,10.0,1001)
+    x = sol(time)[0]
+    assert np.allclose(x, x0*np.cos(time)+y0*np.sin(time), atol=1e-6)
+
+@given(st.floats(-10,10),st.integers(1,10))
+def test_reversibility(y0,r):
+    '''
+    tests the reversibility of the algorithm in the linear case
+      dy/dt = -r
+    integrating forward from t=0 to t=1 and then backward from t=1 to t=0:
+    the final value of the backward integration should be the initial value
+    of the forward integration.
+    '''
+    def f1(t,y):
+        return -r
+    sol_for = DOPRI5([f1], 0.0, 1.0, [y0])
+    sol_back = DOPRI5([f1], 1.0, 0.0, [sol_for.y[0][-1]])
+    assert sol_back.t[-1] == 0.0
+    assert round(sol_back.y[0][-1],5) == round(y0,5)
+
+def test_statistics():
+    '''
+    tests if the number of evaluations of the function is consistent with the
+    number of accepted and rejected steps (6 evaluations per step, plus the
+    evaluations at the initial time) for the Van der Pol oscillator, whose
+    fast transitions force the algorithm to reject some steps.
+    '''
+    def f(t,y):
+        return np.array([y[1],10*(1-y[0]**2)*y[1]-y[0]])
+    sol = DOPRI5(f, 0.0, 30.0, [2.0,0.0], rtol=1e-6, atol=1e-9)
+    assert sol.success == True
+    assert sol.nreject > 0
+    assert sol.nfev == 6*(sol.naccept+sol.nreject)+2
+    assert len(sol.t) == sol.naccept+1
+
+# %%
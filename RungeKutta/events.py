@@ -0,0 +1,211 @@
+# =============================================================================
+#
+# EVENT DETECTION
+# An event is the crossing of the zero of a function g(t,y) of the solution
+# of a system of ODEs, e.g. the voltage crossing a threshold or a variable
+# crossing a Poincare section. At each step of the integration the sign of
+# g is checked; when it changes, the time of the crossing is located within
+# the step with the Newton algorithm (safeguarded by the bisection method)
+# applied to g along the continuous interpolant of the solution. Only the
+# times and the states of the events are stored, not the trajectory.
+#
+# =============================================================================
+
+import os
+import sys
+import numpy as np
+from rk4_system import vector_field
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'newton'))
+from newton import newton
+
+class Event:
+    def __init__(self, g, direction=0, terminal=False, max_count=None):
+        """ Event of the integration of a system of ODEs
+
+        Parameters
+        ----------
+        g: function g(t,y) returning a float; the event occurs when g crosses zero
+        direction: 1 if only the crossings from negative to positive values
+                   are events, -1 if only the crossings from positive to
+                   negative values, 0 if both (default: 0)
+        terminal: if True, the integration is stopped when the event has
+                  occurred max_count times (default: False)
+        max_count: maximum number of occurrences of the event that are
+                   recorded; the following ones are ignored (default: no
+                   limit, or 1 if terminal)
+
+        Examples
+        --------
+        >>> spike = Event(lambda t, y: y[0]-threshold, direction=1)
+        >>> section = Event(lambda t, y: y[1]-0.2, direction=-1, max_count=10)
+        """
+        self.g = g
+        self.direction = direction
+        self.terminal = terminal
+        if max_count is None and terminal:
+            max_count = 1
+        self.max_count = max_count
+
+class EventResult:
+    def __init__(self, t_events, y_events, t, y, terminated, nstep):
+        self.t_events = t_events
+        self.y_events = y_events
+        self.t = t
+        self.y = y
+        self.terminated = terminated
+        self.nstep = nstep
+
+def hermite(t0, y0, f0, t1, y1, f1):
+    """ Cubic Hermite interpolant of the solution within the step [t0,t1],
+    from the states and the derivatives at the ends of the step """
+    h = t1-t0
+    def p(t):
+        s = (t-t0)/h
+        return ((1+2*s)*(1-s)**2*y0 + s*(1-s)**2*h*f0 +
+                s**2*(3-2*s)*y1 + s**2*(s-1)*h*f1)
+    return p
+
+def locate(phi, a, b, phi_a, phi_b, eps=1e-12, max_n=50):
+    """ Finds the zero of phi within the bracket [a,b] (phi(a), phi(b) with
+    different sign): the Newton algorithm (with the derivative computed by
+    finite differences) is applied starting from the secant point; if it
+    does not converge, or if it leaves the bracket, the zero is found by the
+    bisection method. """
+    x0 = a - phi_a*(b-a)/(phi_b-phi_a)
+    d = 1e-7*(b-a)
+    res = newton(phi, lambda x: (phi(x+d)-phi(x-d))/(2*d), x0,
+                 eps=eps*(1+abs(phi_a)+abs(phi_b)), max_n=max_n)
+    if res.success == True and min(a,b) <= res.x <= max(a,b):
+        return res.x
+    while abs(b-a) > eps*(1+abs(a)):
+        m = 0.5*(a+b)
+        phi_m = phi(m)
+        if phi_m == 0:
+            return m
+        if (phi_m > 0) == (phi_a > 0):
+            a = m; phi_a = phi_m
+        else:
+            b = m
+    return 0.5*(a+b)
+
+class EventTracker:
+    """ Checks the events at each step of an integration and stores the
+    times and the states of their occurrences """
+    def __init__(self, events, t0, y0):
+        self.events = events
+        self.g = np.array([event.g(t0, y0) for event in events], dtype=np.float64)
+        self.count = np.zeros(len(events), dtype=np.int64)
+        self.t_events = [[] for event in events]
+        self.y_events = [[] for event in events]
+        self.t_stop = None
+        self.y_stop = None
+
+    def step(self, t0, t1, y1, p):
+        """ Checks the events within the step [t0,t1], whose solution is
+        given by the interpolant p(t). Returns True if a terminal event has
+        stopped the integration. """
+        g_new = np.array([event.g(t1, y1) for event in self.events], dtype=np.float64)
+        found = []
+        for j, event in enumerate(self.events):
+            if event.max_count is not None and self.count[j] >= event.max_count:
+                continue
+            up = self.g[j] < 0 and g_new[j] >= 0
+            down = self.g[j] > 0 and g_new[j] <= 0
+            if (up and event.direction >= 0) or (down and event.direction <= 0):
+                if g_new[j] == 0:
+                    t = t1
+                else:
+                    t = locate(lambda s: event.g(s, p(s)), t0, t1, self.g[j], g_new[j])
+                found.append((abs(t-t0), t, j))
+        self.g = g_new
+        """ The events are recorded in order of time, until the first
+        terminal event that reaches its maximum number of occurrences """
+        for dist, t, j in sorted(found):
+            y = p(t)
+            self.t_events[j].append(t)
+            self.y_events[j].append(y)
+            self.count[j] += 1
+            if self.events[j].terminal and self.count[j] >= self.events[j].max_count:
+                self.t_stop = t
+                self.y_stop = y
+                return True
+        return False
+
+    def result(self, t, y, nstep):
+        terminated = self.t_stop is not None
+        if terminated:
+            t, y = self.t_stop, self.y_stop
+        return EventResult([np.array(t_j) for t_j in self.t_events],
+                           [np.array(y_j).reshape(-1,len(y)) for y_j in self.y_events],
+                           t, y, terminated, nstep)
+
+def RK4_events(f, dt, y0, t0, Nstep, events):
+    """ 4th order Runge Kutta algorithm with event detection
+    Solves the same set of ODEs as RK4_system, but instead of the solution
+    it returns the times and the states at which the events occur. Within
+    each step the solution is interpolated with the cubic Hermite polynomial
+    given by the states and the derivatives at the ends of the step, whose
+    error is of the same order of the error of the algorithm.
+
+    Parameters
+    ----------
+    f: list of functions to be integrated or single function f(t,y)
+       (see RK4_system)
+    dt: integration time step
+    y0: list of initial conditions
+    t0: initial time
+    Nstep: maximum number of steps to be performed
+    events: list of Event objects
+
+    Returns
+    -------
+    res: EventResult object. ''t_events'' is a list with, for each event,
+         the array of the times of its occurrences and ''y_events'' a list
+         with the arrays of size (occurrences, len(y0)) of the states at those
+         times; ''t'' and ''y'' are the final time and state (the ones of the
+         terminal event, if it stopped the integration), ''terminated'' is True
+         if a terminal event stopped the integration and ''nstep'' is the
+         number of steps performed.
+
+    Examples
+    --------
+    >>> def f(t,y):
+    >>>     return np.array([y[1],-y[0]])
+    >>> zero = Event(lambda t, y: y[0], direction=-1)
+    >>> res = RK4_events(f, 0.1, [1.,0.], 0., 200, [zero])
+    >>> res.t_events[0]
+    array([ 1.57079..., 7.85398..., 14.13717...])
+    """
+    F = vector_field(f)
+    yn = np.array(y0, dtype=np.float64)
+    Neq = len(yn)
+    ytmp = np.zeros(Neq)
+    dy1 = np.zeros(Neq); dy2 = np.zeros(Neq)
+    dy3 = np.zeros(Neq); dy4 = np.zeros(Neq)
+    fn = F(t0, yn, np.zeros(Neq)).copy()
+    fnew = np.zeros(Neq)
+
+    tracker = EventTracker(events, t0, yn)
+    tn = t0
+    for n in range(1,Nstep+1):
+        np.multiply(dt, fn, out=dy1)
+        np.multiply(0.5, dy1, out=ytmp); ytmp += yn
+        F(tn+0.5*dt, ytmp, dy2); dy2 *= dt
+        np.multiply(0.5, dy2, out=ytmp); ytmp += yn
+        F(tn+0.5*dt, ytmp, dy3); dy3 *= dt
+        np.add(yn, dy3, out=ytmp)
+        F(tn+dt, ytmp, dy4); dy4 *= dt
+
+        ynew = yn + (dy1+2*dy2+2*dy3+dy4)/6
+        tnew = tn + dt
+        """ The derivative at the end of the step is the first stage of the
+        next step: the interpolant costs no further evaluation of f """
+        F(tnew, ynew, fnew)
+        if tracker.step(tn, tnew, ynew, hermite(tn, yn, fn.copy(), tnew, ynew, fnew.copy())):
+            return tracker.result(tnew, ynew, n)
+        yn = ynew; tn = tnew
+        fn, fnew = fnew, fn
+    return tracker.result(tn, yn, Nstep)
+
+# %%
@@ -0,0 +1,90 @@
+from events import Event, RK4_events
+from rk4_system import RK4_system
+from dopri5 import DOPRI5
+import numpy as np
+from hypothesis import given, settings
+import hypothesis.strategies as st
+
+def oscillator(t,y):
+    return np.array([y[1],-y[0]])
+
+@settings(deadline=None, max_examples=30)
+@given(st.floats(0.1,10),st.floats(0,2*np.pi))
+def test_harmonic_oscillator_crossings(r,phase):
+    '''
+    tests if the crossings of zero of the first variable of the harmonic
+    oscillator x(t) = r*cos(t+phase) are located at the analitical times
+    t = pi/2-phase+k*pi, even with a time step much larger than the required
+    precision. The strategy is to vary the amplitude and the phase.
+    '''
+    y0 = [r*np.cos(phase), -r*np.sin(phase)]
+    res = RK4_events(oscillator, 0.05, y0, 0.0, 400, [Event(lambda t, y: y[0])])
+    expected = np.pi/2-phase+np.pi*np.arange(0,8)
+    expected = expected[(expected > 0) & (expected < 20)]
+    assert len(res.t_events[0]) == len(expected)
+    assert np.allclose(res.t_events[0], expected, atol=1e-5)
+    assert np.allclose(res.y_events[0][:,0], 0, atol=1e-8)
+
+@settings(deadline=None, max_examples=30)
+@given(st.floats(-1,1))
+def test_direction(c):
+    '''
+    tests if the direction of the events of the harmonic oscillator
+    x(t) = cos(t) crossing the level c is respected: the crossings from below
+    have positive derivative y = dx/dt, the crossings from above negative
+    derivative, and the crossings in both directions alternate. The strategy
+    is to vary the level c.
+    '''
+    events = [Event(lambda t, y: y[0]-c, direction=1),
+              Event(lambda t, y: y[0]-c, direction=-1),
+              Event(lambda t, y: y[0]-c)]
+    res = RK4_events(oscillator, 0.05, [1.,0.], 0.0, 400, events)
+    assert np.all(res.y_events[0][:,1] > 0) and np.all(res.y_events[1][:,1] < 0)
+    both = np.sort(np.concatenate([res.t_events[0], res.t_events[1]]))
+    assert np.allclose(res.t_events[2], both)
+
+@settings(deadline=None, max_examples=30)
+@given(st.integers(1,5))
+def test_terminal_max_count(n):
+    '''
+    tests if a terminal event stops the integration at its n-th occurrence,
+    returning the time and the state of the event, and if the other events
+    are only recorded up to that time. The strategy is to vary n.
+    '''
+    events = [Event(lambda t, y: y[1], direction=1, terminal=True, max_count=n),
+              Event(lambda t, y: y[0])]
+    res = RK4_events(oscillator, 0.05, [1.,0.], 0.0, 10**6, events)
+    assert res.terminated == True
+    assert len(res.t_events[0]) == n
+    assert abs(res.t-(2*n-1)*np.pi) < 1e-5
+    assert res.t == res.t_events[0][-1]
+    assert np.all(res.t_events[1] < res.t)
+    assert res.nstep < 10**6
+
+@settings(deadline=None, max_examples=30)
+@given(st.floats(-10,10),st.integers(10,1000))
+def test_events_do_not_change_the_solution(x0,Nstep):
+    '''
+    tests if the final state of the integration with events is the same as
+    the one of RK4_system, varying the initial condition and the total
+    number of steps.
+    '''
+    t, y = RK4_system(oscillator, 0.01, [x0,0.0], 0.0, Nstep)
+    res = RK4_events(oscillator, 0.01, [x0,0.0], 0.0, Nstep, [Event(lambda t, y: y[0])])
+    assert res.terminated == False
+    assert np.allclose(res.y, y[:,-1], rtol=1e-12, atol=1e-12)
+
+@settings(deadline=None, max_examples=30)
+@given(st.floats(0.1,0.9))
+def test_dopri5_events(c):
+    '''
+    tests if the events of the exponential decay y = exp(-t) crossing the
+    level c are located on the dense output of the adaptive step algorithm
+    at the analitical time t = -log(c). The strategy is to vary the level.
+    '''
+    sol = DOPRI5(lambda t, y: -y, 0.0, 5.0, [1.0], rtol=1e-10, atol=1e-12,
+                 events=[Event(lambda t, y: y[0]-c, terminal=True)])
+    assert sol.message == 'Terminal event'
+    assert round(sol.t_events[0][0],8) == round(-np.log(c),8)
+
+# %%
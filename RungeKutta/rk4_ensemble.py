@@ -0,0 +1,97 @@
+# =============================================================================
+#
+# RUNGE KUTTA ALGORITHM FOR ENSEMBLES
+#
+# 4th order Runge Kutta algorithm to solve at once many independent copies
+# (members) of a system of ODEs
+#   dy/dt = f(t,y)
+# where the state y is an array of size (batch, Neq)
+# 
+# =============================================================================
+
+import numpy as np
+from rk4_system import RK4_chunks
+
+def RK4_ensemble_chunks(f, dt, y0, t0, Nstep, chunk_size=1000, record_every=1):
+    """ 4th order Runge Kutta algorithm for an ensemble of trajectories in 
+    streaming form: instead of returning the whole solution (as RK4_ensemble
+    does) it yields it in chunks of chunk_size recorded time steps, keeping
+    the state of the algorithm between two chunks. The integration can be 
+    stopped early by stopping the iteration (e.g. with break). The steps
+    are the ones of RK4_chunks, applied to the whole state of the ensemble.
+    
+    Parameters
+    ----------
+    f, dt, y0, t0, Nstep, record_every: see RK4_ensemble
+    chunk_size: number of recorded time steps contained in each chunk (default: 1000)
+    
+    Yields
+    ------
+    t: float64 array of size (at most) chunk_size that contains the recorded time steps
+    y: float64 array of size (batch, Neq, len(t)) that contains the solutions 
+       of the system of ODEs at the time steps t
+    The first chunk starts with the initial conditions.
+    
+    Examples
+    --------
+    >>> def f(t,y):
+    >>>     return -y
+    >>> for t, y in RK4_ensemble_chunks(f, 0.01, np.ones([3,1]), 0., 1000, chunk_size=400):
+    >>>     print(y.shape)
+    (3, 1, 400)
+    (3, 1, 400)
+    (3, 1, 201)
+    """
+    return RK4_chunks(f, dt, y0, t0, Nstep, chunk_size=chunk_size,
+                      record_every=record_every)
+
+def RK4_ensemble(f, dt, y0, t0, Nstep, record_every=1):
+    """ 4th order Runge Kutta algorithm for an ensemble of trajectories
+    Solves at once the set of ODEs 
+    dy/dt = f(t,y)
+    for several initial conditions (and possibly different parameters), 
+    where y is an array of size (batch, Neq).
+    
+    Parameters
+    ----------
+    f: vectorized function f(t,y) (or f(t,y,out=None), see vector_field in 
+       rk4_system.py) that takes the state array of size (batch, Neq) and 
+       returns dy/dt with the same size. Parameters that differ between the 
+       members of the ensemble can be given to f as arrays of size batch.
+    dt: integration time step 
+    y0: initial conditions, array of size (batch, Neq)
+    t0: initial time 
+    Nstep: number of steps to be performed
+    record_every: only one step every record_every steps is stored (default: 1)
+    
+    Returns
+    -------
+    t: float64 array of size Nstep//record_every+1 that contains the recorded time steps
+    y: float64 array of size (batch, Neq, Nstep//record_every+1) that contains 
+       the solutions of the system of ODEs; y[b] is the solution of member b
+    
+    Examples
+    --------
+    >>> r = np.array([1.,2.,3.])
+    >>> def f(t,y):
+    >>>     return -r[:,None]*y
+    >>> y0 = np.ones([3,1]); Nstep = 100; dt = 0.01; t0 = 0.
+    >>> t, y = RK4_ensemble(f,dt,y0,t0,Nstep,record_every=10)
+    >>> y.shape
+    (3, 1, 11)
+    >>> y[:,0,-1]
+    array([0.36787944, 0.13533528, 0.04978707])
+    """
+    batch, Neq = np.shape(y0)
+    Nrec = Nstep//record_every+1
+    t = np.zeros(Nrec)
+    y = np.zeros([batch, Neq, Nrec])
+    i = 0
+    for t_chunk, y_chunk in RK4_ensemble_chunks(f, dt, y0, t0, Nstep, 
+                                                record_every=record_every):
+        t[i:i+len(t_chunk)] = t_chunk
+        y[:,:,i:i+len(t_chunk)] = y_chunk
+        i += len(t_chunk)
+    return t, y
+
+# %%
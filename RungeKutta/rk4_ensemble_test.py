@@ -0,0 +1,70 @@
+from rk4_ensemble import RK4_ensemble, RK4_ensemble_chunks
+from rk4_system import RK4_system
+import numpy as np
+from hypothesis import given, settings
+import hypothesis.strategies as st
+
+@settings(deadline=None)
+@given(st.lists(st.floats(-10,10),min_size=1,max_size=10),st.integers(10,500))
+def test_members_equal_single_integrations(x0,Nstep):
+    '''
+    tests if each member of an ensemble of harmonic oscillators
+      dx/dt = y
+      dy/dt = -r*x
+    with different initial conditions x0 and different parameters r is equal 
+    to the solution obtained by integrating the member alone with RK4_system.
+    The strategy is to vary the number of members, their initial conditions 
+    and the total number of steps.
+    '''
+    batch = len(x0)
+    r = np.arange(1,batch+1)
+    def f(t,y):
+        return np.stack([y[:,1],-r*y[:,0]],axis=1)
+    y0 = np.stack([x0,np.zeros(batch)],axis=1)
+    dt = 0.01; t0 = 0.0
+    t_ens, y_ens = RK4_ensemble(f, dt, y0, t0, Nstep)
+    for b in range(0,batch):
+        def f1(t,y1,y2):
+            return y2
+        def f2(t,y1,y2):
+            return -r[b]*y1
+        t, y = RK4_system([f1,f2], dt, y0[b], t0, Nstep)
+        assert np.allclose(y_ens[b], y, rtol=1e-12, atol=1e-12)
+
+@given(st.floats(-10,10),st.integers(10,1000),st.integers(1,20))
+def test_record_every(x0,Nstep,k):
+    '''
+    tests if recording only one step every k steps gives the same values of
+    the full integration at the recorded time steps, in the monodimensional case
+      dy/dt = -y
+    The strategy is to vary the initial condition, the total number of steps 
+    and the number k of steps between two recorded values.
+    '''
+    def f(t,y):
+        return -y
+    y0 = [[x0],[2*x0]]; dt = 0.01; t0 = 0.0
+    t_full, y_full = RK4_ensemble(f, dt, y0, t0, Nstep)
+    t_rec, y_rec = RK4_ensemble(f, dt, y0, t0, Nstep, record_every=k)
+    assert len(t_rec) == Nstep//k+1
+    assert np.allclose(t_rec, t_full[::k][:len(t_rec)])
+    assert np.allclose(y_rec, y_full[:,:,::k][:,:,:len(t_rec)])
+
+@settings(deadline=None)
+@given(st.integers(10,1000),st.integers(1,20),st.integers(1,300))
+def test_chunks_concatenation(Nstep,k,chunk_size):
+    '''
+    tests if concatenating the chunks generated by RK4_ensemble_chunks gives 
+    the same solution returned by RK4_ensemble for an ensemble of harmonic
+    oscillators. The strategy is to vary the total number of steps, the number
+    k of steps between two recorded values and the size of the chunks.
+    '''
+    def f(t,y):
+        return np.stack([y[:,1],-y[:,0]],axis=1)
+    y0 = [[1.0,0.0],[0.0,1.0]]; dt = 0.01; t0 = 0.0
+    t, y = RK4_ensemble(f, dt, y0, t0, Nstep, record_every=k)
+    chunks = list(RK4_ensemble_chunks(f, dt, y0, t0, Nstep, 
+                                      chunk_size=chunk_size, record_every=k))
+    assert np.array_equal(np.concatenate([c[0] for c in chunks]), t)
+    assert np.array_equal(np.concatenate([c[1] for c in chunks],axis=2), y)
+
+# %%
@@ -6,12 +6,133 @@
 #   dy1/dt = f1(t,y1,...,yn)
 #   ...
 #   dyn/dt = fn(t,y1,...,yn)
+# or, in vectorized form,
+#   dy/dt = f(t,y)
 # 
 # =============================================================================
 
+import inspect
 import numpy as np
 
-def RK4_system(f, dt, y0, t0, Nstep):
+def vector_field(f):
+    """ Converts the left side of a system of ODEs to a function F(t,y,out)
+    that writes dy/dt in the preallocated array out and returns it.
+    
+    Parameters
+    ----------
+    f: either a list of functions [f1,...,fn], each one called as fj(t,y1,...,yn),
+       or a single function f(t,y) that takes the state array y and returns 
+       the array dy/dt. If f has an ''out'' parameter, f(t,y,out=out) is 
+       expected to write the result in out (returning out or None).
+    
+    Returns
+    -------
+    F: function F(t,y,out) that writes dy/dt in out and returns out
+    
+    Examples
+    --------
+    >>> def f(t,y):
+    >>>     return -y
+    >>> F = vector_field(f)
+    >>> F(0., np.array([1.,2.]), np.zeros(2))
+    array([-1., -2.])
+    """
+    if not callable(f):
+        def F(t, y, out):
+            for j in range(0,len(f)):
+                out[j] = f[j](t,*y)
+            return out
+    elif 'out' in inspect.signature(f).parameters:
+        def F(t, y, out):
+            res = f(t, y, out=out)
+            if res is not None and res is not out:
+                out[...] = res
+            return out
+    else:
+        def F(t, y, out):
+            out[...] = f(t, y)
+            return out
+    return F
+
+def RK4_chunks(f, dt, y0, t0, Nstep, chunk_size=10000, record_every=1):
+    """ 4th order Runge Kutta algorithm in streaming form
+    Solves the same set of ODEs as RK4_system, but instead of returning the
+    whole solution it yields it in chunks of chunk_size time steps. The state 
+    of the algorithm is kept between two chunks, so that the solution can be
+    processed with a memory that does not depend on Nstep. The integration
+    can be stopped early by stopping the iteration (e.g. with break).
+    
+    Parameters
+    ----------
+    f: list of functions to be integrated or single function f(t,y) 
+       (see RK4_system)
+    dt: integration time step 
+    y0: list of initial conditions, or array of any shape for a vectorized
+        f(t,y) (e.g. of size (batch, Neq) for an ensemble, see rk4_ensemble.py)
+    t0: initial time 
+    Nstep: number of steps to be performed
+    chunk_size: number of recorded time steps contained in each chunk (default: 10000)
+    record_every: only one step every record_every steps is recorded (default: 1)
+    
+    Yields
+    ------
+    t: float64 array of size (at most) chunk_size that contains the recorded time steps
+    y: float64 array of size (len(y0),len(t)) (in general, shape(y0)+(len(t),))
+       that contains the solutions of the system of ODEs at the time steps t
+    The first chunk starts with the initial condition; concatenating all the 
+    chunks gives the Nstep//record_every+1 time steps returned by RK4_system.
+    
+    Examples
+    --------
+    >>> def f(t,y):
+    >>>     return -y
+    >>> for t, y in RK4_chunks(f, 0.01, [1.], 0., 1000, chunk_size=300):
+    >>>     print(y.shape)
+    (1, 300)
+    (1, 300)
+    (1, 300)
+    (1, 101)
+    """
+    F = vector_field(f)
+
+    """ Scratch buffers: only the current state is needed at each step,
+    so the memory required by the stepping engine is O(Neq) """
+    yn = np.array(y0, dtype=np.float64)
+    ytmp = np.zeros(yn.shape)
+    dy1 = np.zeros(yn.shape); dy2 = np.zeros(yn.shape)
+    dy3 = np.zeros(yn.shape); dy4 = np.zeros(yn.shape)
+
+    tn = t0
+    i = 0
+    Nrec = Nstep//record_every+1
+    for start in range(0,Nrec,chunk_size):
+        size = min(chunk_size, Nrec-start)
+        t = np.zeros(size)
+        y = np.zeros(yn.shape+(size,))
+        n = 0
+        if start == 0:
+            t[0] = tn
+            y[...,0] = yn
+            n = 1
+        while n < size:
+            F(tn, yn, dy1); dy1 *= dt
+            np.multiply(0.5, dy1, out=ytmp); ytmp += yn
+            F(tn+0.5*dt, ytmp, dy2); dy2 *= dt
+            np.multiply(0.5, dy2, out=ytmp); ytmp += yn
+            F(tn+0.5*dt, ytmp, dy3); dy3 *= dt
+            np.add(yn, dy3, out=ytmp)
+            F(tn+dt, ytmp, dy4); dy4 *= dt
+
+            yn += (dy1+2*dy2+2*dy3+dy4)/6
+            tn = tn + dt
+            i += 1
+            if i % record_every == 0:
+                t[n] = tn
+                y[...,n] = yn
+                n += 1
+        yield t, y
+
+def RK4_system(f, dt, y0, t0, Nstep, record_every=1, out=None):
     """ 4th order Runge Kutta algorithm
     Solves a set of ODEs of the form 
     dy1/dt = f1(t,y1,...,yn)
@@ -21,15 +142,25 @@ def RK4_system(f, dt, y0, t0, Nstep):
     Parameters
     ----------
     f: list of functions to be integrated (left side vector of the system of ODEs)
+       or a single function f(t,y) returning the array dy/dt, optionally 
+       with an ''out'' parameter for a preallocated result (see vector_field)
     dt: integration time step 
     y0: list of initial conditions
     t0: initial time 
     Nstep: number of steps to be performed
+    record_every: only one step every record_every steps is stored (default: 1)
+    out: if given, name of a .npy file where the solution is written while
+         it is generated, through a memory map: the memory needed does not
+         depend on Nstep and the file can be opened again with open_solution
+         (default: None, the solution is kept in memory)
     
     Returns
     -------
-    t: float64 array of size Nstep+1 that contains the time steps
-    y: float64 array of size (len(f),Nstep+1) that contains the solutions of the system of ODEs
+    t: float64 array of size Nstep//record_every+1 that contains the recorded time steps
+    y: float64 array of size (len(y0),Nstep//record_every+1) that contains the 
+       solutions of the system of ODEs
+    The solution is built by concatenating the chunks generated by RK4_chunks.
+    If out is given, t and y are memory-mapped rows of the file.
     
     Examples
     --------
@@ -46,26 +177,49 @@ def RK4_system(f, dt, y0, t0, Nstep):
     array([0., 0., 0., 0., 0., 0., ..., 0., 0., 0., 0., 0., 0., 0.])
     >>> y[1]
     array([0.  , 0.01, 0.02, 0.03, ..., 0.96, 0.97, 0.98, 0.99, 1.  ])
+    >>> def f(t,y,out=None):
+    >>>     if out is None:
+    >>>         out = np.zeros(2)
+    >>>     out[0] = 0; out[1] = 1
+    >>>     return out
+    >>> t, y = RK4_system(f,dt,y0,t0,Nstep)
+    >>> y[1][-1]
+    1.0
+    >>> t, y = RK4_system(f,dt,y0,t0,Nstep,record_every=10,out='solution.npy')
+    >>> y.shape
+    (2, 11)
+    >>> t, y = open_solution('solution.npy')
+    >>> y[1][-1]
+    1.0
     """
-
-    Neq = len(f)
-    t = np.zeros(Nstep+1)
-    t[0] = t0
-    y = np.zeros([Neq, Nstep+1]) 
-    dy1 = np.zeros([Neq, Nstep+1]); dy2 = np.zeros([Neq, Nstep+1]); 
-    dy3 = np.zeros([Neq, Nstep+1]); dy4 = np.zeros([Neq, Nstep+1])
-    for j in range(0, Neq):
-        y[j][0] = y0[j]
-    
-    for i in range(0,Nstep):
-        for j in range(0,Neq):
-            dy1[j] = dt*f[j](t,*y)
-            dy2[j] = dt*f[j](t+0.5*dt,*y+0.5*dy1)
-            dy3[j] = dt*f[j](t+0.5*dt,*y+0.5*dy2)
-            dy4[j] = dt*f[j](t+dt,*y+dy3)
-        
-            t[i+1] = t[i] + dt
-            y[j][i+1] = y[j][i]+(dy1[j][i]+2*dy2[j][i]+2*dy3[j][i]+dy4[j][i])/6
+    Nrec = Nstep//record_every+1
+    if out is None:
+        sol = np.zeros([len(y0)+1, Nrec])
+    else:
+        sol = np.lib.format.open_memmap(out, mode='w+', dtype=np.float64,
+                                        shape=(len(y0)+1, Nrec))
+    t = sol[0]
+    y = sol[1:]
+    i = 0
+    for t_chunk, y_chunk in RK4_chunks(f, dt, y0, t0, Nstep, record_every=record_every):
+        t[i:i+len(t_chunk)] = t_chunk
+        y[:,i:i+len(t_chunk)] = y_chunk
+        i += len(t_chunk)
+    if out is not None:
+        sol.flush()
     return t, y
 
-# %%
\ No newline at end of file
+def open_solution(path):
+    """ Opens (memory-mapped, read only) a solution written by RK4_system
+    with the parameter out: the file contains the time steps in the first
+    row and the solution in the following rows
+
+    Returns
+    -------
+    t: float64 array that contains the recorded time steps
+    y: float64 array of size (Neq,len(t)) that contains the solutions
+    """
+    sol = np.load(path, mmap_mode='r')
+    return sol[0], sol[1:]
+
+# %%
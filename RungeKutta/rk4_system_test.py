@@ -1,5 +1,8 @@
-from rk4_system import RK4_system
-from hypothesis import given
+from rk4_system import RK4_system, RK4_chunks, open_solution
+import os
+import tempfile
+import numpy as np
+from hypothesis import given, settings
 import hypothesis.strategies as st
 
 @given(st.floats(-10,10),st.integers(10,1000))
@@ -94,4 +97,116 @@ def test_reversibility(y0,Nstep,r):
     t_back, y_back = RK4_system(fun,-dt,[last_y],last_time,Nstep)
     assert round(y_back[0][-1],5) == round(y_for[0][0],5)
 
-# %%
\ No newline at end of file
+@given(st.floats(-10,10),st.floats(-10,10),st.integers(10,1000))
+def test_vectorized_equals_list_of_functions(x0,y0,Nstep):
+    '''
+    tests if the vectorized form of the harmonic oscillator
+      dy/dt = f(t,y) = [y2, -y1]
+    gives the same solution as the list of functions [f1,f2]. The strategy is
+    to set different initial conditions and to change the total number of steps.
+    '''
+    def f1(t,y1,y2):
+        return y2
+    def f2(t,y1,y2):
+        return -y1
+    def f(t,y):
+        return np.array([y[1],-y[0]])
+    dt = 0.01; p0 = [x0,y0]; t0 = 0.0
+    t_list, y_list = RK4_system([f1,f2], dt, p0, t0, Nstep)
+    t_vec, y_vec = RK4_system(f, dt, p0, t0, Nstep)
+    assert np.allclose(y_list, y_vec, rtol=1e-12, atol=1e-12)
+
+@given(st.floats(-10,10),st.integers(10,1000))
+def test_vectorized_out_buffer(y0,Nstep):
+    '''
+    tests if a vectorized function writing the result in the preallocated
+    buffer ''out'' is correctly integrated in the monodimensional linear case
+      dy/dt = 1
+    checking that the solution is the line y = t + y0. The strategy is to 
+    set different initial conditions and to change the total number of steps.
+    '''
+    def f(t,y,out=None):
+        if out is None:
+            out = np.zeros(1)
+        out[0] = 1
+        return None
+    dt = 0.01; p0 = [y0]; t0 = 0.0
+    t, y = RK4_system(f, dt, p0, t0, Nstep)
+    assert round(y[0][-1],5) == round(y0+t[-1],5)
+
+@settings(deadline=None)
+@given(st.floats(-10,10),st.integers(10,1000),st.integers(1,300))
+def test_chunks_concatenation(x0,Nstep,chunk_size):
+    '''
+    tests if concatenating the chunks generated by RK4_chunks for the
+    harmonic oscillator gives the same solution returned by RK4_system. 
+    The strategy is to vary the initial condition, the total number of steps 
+    and the size of the chunks.
+    '''
+    def f(t,y):
+        return np.array([y[1],-y[0]])
+    dt = 0.01; p0 = [x0,0.0]; t0 = 0.0
+    t, y = RK4_system(f, dt, p0, t0, Nstep)
+    chunks = list(RK4_chunks(f, dt, p0, t0, Nstep, chunk_size=chunk_size))
+    assert all(len(t_chunk) <= chunk_size for t_chunk, y_chunk in chunks)
+    assert np.array_equal(np.concatenate([c[0] for c in chunks]), t)
+    assert np.array_equal(np.concatenate([c[1] for c in chunks],axis=1), y)
+
+@given(st.floats(-10,10),st.integers(1,100))
+def test_chunks_early_stop(y0,chunk_size):
+    '''
+    tests if the streaming integration of 
+      dy/dt = 1
+    can be stopped early: the iteration is stopped as soon as y > y0+1 and 
+    the last value is checked to be the line y = t + y0. The strategy is to 
+    vary the initial condition and the size of the chunks.
+    '''
+    def f(t,y):
+        return np.ones(1)
+    dt = 0.01; p0 = [y0]; t0 = 0.0; Nstep = 10**9
+    for t, y in RK4_chunks(f, dt, p0, t0, Nstep, chunk_size=chunk_size):
+        if y[0][-1] > y0+1:
+            break
+    assert t[-1] < 1+(chunk_size+1)*dt
+    assert round(y[0][-1],5) == round(y0+t[-1],5)
+
+@settings(deadline=None)
+@given(st.floats(-10,10),st.integers(10,1000),st.integers(1,20))
+def test_record_every(x0,Nstep,k):
+    '''
+    tests if storing one step every k steps gives the same values as the 
+    steps k*n of the whole solution of the harmonic oscillator. The strategy
+    is to vary the initial condition, the total number of steps and k.
+    '''
+    def f(t,y):
+        return np.array([y[1],-y[0]])
+    dt = 0.01; p0 = [x0,0.0]; t0 = 0.0
+    t, y = RK4_system(f, dt, p0, t0, Nstep)
+    t_k, y_k = RK4_system(f, dt, p0, t0, Nstep, record_every=k)
+    assert len(t_k) == Nstep//k+1
+    assert np.array_equal(t_k, t[::k][:len(t_k)])
+    assert np.array_equal(y_k, y[:,::k][:,:len(t_k)])
+
+@settings(deadline=None, max_examples=20)
+@given(st.floats(-10,10),st.integers(10,1000),st.integers(1,5))
+def test_memmap_output(x0,Nstep,k):
+    '''
+    tests if the solution of the harmonic oscillator written to a file 
+    through a memory map is equal to the solution kept in memory, both as 
+    returned by RK4_system and when the file is opened again. The strategy 
+    is to vary the initial condition, the total number of steps and the 
+    number of steps between two recorded steps.
+    '''
+    def f(t,y):
+        return np.array([y[1],-y[0]])
+    dt = 0.01; p0 = [x0,0.0]; t0 = 0.0
+    t, y = RK4_system(f, dt, p0, t0, Nstep, record_every=k)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'solution.npy')
+        t_m, y_m = RK4_system(f, dt, p0, t0, Nstep, record_every=k, out=path)
+        assert np.array_equal(t_m, t) and np.array_equal(y_m, y)
+        t_o, y_o = open_solution(path)
+        assert np.array_equal(t_o, t) and np.array_equal(y_o, y)
+        del t_m, y_m, t_o, y_o
+
+# %%
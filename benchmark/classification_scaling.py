@@ -0,0 +1,49 @@
+# =============================================================================
+#
+# CLASSIFICATION MAP OF THE MORRIS LECAR MODEL: PARALLEL SCALING
+#
+# The code measures the throughput (cells of the grid (I_app, v_ca) per
+# second) of the classification map (MorrisLecar/classification.py) as a
+# function of the number of processes of the pool, and checks that the
+# result does not depend on the number of processes.
+#
+# =============================================================================
+
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, '../RungeKutta')
+sys.path.insert(1, '../newton')
+sys.path.insert(2, '../MorrisLecar')
+from classification import classification_map
+
+# %%
+
+""" Grid of the benchmark: enough tiles to keep all the processes busy """
+I_app_values = np.linspace(0,100,51)
+v_ca_values = np.linspace(-25,5,16)
+n_cells = len(I_app_values)*len(v_ca_values)
+tile_size = 32
+
+if __name__ == '__main__':
+    n_cores = os.cpu_count()
+    workers = sorted(set([1,2,4,8,16,n_cores]) & set(range(1,n_cores+1)))
+    print('cores:', n_cores, '- cells:', n_cells, '- tiles:', -(-n_cells//tile_size))
+
+    reference = None
+    for n in workers:
+        start = time.perf_counter()
+        result = classification_map(I_app_values, v_ca_values, workers=n,
+                                    tile_size=tile_size, progress=False)
+        elapsed = time.perf_counter()-start
+        if reference is None:
+            reference = result; t_serial = elapsed
+        print('  %2d processes: %.2f s, %.1f cells/s, speedup %.2f (efficiency %.0f%%)'
+              % (n, elapsed, n_cells/elapsed, t_serial/elapsed, 100*t_serial/(n*elapsed)))
+
+        """ Equality check: the map must not depend on the number of processes """
+        assert np.array_equal(result.category, reference.category)
+        assert np.array_equal(result.frequency, reference.frequency, equal_nan=True)
+
+# %%
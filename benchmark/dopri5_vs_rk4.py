@@ -0,0 +1,97 @@
+# =============================================================================
+#
+# ADAPTIVE STEP VS FIXED STEP INTEGRATION OF THE MORRIS LECAR MODEL
+#
+# The code compares the wall time needed by the 4th order Runge Kutta
+# algorithm (fixed step) and by the Dormand Prince algorithm (adaptive step)
+# to integrate the Morris Lecar model at the same accuracy. 
+# The comparison is performed on the class 1 (v_ca=-12) and class 2 (v_ca=0)
+# parameter sets used in the folder example and in the paper.
+#
+# =============================================================================
+
+import sys
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+sys.path.insert(0, '../RungeKutta')
+sys.path.insert(1, '../MorrisLecar')
+from rk4_system import RK4_system
+from dopri5 import DOPRI5
+from model import morris_lecar
+
+# %%
+
+""" Parameter sets: (name, v_ca, I_app, v0, w0) """
+cases = [('class 1', -12.0, 40.0, -20.0, 0.0),
+         ('class 2', 0.0, 80.0, -25.0, 0.0)]
+""" Integration parameters: the error is measured on a uniform grid """
+t0 = 0.0; t_end = 100.0; dt_grid = 0.1
+grid = np.arange(0, int(round((t_end-t0)/dt_grid))+1)*dt_grid + t0
+rk4_dt = [0.1, 0.05, 0.02, 0.01, 0.005]
+dopri5_rtol = [1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-8]
+
+def wall_time(fun, repeat=3):
+    """ Best wall time (in seconds) over several repetitions and last output """
+    best = np.inf
+    for r in range(0,repeat):
+        start = time.perf_counter()
+        out = fun()
+        best = min(best, time.perf_counter()-start)
+    return best, out
+
+# %%
+
+results = {}
+for name, v_ca, I_app, v0, w0 in cases:
+    f = morris_lecar(I_app, v_ca)
+    y0 = [v0,w0]
+    """ Reference solution """
+    reference = DOPRI5(f, t0, t_end, y0, rtol=1e-12, atol=1e-12)(grid)[0]
+
+    rk4 = []
+    for dt in rk4_dt:
+        Nstep = int(round((t_end-t0)/dt))
+        tm, (t, y) = wall_time(lambda: RK4_system(f, dt, y0, t0, Nstep))
+        every = int(round(dt_grid/dt))
+        error = np.max(np.abs(y[0][::every]-reference))
+        rk4.append((dt, tm, error))
+    dopri5 = []
+    for rtol in dopri5_rtol:
+        tm, sol = wall_time(lambda: DOPRI5(f, t0, t_end, y0, rtol=rtol, atol=1e-3*rtol))
+        error = np.max(np.abs(sol(grid)[0]-reference))
+        dopri5.append((rtol, tm, error, sol.naccept, sol.nreject))
+    results[name] = (rk4, dopri5)
+
+    print('\n'+name+': v_ca =', v_ca, ' I_app =', I_app)
+    print('  RK4     dt = %-7g time = %.4f s  max error = %.2e' % rk4[0])
+    for r in rk4[1:]:
+        print('  RK4     dt = %-7g time = %.4f s  max error = %.2e' % r)
+    for d in dopri5:
+        print('  DOPRI5  rtol = %-5g time = %.4f s  max error = %.2e'
+              '  (%d accepted, %d rejected)' % d)
+
+    """ Wall time at matched accuracy: for each RK4 run we take the fastest
+    DOPRI5 run whose error is not larger """
+    for dt, tm, error in rk4:
+        matched = [d for d in dopri5 if d[2] <= error]
+        if len(matched) > 0:
+            best = min(matched, key=lambda d: d[1])
+            print('  error <= %.2e: RK4 %.4f s, DOPRI5 %.4f s (rtol=%g), speedup %.1fx'
+                  % (error, tm, best[1], best[0], tm/best[1]))
+
+# %%
+
+""" Work-precision diagram """
+fig, axes = plt.subplots(1,len(cases),figsize=(15,6))
+for ax, (name, v_ca, I_app, v0, w0) in zip(axes, cases):
+    rk4, dopri5 = results[name]
+    ax.loglog([r[2] for r in rk4], [r[1] for r in rk4], 'o-', c='black', label='RK4')
+    ax.loglog([d[2] for d in dopri5], [d[1] for d in dopri5], 's-', c='blue', label='DOPRI5')
+    ax.set_xlabel('Max error on V', fontsize=15)
+    ax.set_ylabel('Wall time [s]', fontsize=15)
+    ax.set_title(name, fontsize=15)
+    ax.legend(); ax.grid(True)
+plt.show()
+
+# %%
@@ -0,0 +1,142 @@
+# =============================================================================
+#
+# EQUILIBRIA OF THE MORRIS LECAR MODEL: BENCHMARK AND EQUALITY CHECK
+#
+# The code compares three ways of finding the equilibria of the Morris Lecar
+# model on the grid of I_app values used by bifurcation_analysis.py, and on
+# negative currents, where the resting equilibrium lies below E_k:
+#   1) the bidimensional Newton algorithm applied to each couple (I_app, v0)
+#   2) the batched bidimensional Newton algorithm applied to all the couples
+#   3) the reduction to the voltage only, with bracketing and refinement
+#      (MorrisLecar/equilibria.py)
+# Methods 1) and 2) are run both with the Newton method and with the
+# quasi-Newton (Broyden) method, counting the evaluations of the functions
+# and of the jacobian matrix at each point.
+# The wall time of each method is measured and, for each value of I_app,
+# the Newton algorithm and the reduction are checked to find the same number
+# of equilibria at the same points.
+#
+# =============================================================================
+
+import sys
+import time
+import numpy as np
+sys.path.insert(0, '../RungeKutta')
+sys.path.insert(1, '../newton')
+sys.path.insert(2, '../MorrisLecar')
+from newton2 import newton2, newton2_batch
+from model import f, Jf
+from equilibria import equilibria
+
+# %%
+
+""" Parameters of bifurcation_analysis.py (class 1 and class 2 neurons),
+and negative currents """
+cases = [('class 1', -12.0, np.linspace(0,100,200)),
+         ('class 2', 0.0, np.linspace(0,100,200)),
+         ('class 1, negative currents', -20.0, np.linspace(-120,0,200)),
+         ('class 2, negative currents', 0.0, np.linspace(-120,0,200))]
+v0_values = np.linspace(-80,40,61)
+w0 = 0.0
+
+""" Number of points where f and Jf have been evaluated """
+count = {'f': 0, 'Jf': 0}
+def counted_f(x,y,*args):
+    count['f'] += np.size(x)
+    return f(x,y,*args)
+def counted_Jf(x,y,*args):
+    count['Jf'] += np.size(x)
+    return Jf(x,y,*args)
+
+def newton2_loop(v_ca, I_app_values, method='newton'):
+    """ Method 1: one call of newton2 for each couple (I_app, v0) """
+    roots = []
+    for I_app in I_app_values:
+        found = []
+        for v0 in v0_values:
+            res = newton2(lambda x,y: counted_f(x,y,I_app,v_ca),
+                          lambda x,y: counted_Jf(x,y,I_app,v_ca), [v0,w0],
+                          method=method)
+            if res.success == True:
+                found.append((round(res.x[0],5),round(res.x[1],5)))
+        roots.append(sorted(set(found)))
+    return roots
+
+def newton2_grid(v_ca, I_app_values, method='newton'):
+    """ Method 2: batched Newton algorithm on the whole grid """
+    I_grid, v0_grid = np.meshgrid(I_app_values, v0_values, indexing='ij')
+    p0 = np.zeros([I_grid.size,2])
+    p0[:,0] = v0_grid.ravel(); p0[:,1] = w0
+    res = newton2_batch(counted_f, counted_Jf, p0, args=(I_grid.ravel(),v_ca),
+                        method=method)
+    points = res.x.reshape(len(I_app_values),len(v0_values),2)
+    success = res.success.reshape(len(I_app_values),len(v0_values))
+    return [sorted(set((round(p[0],5),round(p[1],5)) for p in points[i][success[i]]))
+            for i in range(0,len(I_app_values))]
+
+def bracketing(v_ca, I_app_values):
+    """ Method 3: reduction to the voltage and bracketing """
+    I_app, V, w = equilibria(I_app_values, v_ca)
+    return [sorted(zip(np.round(V[I_app == I],5), np.round(w[I_app == I],5)))
+            for I in I_app_values]
+
+def wall_time(fun, v_ca, I_app_values, repeat=3):
+    """ Best wall time (in seconds) over several repetitions, last output and
+    number of evaluations of f and Jf per repetition """
+    best = np.inf
+    count['f'] = 0; count['Jf'] = 0
+    for r in range(0,repeat):
+        start = time.perf_counter()
+        out = fun(v_ca, I_app_values)
+        best = min(best, time.perf_counter()-start)
+    return best, out, count['f']//repeat, count['Jf']//repeat
+
+# %%
+
+with np.errstate(all='ignore'):
+    for name, v_ca, I_app_values in cases:
+        t_loop, loop, nf_loop, nj_loop = wall_time(newton2_loop, v_ca, I_app_values, repeat=1)
+        t_qloop, qloop, nf_qloop, nj_qloop = wall_time(
+            lambda v_ca, I: newton2_loop(v_ca, I, 'broyden'), v_ca, I_app_values, repeat=1)
+        t_grid, grid, nf_grid, nj_grid = wall_time(newton2_grid, v_ca, I_app_values)
+        t_qgrid, qgrid, nf_qgrid, nj_qgrid = wall_time(
+            lambda v_ca, I: newton2_grid(v_ca, I, 'broyden'), v_ca, I_app_values)
+        t_bracket, bracket, nf, nj = wall_time(bracketing, v_ca, I_app_values)
+        print('\n'+name+': v_ca = %s, I_app in [%g,%g]' % (v_ca, I_app_values[0],
+              I_app_values[-1]))
+        print('  newton2 (loop)          : %.4f s  (%d f, %d Jf evaluations)'
+              % (t_loop, nf_loop, nj_loop))
+        print('  newton2 (loop, broyden) : %.4f s  (speedup %.1fx, %d f, %d Jf evaluations)'
+              % (t_qloop, t_loop/t_qloop, nf_qloop, nj_qloop))
+        print('  newton2_batch           : %.4f s  (speedup %.0fx, %d f, %d Jf evaluations)'
+              % (t_grid, t_loop/t_grid, nf_grid, nj_grid))
+        print('  newton2_batch (broyden) : %.4f s  (speedup %.0fx, %d f, %d Jf evaluations)'
+              % (t_qgrid, t_loop/t_qgrid, nf_qgrid, nj_qgrid))
+        print('  reduction+brackets      : %.4f s  (speedup %.0fx)' % (t_bracket, t_loop/t_bracket))
+
+        """ Equality check in both directions: for each value of I_app, the
+        Newton algorithm and the reduction must find the same number of zeros,
+        and each zero of one method must be a zero of the other (within the
+        rounding); the quasi-Newton method can reach less zeros from the
+        initial guesses within the maximum number of iterations, but not
+        different ones """
+        assert loop == grid
+        assert qloop == qgrid
+        assert all(set(q) <= set(l) for q, l in zip(qloop, loop))
+        n_newton = 0; n_bracket = 0; n_different = 0
+        for i in range(0,len(I_app_values)):
+            eq = np.array(bracket[i]).reshape(-1,2)
+            zeros = np.array(loop[i]).reshape(-1,2)
+            n_newton += len(zeros); n_bracket += len(eq)
+            matched = (len(eq) == len(zeros) and
+                       np.all(np.abs(eq[:,None,:]-zeros[None,:,:]).max(axis=2).min(axis=0) <= 2e-5) and
+                       np.all(np.abs(eq[:,None,:]-zeros[None,:,:]).max(axis=2).min(axis=1) <= 2e-5))
+            n_different += not matched
+        print('  zeros found by newton2: %d, by the reduction: %d' % (n_newton, n_bracket))
+        print('  values of I_app with different zeros: %d / %d' % (n_different,
+              len(I_app_values)))
+        print('  equilibria not reached by the broyden method: %d'
+              % (n_newton - sum(len(q) for q in qloop)))
+        assert n_different == 0
+
+# %%
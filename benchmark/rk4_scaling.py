@@ -0,0 +1,77 @@
+# =============================================================================
+#
+# SCALING OF THE RUNGE-KUTTA ALGORITHM
+#
+# The code measures the wall time of the Runge-Kutta algorithm as a function
+# of the total number of steps Nstep. Since at each step the vector field is
+# evaluated only on the current state, the cost of an integration should
+# grow linearly with Nstep.
+#
+# The benchmark is performed on the 'Passive Cell Membrane Model' (see
+# RungeKutta/error_analysis) and on a simple bidimensional linear system.
+#
+# =============================================================================
+
+import sys
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+sys.path.insert(0, '../RungeKutta')
+from rk4_system import RK4_system
+
+# %%
+
+""" Passive cell membrane model """
+def single_ion(t,y):
+    return g/C*(E-y)
+""" Harmonic oscillator """
+def h1(t,y1,y2):
+    return y2
+def h2(t,y1,y2):
+    return -y1
+
+""" Model parameters """
+g = 0.0144; C = 0.98; E = -93.6
+""" Integration parameters """
+dt = 0.01; t0 = 0.0
+Nsteps = np.array([1000, 2000, 5000, 10000, 20000, 50000, 100000])
+
+def wall_time(f, y0, Nstep, repeat=3):
+    """ Best wall time (in seconds) over several repetitions """
+    best = np.inf
+    for r in range(0,repeat):
+        start = time.perf_counter()
+        RK4_system(f, dt, y0, t0, Nstep)
+        best = min(best, time.perf_counter()-start)
+    return best
+
+# %%
+
+""" We measure the wall time for each number of steps """
+times_1d = np.zeros(len(Nsteps)); times_2d = np.zeros(len(Nsteps))
+for i in range(0,len(Nsteps)):
+    times_1d[i] = wall_time([single_ion], [-60.0], Nsteps[i])
+    times_2d[i] = wall_time([h1,h2], [1.0,0.0], Nsteps[i])
+    print('Nstep =', Nsteps[i],
+          '  1 eq: %.4f s' % times_1d[i], '  2 eq: %.4f s' % times_2d[i])
+
+""" Slope of the log-log fit: 1 means linear scaling """
+slope_1d = np.polyfit(np.log(Nsteps), np.log(times_1d), 1)[0]
+slope_2d = np.polyfit(np.log(Nsteps), np.log(times_2d), 1)[0]
+print('Scaling exponent (1 eq): %.2f' % slope_1d)
+print('Scaling exponent (2 eq): %.2f' % slope_2d)
+print('Time per step (2 eq): %.2f us' % (1e6*times_2d[-1]/Nsteps[-1]))
+
+# %%
+
+""" Visualization of the results """
+plt.loglog(Nsteps, times_1d, 'o-', c='black', label='1 equation')
+plt.loglog(Nsteps, times_2d, 's-', c='blue', label='2 equations')
+plt.loglog(Nsteps, times_2d[0]*Nsteps/Nsteps[0], 'r--', label='linear')
+plt.xlabel('Nstep', fontsize=15)
+plt.ylabel('Wall time [s]', fontsize=15)
+plt.legend()
+plt.grid(True)
+plt.show()
+
+# %%
@@ -0,0 +1,302 @@
+# =============================================================================
+#
+# BENCHMARK SUITE WITH REGRESSION TRACKING
+#
+# The code runs a set of benchmarks of the solvers and of the analysis
+# pipelines of the repository and writes the results to a JSON file:
+#   rk4_system/nstep=N   RK4_system on the harmonic oscillator, N steps
+#   rk4_system/neq=N     RK4_system on a system of N linear equations
+#   rk4_system/morris_lecar[_list]  RK4_system on a single trajectory of the
+#                        Morris Lecar model, with the vector field of model.py
+#                        and with the former list of two functions
+#   newton/...           throughput of newton and newton2 (loop and batch,
+#                        Newton and Broyden methods)
+#   bifurcation/...      equilibria and their stability on the grid of
+#                        example/ (v_ca=0, I_app in [0,100], v0 in [-80,40])
+#   frequency/...        firing frequency on the grid of example/ (v_ca=0,
+#                        I_app in [0,100], dt=0.01, Nstep=5000, v0=-25, w0=0)
+# For each benchmark the best wall time over several repetitions, the number
+# of evaluations of the function (vector field or equations) and the peak
+# memory allocated (measured with tracemalloc in a separate run) are stored.
+#
+# Several parameters can be parsed:
+#   --out       name of the JSON file of the results (default: benchmark.json)
+#   --baseline  JSON file of a previous run: the results are compared with it
+#               and the script exits with status 1 if a regression is found
+#   --threshold relative increase of time, evaluations or memory flagged as a
+#               regression (default: 0.2, i.e. 20%)
+#   --repeat    number of repetitions of each benchmark (default: 3)
+#   --only      run only the benchmarks whose name starts with the given prefix
+#
+# =============================================================================
+
+import argparse
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--out")
+parser.add_argument("--baseline")
+parser.add_argument("--threshold")
+parser.add_argument("--repeat")
+parser.add_argument("--only")
+
+opts = parser.parse_args()
+
+if opts.out:
+    out = opts.out
+else:
+    out = 'benchmark.json'
+if opts.threshold:
+    threshold = float(opts.threshold)
+else:
+    threshold = 0.2
+if opts.repeat:
+    repeat = int(opts.repeat)
+else:
+    repeat = 3
+if opts.only:
+    only = opts.only
+else:
+    only = ''
+baseline = opts.baseline
+
+# %%
+
+import sys
+import json
+import time
+import platform
+import datetime
+import contextlib
+import tracemalloc
+import numpy as np
+sys.path.insert(0, '../RungeKutta')
+sys.path.insert(1, '../newton')
+sys.path.insert(2, '../MorrisLecar')
+from rk4_system import RK4_system
+from newton import newton
+from newton2 import newton2, newton2_batch
+import model
+import classification
+import equilibria
+from stability import equilibrium_table, deduplicate
+
+# %%
+
+class Counter:
+    """ Number of evaluations of the functions of a benchmark """
+    def __init__(self):
+        self.calls = 0
+
+    def wrap(self, fun):
+        """ Function that counts its calls and then calls fun """
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return fun(*args, **kwargs)
+        return counted
+
+    def wrap_field(self, fun):
+        """ As wrap, for a vector field f(t,y,out): the ''out'' parameter is
+        kept, so that the integrators still write in place """
+        def counted(t, y, out=None):
+            self.calls += 1
+            return fun(t, y, out=out)
+        return counted
+
+@contextlib.contextmanager
+def patched(module, name, replacement):
+    """ Replaces a function of a module within the block, e.g. to count the
+    evaluations of a function that a pipeline calls internally """
+    original = getattr(module, name)
+    setattr(module, name, replacement(original))
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+def measure(run, repeat):
+    """ Best wall time over several repetitions of run(counter), then the
+    number of evaluations and the peak memory of a further run traced by
+    tracemalloc (tracing slows the run down, so it is not timed) """
+    times = []
+    for r in range(0,repeat):
+        counter = Counter()
+        start = time.perf_counter()
+        run(counter)
+        times.append(time.perf_counter()-start)
+    counter = Counter()
+    tracemalloc.start()
+    run(counter)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time': min(times), 'times': times, 'nfev': counter.calls,
+            'peak_memory': peak}
+
+# %%
+
+""" Benchmarks: each one is a function run(counter) with its parameters and
+the number of items processed (steps, equations solved, values of I_app),
+used to compute the throughput """
+benchmarks = []
+
+def oscillator(t, y, out=None):
+    if out is None:
+        out = np.zeros(2)
+    out[0] = y[1]; out[1] = -y[0]
+    return out
+
+for Nstep in [1000, 10000, 100000]:
+    def run(counter, Nstep=Nstep):
+        RK4_system(counter.wrap_field(oscillator), 0.01, [1.0,0.0], 0.0, Nstep)
+    benchmarks.append(('rk4_system/nstep=%d'%Nstep, run, dict(Nstep=Nstep, Neq=2), Nstep))
+
+def decay(t, y, out=None):
+    return np.negative(y, out=out)
+
+for Neq in [1, 10, 100, 1000, 10000]:
+    def run(counter, Neq=Neq):
+        RK4_system(counter.wrap_field(decay), 0.01, np.ones(Neq), 0.0, 1000)
+    benchmarks.append(('rk4_system/neq=%d'%Neq, run, dict(Nstep=1000, Neq=Neq), 1000))
+
+""" Single trajectory of the Morris Lecar model (I_app=50, v_ca=0): the
+vector field of model.py against the list of two functions it replaced """
+def run(counter):
+    RK4_system(counter.wrap_field(model.morris_lecar(50.0, 0.0)), 0.01, [-25.0,0.0], 0.0, 20000)
+benchmarks.append(('rk4_system/morris_lecar', run, dict(Nstep=20000, I_app=50.0, v_ca=0.0), 20000))
+
+def morris_lecar_list(I_app, v_ca):
+    def g1(t,y1,y2):
+        return model.f1(y1,y2,I_app,v_ca)
+    def g2(t,y1,y2):
+        return model.f2(y1,y2,I_app,v_ca)
+    return [g1, g2]
+def run(counter):
+    RK4_system([counter.wrap(g) for g in morris_lecar_list(50.0, 0.0)], 0.01, [-25.0,0.0],
+               0.0, 20000)
+benchmarks.append(('rk4_system/morris_lecar_list', run, dict(Nstep=20000, I_app=50.0, v_ca=0.0),
+                   20000))
+
+""" Throughput of the Newton algorithms: square roots of many numbers, and
+equilibria of the Morris Lecar model from the initial guesses of example/ """
+squares = np.linspace(1,100,1000)
+def run(counter):
+    for a in squares:
+        newton(counter.wrap(lambda x: x**2-a), counter.wrap(lambda x: 2*x), a)
+benchmarks.append(('newton/loop', run, dict(n=len(squares)), len(squares)))
+
+I_app_values = np.linspace(0,100,200)
+v0_values = np.linspace(-80,40,61)
+w0 = 0.0
+v_ca = 0.0
+I_grid, v0_grid = np.meshgrid(I_app_values, v0_values, indexing='ij')
+p0 = np.zeros([I_grid.size,2])
+p0[:,0] = v0_grid.ravel(); p0[:,1] = w0
+
+def run(counter):
+    for I_app in I_app_values[::10]:
+        for v0 in v0_values:
+            newton2(counter.wrap(lambda x,y: model.f(x,y,I_app,v_ca)),
+                    counter.wrap(lambda x,y: model.Jf(x,y,I_app,v_ca)), [v0,w0])
+n_loop = len(I_app_values[::10])*len(v0_values)
+benchmarks.append(('newton/newton2_loop', run, dict(n=n_loop, v_ca=v_ca), n_loop))
+
+def run(counter):
+    newton2_batch(counter.wrap(model.f), counter.wrap(model.Jf), p0,
+                  args=(I_grid.ravel(),v_ca))
+benchmarks.append(('newton/newton2_batch', run, dict(n=len(p0), v_ca=v_ca), len(p0)))
+
+def run(counter):
+    newton2_batch(counter.wrap(model.f), counter.wrap(model.Jf), p0,
+                  args=(I_grid.ravel(),v_ca), method='broyden')
+benchmarks.append(('newton/newton2_batch_broyden', run, dict(n=len(p0), v_ca=v_ca),
+                   len(p0)))
+
+""" Bifurcation sweep of example/: equilibria and their stability with the
+two solvers of bifurcation_analysis.py """
+def run(counter):
+    with patched(equilibria, 'reduced', counter.wrap), \
+         patched(equilibria, 'dreduced', counter.wrap):
+        I_eq, V_eq, w_eq = equilibria.equilibria(I_app_values, v_ca)
+    equilibrium_table(I_eq, V_eq, w_eq, v_ca)
+benchmarks.append(('bifurcation/bracket', run, dict(v_ca=v_ca, n_I_app=len(I_app_values)),
+                   len(I_app_values)))
+
+def run(counter):
+    res = newton2_batch(counter.wrap(model.f), counter.wrap(model.Jf), p0,
+                        args=(I_grid.ravel(),v_ca))
+    x = res.x[res.success]
+    I_eq = I_grid.ravel()[res.success]
+    index = deduplicate(I_eq, x[:,0], x[:,1])
+    equilibrium_table(I_eq[index], x[index,0], x[index,1], v_ca)
+benchmarks.append(('bifurcation/newton2', run, dict(v_ca=v_ca, n_I_app=len(I_app_values),
+                   n_v0=len(v0_values)), len(I_app_values)))
+
+""" F-I sweep of example/: the vector field used by firing_frequency is
+wrapped to count its evaluations (one evaluation for the whole ensemble) """
+I_freq = np.linspace(0,100,201)
+def run(counter):
+    y0 = np.zeros([len(I_freq),2]); y0[:,0] = -25.0
+    with patched(classification, 'morris_lecar',
+                 lambda morris_lecar: lambda I, v: counter.wrap_field(morris_lecar(I, v))):
+        classification.firing_frequency(I_freq, v_ca, y0, 0.01, 5000)
+benchmarks.append(('frequency/cold', run, dict(v_ca=v_ca, n_I_app=len(I_freq), dt=0.01,
+                   Nstep=5000), len(I_freq)))
+
+# %%
+
+""" Run the benchmarks """
+results = {}
+with np.errstate(all='ignore'):
+    for name, run, params, items in benchmarks:
+        if not name.startswith(only):
+            continue
+        result = measure(run, repeat)
+        result['params'] = params
+        result['throughput'] = items/result['time']
+        results[name] = result
+        print('%-30s %10.4f s  %10d evaluations  %8.2f MB  %12.1f items/s'%(name,
+              result['time'],result['nfev'],result['peak_memory']/2**20,result['throughput']))
+
+report = {'metadata': {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'machine': platform.machine(),
+                       'processor': platform.processor(),
+                       'repeat': repeat},
+          'results': results}
+with open(out, 'w') as file:
+    json.dump(report, file, indent=2)
+print('Results written to', out)
+
+# %%
+
+""" Comparison with the baseline: the ratio of each metric to the one of the
+baseline is printed, and ratios larger than 1+threshold are flagged """
+if baseline:
+    with open(baseline) as file:
+        reference = json.load(file)['results']
+    regressions = []
+    print('\n%-30s %10s %10s %10s'%('benchmark','time','nfev','memory'))
+    for name, result in results.items():
+        if name not in reference:
+            print('%-30s not in the baseline'%name)
+            continue
+        ratios = []
+        flags = []
+        for metric in ['time', 'nfev', 'peak_memory']:
+            old = reference[name][metric]
+            ratio = result[metric]/old if old > 0 else 1.0
+            ratios.append(ratio)
+            if ratio > 1+threshold:
+                flags.append(metric)
+        print('%-30s %9.2fx %9.2fx %9.2fx %s'%(name, *ratios,
+              'REGRESSION ('+', '.join(flags)+')' if flags else ''))
+        if flags:
+            regressions.append(name)
+    if regressions:
+        print('\n%d regressions above %.0f%%: %s'%(len(regressions),100*threshold,
+              ', '.join(regressions)))
+        sys.exit(1)
+    print('\nNo regressions above %.0f%%'%(100*threshold))
+
+# %%
@@ -6,29 +6,39 @@
 #
 # =============================================================================
 
+import numpy as np
+
 class Result:
-    def __init__(self, x, success, message):
+    def __init__(self, x, success, message, nit=0, nfev=0, njev=0):
         self.x = x
         self.success = success
         self.message = message
+        self.nit = nit
+        self.nfev = nfev
+        self.njev = njev
 
-def newton(f, Df, x0, eps=1e-14, max_n=100):
+def newton(f, Df, x0, eps=1e-14, max_n=100, args=(), bracket=None):
     """ Finds the solution of the equation f(x)=0 
     
     Parameters
     ----------
     f: function to be put in the equation
     Df: derivative of the function 
-    x0: initial guess
+    x0: initial guess; if it is an array, the equation is solved at once for
+        each element of x0 (see newton_array)
     eps: precision of the returned value, i.e. how much the function is close to 0 (default: 1e-14)
     max_n: maximum number of iterations (default: 100)
+    args: extra parameters given to f and Df as f(x,*args) (default: none)
+    bracket: only for an array x0, see newton_array (default: None)
     
     Returns
     -------
     res: Result object with three attributes. ''x'' is the value reached at
          last iteration; ''success'' is a boolean flag indicating if the algorithm
          correctly converged; ''message'' is a string containing information on 
-         why the algorithm did not converge.
+         why the algorithm did not converge. The counters ''nit'', ''nfev'' and
+         ''njev'' contain the number of iterations performed and of evaluations
+         of f and of Df.
     
     Examples
     --------
@@ -40,23 +50,196 @@ def newton(f, Df, x0, eps=1e-14, max_n=100):
     >>> res = newton(f,Df,x0)
     >>> res.x
     2.0
+    >>> newton(f,Df,np.array([3.0,-1.0,0.0])).x
+    array([ 2., -2., -2.])
     """    
+    if np.ndim(x0) > 0:
+        return newton_array(f, Df, x0, eps, max_n, args, bracket)
     xn = x0
     for n in range(0,max_n):
-        f_xn = f(xn)
+        f_xn = f(xn,*args)
         if abs(f_xn) < eps:
             # print('Number of iterations to find the solution: ',n)
             success = True
             message = 'Success'
-            return Result(xn,success,message)
-        Df_xn = Df(xn)
+            return Result(xn,success,message,n,n+1,n)
+        Df_xn = Df(xn,*args)
         if Df_xn == 0:
             success = False
             message = 'Zero Derivative.'
-            return Result(xn,success,message)
+            return Result(xn,success,message,n,n+1,n+1)
         xn = xn - f_xn/Df_xn
     success = False
     message = 'Maximum number of iterations reached.'
-    return Result(xn,success,message)
+    return Result(xn,success,message,max_n,max_n,max_n)
+
+MESSAGES = ['Success', 'Zero Derivative.', 'Maximum number of iterations reached.',
+            'Not finite value']
+
+class BatchResult:
+    def __init__(self, x, success, status, nit, nfev=0, njev=0):
+        self.x = x
+        self.success = success
+        self.status = status
+        self.message = np.array(MESSAGES)[status]
+        self.nit = nit
+        self.nfev = nfev
+        self.njev = njev
+
+def search_bracket(f, x, fx, args, n=20):
+    """ Looks for a change of sign of f around each element of x, at the
+    distances h, 2h, 4h, ... (h = 1e-3*(1+|x|)) on both sides. Returns the
+    ends lo < hi of the brackets found, f(lo), a boolean array with the
+    elements for which a bracket was found and the number of calls of f """
+    lo = np.full(len(x), np.nan); hi = np.full(len(x), np.nan)
+    f_lo = np.full(len(x), np.nan)
+    found = fx == 0
+    h = 1e-3*(1+np.abs(x))
+    for k in range(0,n):
+        for side in [-1, 1]:
+            xs = x+side*h
+            fs = np.broadcast_to(f(xs,*args), x.shape)
+            new = ~found & np.isfinite(fs) & ((fs > 0) != (fx > 0))
+            lo[new] = np.minimum(x, xs)[new]; hi[new] = np.maximum(x, xs)[new]
+            f_lo[new] = np.where(side < 0, fs, fx)[new]
+            found |= new
+        if np.all(found):
+            return lo, hi, f_lo, found, 2*k+2
+        h = 2*h
+    return lo, hi, f_lo, found, 2*n
+
+def newton_array(f, Df, x0, eps=1e-14, max_n=100, args=(), bracket=None):
+    """ Newton algorithm applied at once to an array of initial guesses
+    (lanes): finds the solutions of the equation f(x,*args)=0 for each
+    element of x0. Only the lanes that have not converged (nor failed) are
+    evaluated and updated.
+
+    The Newton step is safeguarded by a bracket [lo,hi] of the zero (f(lo)
+    and f(hi) with different sign), if it is known: the bracket is shrunk at
+    each iteration and, when the Newton step leaves it (or the derivative
+    is zero), the middle point of the bracket is taken instead (bisection).
+    A lane whose derivative vanishes without a bracket looks for one around
+    the present iterate before giving up.
+
+    Parameters
+    ----------
+    f: vectorized function f(x,*args)
+    Df: vectorized derivative of the function, Df(x,*args)
+    x0: array of initial guesses
+    eps: precision of the returned values, i.e. how much the function is close to 0 (default: 1e-14)
+    max_n: maximum number of iterations (default: 100)
+    args: extra parameters given to f and Df; each one can be a scalar or an
+          array of the shape of x0 (one value per lane)
+    bracket: tuple (a, b) of scalars or arrays of the shape of x0 with the
+             ends of an interval containing a zero of each lane; the lanes
+             where f(a) and f(b) have the same sign have no bracket (default: None)
+
+    Returns
+    -------
+    res: BatchResult object: ''x'' is an array of the shape of x0 with the value
+         reached by each lane, ''success'' is a boolean array indicating the
+         lanes that correctly converged (|f| < eps, or the bracket shrunk to
+         two consecutive floating point numbers), ''status'' is an integer
+         array with the index in MESSAGES of the reason why each lane stopped,
+         ''message'' the corresponding strings and ''nit'' the number of
+         iterations performed by each lane. The counters ''nfev'' and ''njev''
+         contain the number of calls of f and of Df, each one on all the
+         lanes still active.
+
+    Examples
+    --------
+    >>> def f(x,r):
+    >>>    return x**3-r
+    >>> def Df(x,r):
+    >>>    return 3*x**2
+    >>> res = newton_array(f, Df, np.array([1.,0.,-2.]), args=(np.array([8.,8.,-1.]),))
+    >>> res.x
+    array([ 2.,  2., -1.])
+    >>> res.nit
+    array([7, 8, 6])
+    """
+    x0 = np.asarray(x0, dtype=np.float64)
+    shape = x0.shape
+    x = x0.ravel().copy()
+    N = len(x)
+    args = [np.broadcast_to(a, shape).ravel() if np.ndim(a) > 0 else a for a in args]
+    status = np.full(N, 2)
+    nit = np.zeros(N, dtype=np.int64)
+    nfev = 0; njev = 0
+
+    """ Bracket of each lane: f(lo) is stored to know the sign at lo """
+    lo = np.full(N, np.nan); hi = np.full(N, np.nan); f_lo = np.full(N, np.nan)
+    bracketed = np.zeros(N, dtype=bool)
+    if bracket is not None:
+        a = np.broadcast_to(np.asarray(bracket[0], dtype=np.float64), shape).ravel()
+        b = np.broadcast_to(np.asarray(bracket[1], dtype=np.float64), shape).ravel()
+        lo = np.minimum(a, b); hi = np.maximum(a, b)
+        f_lo = np.broadcast_to(f(lo,*args), lo.shape).astype(np.float64)
+        f_hi = np.broadcast_to(f(hi,*args), hi.shape)
+        nfev += 2
+        bracketed = (f_lo > 0) != (f_hi > 0)
+        outside = bracketed & ~((x >= lo) & (x <= hi))
+        x[outside] = 0.5*(lo[outside]+hi[outside])
+
+    active = np.arange(N)
+    for n in range(0,max_n):
+        if len(active) == 0:
+            break
+        lane_args = [a[active] if np.ndim(a) > 0 else a for a in args]
+        xn = x[active]
+        fx = np.broadcast_to(f(xn,*lane_args), xn.shape)
+        nfev += 1
+
+        """ Lanes that have converged or failed are frozen """
+        converged = np.abs(fx) < eps
+        not_finite = ~np.isfinite(fx)
+        status[active[converged]] = 0
+        status[active[not_finite]] = 3
+
+        """ The bracket is shrunk to the side where f changes sign """
+        br = bracketed[active] & ~converged & ~not_finite
+        same = br & ((fx > 0) == (f_lo[active] > 0))
+        lo[active[same]] = xn[same]; f_lo[active[same]] = fx[same]
+        hi[active[br & ~same]] = xn[br & ~same]
+        collapsed = br & (np.nextafter(lo[active], hi[active]) >= hi[active])
+        status[active[collapsed]] = 0
+
+        keep = ~converged & ~not_finite & ~collapsed
+        active = active[keep]; xn = xn[keep]; fx = fx[keep]
+        if len(active) == 0:
+            break
+        lane_args = [a[keep] if np.ndim(a) > 0 else a for a in lane_args]
+        dfx = np.broadcast_to(Df(xn,*lane_args), xn.shape)
+        njev += 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_new = xn - fx/dfx
+        zero = dfx == 0
+
+        """ Lanes with zero derivative and no bracket look for one """
+        search = zero & ~bracketed[active]
+        if np.any(search):
+            search_args = [a[search] if np.ndim(a) > 0 else a for a in lane_args]
+            s_lo, s_hi, s_f_lo, found, calls = search_bracket(f, xn[search], fx[search],
+                                                              search_args)
+            nfev += calls
+            lanes = active[search][found]
+            lo[lanes] = s_lo[found]; hi[lanes] = s_hi[found]; f_lo[lanes] = s_f_lo[found]
+            bracketed[lanes] = True
+
+        """ Bisection where the Newton step is not possible or leaves the bracket """
+        br = bracketed[active]
+        bisect = br & (zero | ~np.isfinite(x_new) | ~(x_new > lo[active]) |
+                       ~(x_new < hi[active]))
+        x_new[bisect] = 0.5*(lo[active][bisect]+hi[active][bisect])
+        failed = zero & ~br
+        status[active[failed]] = 1
+        not_finite = ~failed & ~np.isfinite(x_new)
+        status[active[not_finite]] = 3
+        update = ~failed & ~not_finite
+        x[active[update]] = x_new[update]
+        nit[active[update]] += 1
+        active = active[update]
+    return BatchResult(x.reshape(shape), (status == 0).reshape(shape), status.reshape(shape),
+                       nit.reshape(shape), nfev, njev)
 
 # %%
\ No newline at end of file
@@ -3,8 +3,13 @@
 # BIDIMENSIONAL NEWTON ALGORITHM
 #   
 # Approximate solution of the equation system f1(x1,x2)=0, f2(x1,x2)=0
+# The jacobian matrix is either given, estimated by finite differences or,
+# in the quasi-Newton (Broyden) mode, evaluated only at the initial guess
+# and then updated with rank-one corrections.
 #
 # source: http://mathfaculty.fullerton.edu/mathews/n2003/FixPointNewtonMod.html
+#         C.G. Broyden, 'A class of methods for solving nonlinear simultaneous
+#         equations', Math. Comp. 19 (1965)
 #
 # =============================================================================
 
@@ -13,12 +18,24 @@ from numpy.linalg import inv
 from numpy.linalg import det
 
 class Result:
-    def __init__(self, x, success, message):
+    def __init__(self, x, success, message, nit=0, nfev=0, njev=0):
         self.x = x
         self.success = success
         self.message = message
+        self.nit = nit
+        self.nfev = nfev
+        self.njev = njev
 
-def newton2(f,Jf,p0,eps=1e-8,max_iter=20):
+def fd_jacobian(f, x, y, f0, args=()):
+    """ Jacobian matrix [[a,b],[c,d]] of f at (x,y) estimated by forward
+    finite differences, given f0 = f(x,y,*args); costs two evaluations of f.
+    x and y can be arrays (one point for each lane). """
+    hx = 1.5e-8*(1+np.abs(x)); hy = 1.5e-8*(1+np.abs(y))
+    fx = f(x+hx,y,*args); fy = f(x,y+hy,*args)
+    return [[(fx[0]-f0[0])/hx, (fy[0]-f0[0])/hy],
+            [(fx[1]-f0[1])/hx, (fy[1]-f0[1])/hy]]
+
+def newton2(f,Jf,p0,eps=1e-8,max_iter=20,method='newton'):
     """ Bidimensional Newton algorithm: finds the solutions of the system of equations
     f1(x,y) = 0
     f2(x,y) = 0
@@ -26,17 +43,24 @@ def newton2(f,Jf,p0,eps=1e-8,max_iter=20):
     Parameters
     ----------
     f: list of the two functions that form the system of equations
-    Jf: jacobian matrix of f
+    Jf: jacobian matrix of f; if None, it is estimated by finite differences
     p0: initial guess, bidimensional list
     eps: precision of the returned value, i.e. how close f is close to zero (default: 1e-8)
     max_iter: maximum number of iterations
+    method: 'newton' (the jacobian matrix is evaluated and inverted at each
+            iteration) or 'broyden' (it is evaluated and inverted only at the
+            initial guess, then its inverse is updated with the rank-one
+            correction of Broyden; it is evaluated again only if the update
+            is not possible) (default: 'newton')
     
     Returns
     -------
     res: Result object with 3 attributes: ''x'' is a bidimensional array containing
        the zero of the function, ''success'' is a boolean flag indicating if 
        the algorithm correctly coverged; ''message'' is a string containing information
-       on why the algorithm did not converge properly. 
+       on why the algorithm did not converge properly. The counters ''nit'',
+       ''nfev'' and ''njev'' contain the number of iterations performed and
+       of evaluations of f and of Jf.
         
     Examples
     --------
@@ -53,16 +77,30 @@ def newton2(f,Jf,p0,eps=1e-8,max_iter=20):
     >>> res = newton2(f=f,Jf=Jf,p0=p0)
     >>> res.x
     array([0.06177013, 0.72449052])
+    >>> res.nfev, res.njev
+    (4, 4)
+    >>> res = newton2(f=f,Jf=None,p0=p0,method='broyden')
+    >>> res.x, res.nfev, res.njev
+    (array([0.06177013, 0.72449052]), 8, 0)
     """
+    if method == 'broyden':
+        return broyden2(f,Jf,p0,eps,max_iter)
+    nfev = 0; njev = 0
     for k in range(0,max_iter):
         f_k = f(p0[0],p0[1])
-        Jf_k = Jf(p0[0],p0[1])
+        nfev += 1
+        if Jf is None:
+            Jf_k = fd_jacobian(f,p0[0],p0[1],f_k)
+            nfev += 2
+        else:
+            Jf_k = Jf(p0[0],p0[1])
+            njev += 1
         if det(Jf_k) == 0:
             if k == 0:
                 pk = p0
             success = False
             message = 'Zero determinant'
-            return Result(pk,success,message)
+            return Result(pk,success,message,k,nfev,njev)
 
         invJf_k = inv(Jf_k)
         pk = p0 - np.dot(invJf_k,f_k)
@@ -71,10 +109,245 @@ def newton2(f,Jf,p0,eps=1e-8,max_iter=20):
         if dist < eps:
             success = True
             message = 'Success'
-            return Result(pk,success,message)
+            return Result(pk,success,message,k+1,nfev,njev)
         p0 = pk
     success = False
     message = 'Max number of iterations reached'
-    return Result(pk,success,message)
+    return Result(pk,success,message,max_iter,nfev,njev)
+
+def broyden2(f,Jf,p0,eps=1e-8,max_iter=20):
+    """ Quasi-Newton (Broyden) mode of newton2: the inverse H of the jacobian
+    matrix is computed only at the initial guess (from Jf, or by finite
+    differences if Jf is None); after each step dx, with change df of f, it
+    is updated with the rank-one correction
+        H = H + (dx - H df) dx^T H / (dx^T H df)
+    so that each iteration costs a single evaluation of f. The jacobian
+    matrix is evaluated again if the correction is not defined and when the
+    step becomes smaller than eps while f is not smaller than eps, so that
+    such a convergence is checked with the same Newton step of newton2; a
+    small step where f is already smaller than eps is accepted at once.
+    Parameters and result as for newton2. """
+    p = np.array(p0, dtype=np.float64)
+    f_p = np.array(f(p[0],p[1]), dtype=np.float64)
+    nfev = 1; njev = 0
+    restart = True
+    for k in range(0,max_iter):
+        if restart:
+            if Jf is None:
+                J = np.array(fd_jacobian(f,p[0],p[1],f_p), dtype=np.float64)
+                nfev += 2
+            else:
+                J = np.array(Jf(p[0],p[1]), dtype=np.float64)
+                njev += 1
+            if det(J) == 0:
+                return Result(p,False,'Zero determinant',k,nfev,njev)
+            H = inv(J)
+        dx = -np.dot(H,f_p)
+        if np.sqrt(np.dot(dx,dx)) < eps:
+            if restart or np.sqrt(np.dot(f_p,f_p)) < eps:
+                return Result(p+dx,True,'Success',k+1,nfev,njev)
+            """ A small step with f not close to zero is checked with the
+            exact jacobian """
+            restart = True
+            continue
+        pk = p + dx
+        f_k = np.array(f(pk[0],pk[1]), dtype=np.float64)
+        nfev += 1
+        H_df = np.dot(H,f_k-f_p)
+        denom = np.dot(dx,H_df)
+        restart = not (denom != 0 and np.isfinite(denom))
+        if not restart:
+            H = H + np.outer(dx-H_df, np.dot(dx,H))/denom
+        p = pk; f_p = f_k
+    return Result(p,False,'Max number of iterations reached',max_iter,nfev,njev)
+
+MESSAGES = ['Success', 'Zero determinant', 'Max number of iterations reached',
+            'Not finite value']
+
+class BatchResult:
+    def __init__(self, x, success, status, nit, nfev=0, njev=0):
+        self.x = x
+        self.success = success
+        self.status = status
+        self.message = np.array(MESSAGES)[status]
+        self.nit = nit
+        self.nfev = nfev
+        self.njev = njev
+
+def newton2_batch(f,Jf,p0,args=(),eps=1e-8,max_iter=20,method='newton'):
+    """ Bidimensional Newton algorithm applied at once to N initial guesses 
+    (lanes): finds the solutions of the system of equations
+    f1(x,y,*args) = 0
+    f2(x,y,*args) = 0
+    The linear step is solved with the closed form inverse of the 2x2 jacobian
+    and only the lanes that have not converged (nor failed) are updated.
     
-# %%
\ No newline at end of file
+    Parameters
+    ----------
+    f: vectorized function f(x,y,*args) returning the list [f1,f2] of arrays
+    Jf: vectorized jacobian matrix of f, Jf(x,y,*args) returns [[a,b],[c,d]];
+        if None, it is estimated by finite differences
+    p0: initial guesses, array of size (N,2)
+    args: extra parameters given to f and Jf; each one can be a scalar or an 
+          array of size N (one value per lane)
+    eps: precision of the returned value, i.e. how close f is close to zero (default: 1e-8)
+    max_iter: maximum number of iterations
+    method: 'newton' or 'broyden', as for newton2 (default: 'newton')
+    
+    Returns
+    -------
+    res: BatchResult object with 5 attributes: ''x'' is an array of size (N,2)
+       containing the zeros of the function, ''success'' is a boolean array 
+       indicating the lanes that correctly converged; ''status'' is an integer 
+       array with the index in MESSAGES of the reason why each lane stopped,
+       ''message'' the corresponding strings and ''nit'' the number of 
+       iterations performed by each lane. The counters ''nfev'' and ''njev''
+       contain the number of calls of f and of Jf, each one on all the
+       lanes still active.
+        
+    Examples
+    --------
+    >>> def f(x,y,r):
+    >>>     return [x-y, y**2-r]
+    >>> def Jf(x,y,r):
+    >>>     return [[np.ones_like(x), -np.ones_like(x)],
+    >>>             [np.zeros_like(x), 2*y]]
+    >>> p0 = np.array([[1.,1.],[-1.,-1.],[1.,0.]])
+    >>> res = newton2_batch(f, Jf, p0, args=(np.array([4.,9.,1.]),))
+    >>> res.x
+    array([[ 2.,  2.],
+           [-3., -3.],
+           [ 1.,  0.]])
+    >>> res.message
+    array(['Success', 'Success', 'Zero determinant'], dtype='<U32')
+    """
+    if method == 'broyden':
+        return broyden2_batch(f,Jf,p0,args,eps,max_iter)
+    x = np.array(p0, dtype=np.float64)
+    N = len(x)
+    status = np.full(N, 2)
+    nit = np.zeros(N, dtype=np.int64)
+    nfev = 0; njev = 0
+    active = np.arange(N)
+    for k in range(0,max_iter):
+        if len(active) == 0:
+            break
+        lane_args = [a[active] if np.ndim(a) > 0 else a for a in args]
+        xk = x[active,0]; yk = x[active,1]
+        f1, f2 = f(xk,yk,*lane_args)
+        f1 = np.broadcast_to(f1, xk.shape); f2 = np.broadcast_to(f2, xk.shape)
+        nfev += 1
+        if Jf is None:
+            (a, b), (c, d) = fd_jacobian(f,xk,yk,(f1,f2),lane_args)
+            nfev += 2
+        else:
+            (a, b), (c, d) = Jf(xk,yk,*lane_args)
+            njev += 1
+        det = np.broadcast_to(a*d-b*c, xk.shape)
+
+        """ Lanes with zero determinant stop at the present iterate """
+        singular = det == 0
+        status[active[singular]] = 1
+        nit[active[~singular]] += 1
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dx = (d*f1-b*f2)/det
+            dy = (a*f2-c*f1)/det
+        dist = np.sqrt(dx**2+dy**2)
+        update = ~singular
+        x[active[update],0] = xk[update]-dx[update]
+        x[active[update],1] = yk[update]-dy[update]
+        
+        converged = update & (dist < eps)
+        status[active[converged]] = 0
+        not_finite = update & ~np.isfinite(dist)
+        status[active[not_finite]] = 3
+        active = active[update & ~converged & ~not_finite]
+    return BatchResult(x, status == 0, status, nit, nfev, njev)
+
+def broyden2_batch(f,Jf,p0,args=(),eps=1e-8,max_iter=20):
+    """ Quasi-Newton (Broyden) mode of newton2_batch: each lane keeps the
+    inverse [[h11,h12],[h21,h22]] of its jacobian matrix, computed at the
+    initial guess (and again where needed, as in broyden2) and updated with
+    the rank-one correction at each step. Parameters and result as for
+    newton2_batch. """
+    x = np.array(p0, dtype=np.float64)
+    N = len(x)
+    status = np.full(N, 2)
+    nit = np.zeros(N, dtype=np.int64)
+    h11 = np.zeros(N); h12 = np.zeros(N); h21 = np.zeros(N); h22 = np.zeros(N)
+    f1, f2 = f(x[:,0],x[:,1],*args)
+    F1 = np.array(np.broadcast_to(f1, N), dtype=np.float64)
+    F2 = np.array(np.broadcast_to(f2, N), dtype=np.float64)
+    nfev = 1; njev = 0
+    restart = np.ones(N, dtype=bool)
+    active = np.arange(N)
+    for k in range(0,max_iter):
+        if len(active) == 0:
+            break
+        """ The jacobian matrix is evaluated and inverted where needed """
+        lanes = active[restart[active]]
+        if len(lanes) > 0:
+            lane_args = [a[lanes] if np.ndim(a) > 0 else a for a in args]
+            xk = x[lanes,0]; yk = x[lanes,1]
+            if Jf is None:
+                (a, b), (c, d) = fd_jacobian(f,xk,yk,(F1[lanes],F2[lanes]),lane_args)
+                nfev += 2
+            else:
+                (a, b), (c, d) = Jf(xk,yk,*lane_args)
+                njev += 1
+            a, b, c, d = [np.broadcast_to(e, xk.shape) for e in (a, b, c, d)]
+            det = a*d-b*c
+            singular = det == 0
+            status[lanes[singular]] = 1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                h11[lanes] = d/det; h12[lanes] = -b/det
+                h21[lanes] = -c/det; h22[lanes] = a/det
+            active = np.setdiff1d(active, lanes[singular], assume_unique=True)
+        nit[active] += 1
+
+        """ Quasi-Newton step; small steps are accepted if computed with the
+        exact jacobian or where f is smaller than eps, otherwise they are
+        checked again """
+        dx = -(h11[active]*F1[active] + h12[active]*F2[active])
+        dy = -(h21[active]*F1[active] + h22[active]*F2[active])
+        dist = np.sqrt(dx**2+dy**2)
+        small = dist < eps
+        accepted = restart[active] | (np.sqrt(F1[active]**2+F2[active]**2) < eps)
+        converged = small & accepted
+        x[active[converged],0] += dx[converged]
+        x[active[converged],1] += dy[converged]
+        status[active[converged]] = 0
+        not_finite = ~np.isfinite(dist)
+        status[active[not_finite]] = 3
+        restart[active] = small & ~accepted
+        move = ~small & ~not_finite
+        active = active[~converged & ~not_finite]
+        lanes = active[move[~converged & ~not_finite]]
+        dx = dx[move]; dy = dy[move]
+        if len(lanes) == 0:
+            continue
+        x[lanes,0] += dx; x[lanes,1] += dy
+        lane_args = [a[lanes] if np.ndim(a) > 0 else a for a in args]
+        f1, f2 = f(x[lanes,0],x[lanes,1],*lane_args)
+        nfev += 1
+        f1 = np.broadcast_to(f1, lanes.shape); f2 = np.broadcast_to(f2, lanes.shape)
+
+        """ Rank-one update of the inverse jacobian with the last step """
+        df1 = f1-F1[lanes]; df2 = f2-F2[lanes]
+        g1 = h11[lanes]*df1 + h12[lanes]*df2
+        g2 = h21[lanes]*df1 + h22[lanes]*df2
+        denom = dx*g1 + dy*g2
+        """ row vector dx^T H """
+        r1 = dx*h11[lanes] + dy*h21[lanes]
+        r2 = dx*h12[lanes] + dy*h22[lanes]
+        ok = (denom != 0) & np.isfinite(denom)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u1 = np.where(ok, (dx-g1)/denom, 0); u2 = np.where(ok, (dy-g2)/denom, 0)
+        h11[lanes] += u1*r1; h12[lanes] += u1*r2
+        h21[lanes] += u2*r1; h22[lanes] += u2*r2
+        restart[lanes] = ~ok
+        F1[lanes] = f1; F2[lanes] = f2
+    return BatchResult(x, status == 0, status, nit, nfev, njev)
+
+# %%
@@ -1,4 +1,4 @@
-from newton2 import newton2
+from newton2 import newton2, newton2_batch
 import numpy as np
 import pytest
 from hypothesis import given
@@ -106,4 +106,129 @@ def test_max_iterations_exception(x0,y0):
     p0 = [x0,y0]
     assert newton2(f,Jf,p0).success == False
 
-# %%
\ No newline at end of file
+@given(st.lists(st.tuples(st.floats(-10,10),st.integers(-10,10),st.integers(1,10)),
+                min_size=1,max_size=20))
+def test_batch_equals_single_solutions(lanes):
+    '''
+    tests if the batched algorithm applied to the system
+      f1(x,y) = x-y = 0
+      f2(x,y) = y**2-r = 0
+    gives, for each lane, the same result (and number of iterations) of the
+    bidimensional Newton algorithm applied to the lane alone. Each lane has its own initial guess (x0,y0) and 
+    its own parameter r, given to the functions as an array. The strategy is 
+    to vary the number of lanes, the initial guesses and the parameters.
+    '''
+    p0 = np.array([[x0,y0] for x0, y0, r in lanes], dtype=float)
+    r = np.array([r for x0, y0, r in lanes], dtype=float)
+    def f(x,y,r):
+        return [x-y, y**2-r]
+    def Jf(x,y,r):
+        return [[np.ones_like(x), -np.ones_like(x)],
+                [np.zeros_like(x), 2*y]]
+    res = newton2_batch(f, Jf, p0, args=(r,))
+    for i in range(0,len(lanes)):
+        def f_single(x,y):
+            return [x-y, y**2-r[i]]
+        def Jf_single(x,y):
+            return [[1,-1],
+                    [0,2*y]]
+        single = newton2(f_single, Jf_single, list(p0[i]))
+        assert res.success[i] == single.success
+        assert res.message[i] == single.message
+        assert res.nit[i] == single.nit
+        if single.success == True:
+            assert round(res.x[i][0],6) == round(single.x[0],6)
+            assert round(res.x[i][1],6) == round(single.x[1],6)
+
+@given(st.floats(-10,10),st.floats(-10,10))
+def test_batch_failures(x0,y0):
+    '''
+    tests if the batched algorithm returns a False success flag for lanes 
+    of a system with zero determinant (f1 = r1, f2 = r2 with constant r1, r2) 
+    and for lanes of a system with no zeros (f1 = x^2+y^2+1, f2 = 2x), 
+    selected by a per-lane parameter s. The strategy is to vary the initial guess.
+    '''
+    def f(x,y,s):
+        return [np.where(s == 0, 1.0, x**2+y**2+1), np.where(s == 0, 2.0, 2*x)]
+    def Jf(x,y,s):
+        return [[np.where(s == 0, 0.0, 2*x), np.where(s == 0, 0.0, 2*y)],
+                [np.where(s == 0, 0.0, 2.0), np.zeros_like(x)]]
+    p0 = np.array([[x0,y0],[x0,y0]])
+    res = newton2_batch(f, Jf, p0, args=(np.array([0,1]),))
+    assert res.success[0] == False
+    assert res.message[0] == 'Zero determinant'
+    assert res.success[1] == False
+    assert res.nit[1] <= 20
+
+@given(st.floats(-10,10),st.floats(-10,10).filter(lambda y: abs(y) > 0.1),st.integers(1,10))
+def test_broyden_finds_zeros(x0,y0,r):
+    '''
+    tests if the quasi-Newton (Broyden) method, with the jacobian matrix given
+    or estimated by finite differences, converges to one of the zeros
+    (sqrt(r),sqrt(r)) and (-sqrt(r),-sqrt(r)) of the system
+      f1(x,y) = x-y = 0
+      f2(x,y) = y**2-r = 0
+    evaluating the jacobian matrix less times than the function. The strategy
+    is to vary the initial guess and the parameter r.
+    '''
+    def f(x,y):
+        return [x-y, y**2-r]
+    def Jf(x,y):
+        return [[1,-1],
+                [0,2*y]]
+    for jacobian in [Jf, None]:
+        res = newton2(f,jacobian,[x0,y0],max_iter=100,method='broyden')
+        if res.success == True:
+            assert round(res.x[0],6) == round(res.x[1],6)
+            assert round(abs(res.x[1]),6) == round(np.sqrt(r),6)
+            assert res.njev < res.nfev
+
+@given(st.floats(-10,10),st.floats(-10,10).filter(lambda y: abs(y) > 0.1),st.integers(1,10))
+def test_finite_difference_jacobian(x0,y0,r):
+    '''
+    tests if the Newton algorithm without the jacobian matrix, estimated by
+    finite differences, finds the same zero of the system x-y = 0, y**2-r = 0
+    found with the jacobian matrix, without evaluating it. The strategy is to
+    vary the initial guess and the parameter r.
+    '''
+    def f(x,y):
+        return [x-y, y**2-r]
+    def Jf(x,y):
+        return [[1,-1],
+                [0,2*y]]
+    exact = newton2(f,Jf,[x0,y0])
+    approx = newton2(f,None,[x0,y0])
+    assert approx.success == exact.success
+    if exact.success == True:
+        assert round(approx.x[0],6) == round(exact.x[0],6)
+        assert round(approx.x[1],6) == round(exact.x[1],6)
+    assert approx.njev == 0
+
+@given(st.lists(st.tuples(st.floats(-10,10),st.integers(-10,10),st.integers(1,10)),
+                min_size=1,max_size=20))
+def test_broyden_batch_equals_single(lanes):
+    '''
+    tests if the batched quasi-Newton (Broyden) method gives, for each lane,
+    the same result of the method applied to the lane alone, for the system
+    x-y = 0, y**2-r = 0 with its own initial guess and parameter r for each
+    lane. The strategy is to vary the number of lanes, the initial guesses
+    and the parameters.
+    '''
+    p0 = np.array([[x0,y0] for x0, y0, r in lanes], dtype=float)
+    r = np.array([r for x0, y0, r in lanes], dtype=float)
+    def f(x,y,r):
+        return [x-y, y**2-r]
+    def Jf(x,y,r):
+        return [[np.ones_like(x), -np.ones_like(x)],
+                [np.zeros_like(x), 2*y]]
+    res = newton2_batch(f, Jf, p0, args=(r,), method='broyden')
+    for i in range(0,len(lanes)):
+        single = newton2(lambda x,y: f(x,y,r[i]), lambda x,y: Jf(x,y,r[i]),
+                         list(p0[i]), method='broyden')
+        assert res.success[i] == single.success
+        assert res.nit[i] == single.nit
+        if single.success == True:
+            assert round(res.x[i][0],6) == round(single.x[0],6)
+            assert round(res.x[i][1],6) == round(single.x[1],6)
+
+# %%
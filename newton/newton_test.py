@@ -50,6 +50,59 @@ def test_exception(s,r):
         return 2*x
     x0 = s
     assert newton(f,Df,x0).success == False 
-    
+
+@given(st.lists(st.tuples(st.floats(-10,10),st.floats(1,16)),min_size=1,max_size=20))
+def test_array_equals_scalar(lanes):
+    '''
+    tests if the Newton algorithm applied to an array of initial guesses of
+    the function f(x) = x^2-r, with its own parameter r for each lane, gives
+    for each lane the same result of the algorithm applied to the lane alone
+    (except for the lanes with zero derivative, that are not aborted in the
+    array mode), with the same number of iterations. The strategy is to
+    vary the number of lanes, the initial guesses and the parameters.
+    '''
+    x0 = np.array([s for s, r in lanes])
+    r = np.array([r for s, r in lanes])
+    def f(x,r):
+        return x**2-r
+    def Df(x,r):
+        return 2*x
+    res = newton(f,Df,x0,args=(r,))
+    for i in range(0,len(lanes)):
+        single = newton(f,Df,x0[i],args=(r[i],))
+        if single.message == 'Zero Derivative.':
+            continue
+        assert res.success[i] == single.success
+        if single.success == True:
+            assert res.nit[i] == single.nit
+            assert round(res.x[i],5) == round(single.x,5)
+
+@given(st.floats(0.5,10),st.floats(1,16))
+def test_array_zero_derivative(s,r):
+    '''
+    tests if the lanes whose derivative vanishes look for a bracket of the
+    zero instead of aborting: the function f(x) = x^3-r has zero derivative
+    at x=0, but its zero r^(1/3) is found; the function f(x) = x^2+r has no
+    zeros and the lane starting at x=0 fails with a zero derivative. The
+    strategy is to vary the parameter r and the initial guess of a further lane.
+    '''
+    res = newton(lambda x: x**3-r, lambda x: 3*x**2, np.array([0.0,s]))
+    assert np.all(res.success)
+    assert np.allclose(res.x, r**(1/3))
+    res = newton(lambda x: x**2+r, lambda x: 2*x, np.array([0.0]))
+    assert res.success[0] == False
+    assert res.message[0] == 'Zero Derivative.'
+
+@given(st.floats(0,3))
+def test_array_bracket(s):
+    '''
+    tests if the zero of f(x) = cos(x) within the bracket [0,3], i.e. pi/2,
+    is found from any initial guess in the bracket, even where the Newton
+    step would leave the bracket (close to 0 and to pi). The strategy is to
+    vary the initial guess.
+    '''
+    res = newton(np.cos, lambda x: -np.sin(x), np.array([s]), bracket=(0,3))
+    assert res.success[0] == True
+    assert round(res.x[0],10) == round(np.pi/2,10)
+
 # %%
-    